@@ -25,6 +25,7 @@ from app.models.school import (
 from app.services.excel_loader import load_class_load_excel, load_teacher_assignments_excel, load_teacher_contacts_excel, load_cabinets_excel
 from app.services.telegram_bot import send_schedule_to_all_teachers, send_temporary_changes_to_all_teachers, send_temporary_changes_to_teacher
 from app.core.auth import admin_required, get_current_school_id, current_user
+from app.routes.utils import get_cached_subject_matrix, cache_subject_matrix
 import re
 
 def get_class_group(class_name):
@@ -177,15 +178,9 @@ def admin_index():
                     db.session.add(active_shift)
                     db.session.commit()
             
-            # Получаем предметы
-            try:
-                subjects = db.session.query(Subject).join(ClassLoad).filter(
-                    ClassLoad.shift_id == active_shift.id
-                ).distinct().order_by(Subject.name).all()
-            except Exception:
-                subjects = db.session.query(Subject).order_by(Subject.name).all()
-            
-            return render_template('admin/index.html', subjects=subjects, current_user=current_user, school_name=school_name)
+            # Шаблон главной страницы не выводит список предметов (они на странице /admin/subjects),
+            # поэтому предметы здесь не запрашиваются
+            return render_template('admin/index.html', current_user=current_user, school_name=school_name)
     except Exception as e:
         flash(f'Ошибка при загрузке данных: {str(e)}', 'danger')
         import traceback
@@ -243,64 +238,75 @@ def subject_matrix(subject_name):
         return redirect(url_for('logout'))
     
     with school_db_context(school_id):
-        subject = db.session.query(Subject).filter_by(name=subject_name).first_or_404()
-        
-        active_shift = db.session.query(Shift).filter_by(is_active=True).first()
-        if not active_shift:
-            return redirect(url_for('api.admin_index'))
-        
-        # Сначала пытаемся получить учителей для активной смены
-        teachers = db.session.query(Teacher).join(TeacherAssignment).filter(
-            TeacherAssignment.subject_id == subject.id,
-            TeacherAssignment.shift_id == active_shift.id
-        ).distinct().order_by(Teacher.full_name).all()
-        
-        # Если учителей нет для активной смены, получаем для любой смены
-        if not teachers:
-            teachers = db.session.query(Teacher).join(TeacherAssignment).filter(
-                TeacherAssignment.subject_id == subject.id
-            ).distinct().order_by(Teacher.full_name).all()
-        
-        # Загружаем классы для каждого учителя из TeacherAssignment для этого предмета
-        # Это гарантирует, что данные совпадут со страницей "Классы"
-        teachers_with_classes = []
-        for teacher in teachers:
-            # Сначала пытаемся получить назначения для активной смены
-            teacher_assignments = db.session.query(TeacherAssignment).filter_by(
-                teacher_id=teacher.id,
-                subject_id=subject.id,
-                shift_id=active_shift.id
-            ).all()
+        # Контекст шаблона собирается из строк и словарей (без ORM-объектов) и кэшируется
+        # до ближайшего commit или на SUBJECT_MATRIX_CACHE_TTL_SECONDS
+        cache_key = (request.endpoint, school_id, subject_name)
+        context = get_cached_subject_matrix(cache_key)
+        if context is None:
+            subject = db.session.query(Subject.id, Subject.name).filter_by(name=subject_name).first_or_404()
             
-            # Если нет назначений для активной смены, получаем для любой смены
-            if not teacher_assignments:
-                teacher_assignments = db.session.query(TeacherAssignment).filter_by(
-                    teacher_id=teacher.id,
-                    subject_id=subject.id
-                ).all()
-            
-            # Получаем уникальные классы из назначений
-            class_ids = list(set([ta.class_id for ta in teacher_assignments if ta.class_id]))
-            classes = get_sorted_classes(db.session.query(ClassGroup).filter(ClassGroup.id.in_(class_ids))) if class_ids else []
-            
-            teachers_with_classes.append({
-                'teacher': teacher,
-                'classes': classes
-            })
-        
-        if teachers:
-            all_teachers = db.session.query(Teacher).filter(
-                ~Teacher.id.in_([t.id for t in teachers])
-            ).order_by(Teacher.full_name).all()
-        else:
-            all_teachers = db.session.query(Teacher).order_by(Teacher.full_name).all()
-
-        return render_template('admin/subject_matrix.html',
-                               subject=subject, 
-                               teachers_with_classes=teachers_with_classes, 
-                               teachers=teachers, 
-                               all_teachers=all_teachers, 
-                               shift_id=active_shift.id)
+            active_shift = db.session.query(Shift).filter_by(is_active=True).first()
+            if not active_shift:
+                return redirect(url_for('api.admin_index'))
+            
+            context = _build_subject_matrix_context(subject, active_shift.id)
+            cache_subject_matrix(cache_key, context)
+        
+        return render_template('admin/subject_matrix.html', **context)
+
+def _build_subject_matrix_context(subject, active_shift_id):
+    """Контекст шаблона матрицы предмета: учителя активной смены, если их нет - любой смены"""
+    # Учителя, их назначения по предмету (во всех сменах) и классы - одним запросом
+    # Строки разворачиваются в матрицу: учитель -> классы активной смены / любой смены
+    teachers_by_id = {}
+    active_classes = {}
+    any_shift_classes = {}
+    for teacher_id, full_name, phone, assignment_shift_id, class_id, class_name in db.session.query(
+        Teacher.id, Teacher.full_name, Teacher.phone, TeacherAssignment.shift_id,
+        ClassGroup.id, ClassGroup.name
+    ).join(
+        TeacherAssignment, TeacherAssignment.teacher_id == Teacher.id
+    ).outerjoin(
+        ClassGroup, ClassGroup.id == TeacherAssignment.class_id
+    ).filter(
+        TeacherAssignment.subject_id == subject.id
+    ).order_by(Teacher.full_name, Teacher.id):
+        if teacher_id not in teachers_by_id:
+            teachers_by_id[teacher_id] = {'id': teacher_id, 'full_name': full_name, 'phone': phone}
+        any_shift = any_shift_classes.setdefault(teacher_id, {})
+        if class_id is not None:
+            any_shift[class_id] = {'id': class_id, 'name': class_name}
+        if assignment_shift_id == active_shift_id:
+            active = active_classes.setdefault(teacher_id, {})
+            if class_id is not None:
+                active[class_id] = {'id': class_id, 'name': class_name}
+    
+    # Учителя активной смены, если их нет - учителя любой смены
+    teacher_ids = list(active_classes or any_shift_classes)
+    teachers = [teachers_by_id[teacher_id] for teacher_id in teacher_ids]
+    
+    teachers_with_classes = []
+    for teacher in teachers:
+        # Классы активной смены, если их нет - любой смены
+        classes = active_classes.get(teacher['id']) or any_shift_classes[teacher['id']]
+        
+        teachers_with_classes.append({
+            'teacher': teacher,
+            'classes': sorted(classes.values(), key=lambda cls: sort_classes_key(cls['name']))
+        })
+    
+    all_teachers = db.session.query(Teacher.id, Teacher.full_name, Teacher.phone)
+    if teachers:
+        all_teachers = all_teachers.filter(~Teacher.id.in_(teacher_ids))
+    all_teachers = all_teachers.order_by(Teacher.full_name).all()
+    
+    return {
+        'subject': subject,
+        'teachers_with_classes': teachers_with_classes,
+        'teachers': teachers,
+        'all_teachers': all_teachers,
+        'shift_id': active_shift_id
+    }
 
 @api_bp.route('/admin/upload', methods=['GET', 'POST'])
 @admin_required
@@ -232,6 +232,14 @@ class DynamicSQLAlchemy(SQLAlchemy):
             for engine in self._school_engines.values():
                 engine.dispose()
             self._school_engines.clear()
+    
+    def dispose_school_engines(self, close=True):
+        """
+        Сбросить пулы соединений всех закэшированных engines БД школ, не удаляя их из кэша
+        close=False - не закрывать соединения (после fork они принадлежат родительскому процессу)
+        """
+        for engine in self._school_engines.values():
+            engine.dispose(close=close)
 
 db = DynamicSQLAlchemy()
 
@@ -242,6 +250,14 @@ school_db = db
 # BASE_DIR указывает на корень проекта (на уровень выше app/core/)
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 
+# Таблицы БД школы, которые clear_school_database удаляет и создает заново
+# (имена, а не модели: app.models.school импортирует db из этого модуля)
+SCHOOL_CLEARED_TABLES = (
+    'subjects', 'teachers', 'classes', 'class_load', 'teacher_assignments',
+    'permanent_schedule', 'temporary_schedule', 'shifts', 'schedule_settings',
+    'prompt_class_subjects', 'prompt_class_subject_teachers', 'subject_cabinets'
+)
+
 def get_system_db_path():
     """Получить путь к системной БД"""
     return os.path.join(BASE_DIR, 'system.db')
@@ -528,19 +544,13 @@ def switch_school_db(school_id):
         if 'SQLALCHEMY_BINDS' not in current_app.config:
             current_app.config['SQLALCHEMY_BINDS'] = {}
         
-        # Сохраняем старый URI для очистки кэша
-        old_uri = current_app.config.get('SQLALCHEMY_BINDS', {}).get('school')
-        
         # Устанавливаем bind 'school' (всегда обновляем, даже если уже существует)
         current_app.config['SQLALCHEMY_BINDS']['school'] = db_uri
         
-        # КРИТИЧЕСКИ ВАЖНО: Очищаем кэш engines для bind 'school' через наш кастомный метод
-        if hasattr(db, 'clear_school_engine_cache'):
-            # Очищаем кэш для старого URI (если был)
-            if old_uri:
-                db.clear_school_engine_cache(old_uri)
-            # Очищаем кэш для нового URI, чтобы создать новый engine
-            db.clear_school_engine_cache(db_uri)
+        # Engines в db._school_engines НЕ сбрасываем: они кэшируются по URI,
+        # поэтому engine другой школы не может быть выбран по ошибке, а пул
+        # соединений и кэш скомпилированных запросов SQLAlchemy сохраняются
+        # между запросами и переключениями (сбрасываются в delete_school_database)
         
         # Также очищаем стандартные кэши Flask-SQLAlchemy (на всякий случай)
         if hasattr(current_app, 'extensions') and 'sqlalchemy' in current_app.extensions:
@@ -651,16 +661,23 @@ def migrate_school_database(school_id, engine=None):
     """
     Выполняет миграции для БД школы
     Добавляет недостающие колонки и таблицы
+    
+    Если engine не передан, создается временный engine, который закрывается после миграции
+    
+    Returns:
+        bool: True, если миграция выполнена без ошибок
     """
-    if engine is None:
+    own_engine = engine is None
+    if own_engine:
         db_uri = get_school_db_uri(school_id)
         engine = create_engine(db_uri, echo=False)
     
     from sqlalchemy import text, inspect
-    from app.models.school import Cabinet, CabinetTeacher
-    inspector = inspect(engine)
+    from app.models.school import Cabinet, CabinetTeacher, ClassLoad, TeacherAssignment
     
     try:
+        inspector = inspect(engine)
+        
         # Проверяем наличие таблиц кабинетов
         tables = inspector.get_table_names()
         
@@ -740,10 +757,28 @@ def migrate_school_database(school_id, engine=None):
                     conn.execute(text("ALTER TABLE subjects ADD COLUMN category TEXT"))
                     conn.commit()
                 print(f"   ✅ Колонка category добавлена в таблицу subjects")
+        
+        # Добавляем индексы ClassLoad и TeacherAssignment, если их нет
+        # (БД, созданные до их появления в моделях)
+        for model in (ClassLoad, TeacherAssignment):
+            table_name = model.__tablename__
+            if table_name not in tables:
+                continue
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table_name)}
+            for index in model.__table__.indexes:
+                if index.name not in existing_indexes:
+                    print(f"   Миграция: Создание индекса {index.name} в таблице {table_name} для школы {school_id}...")
+                    index.create(engine, checkfirst=True)
+                    print(f"   ✅ Индекс {index.name} создан в таблице {table_name}")
+        return True
     except Exception as e:
         print(f"   ⚠️ Предупреждение при миграции БД школы {school_id}: {e}")
         import traceback
         traceback.print_exc()
+        return False
+    finally:
+        if own_engine:
+            engine.dispose()
 
 def delete_school_database(school_id):
     """
@@ -751,6 +786,11 @@ def delete_school_database(school_id):
     """
     db_path = get_school_db_path(school_id)
     
+    # Закрываем соединения закэшированного engine, иначе пул продолжит
+    # ссылаться на удаленный файл
+    if hasattr(db, 'clear_school_engine_cache'):
+        db.clear_school_engine_cache(get_school_db_uri(school_id))
+    
     # Удаляем файл БД
     if os.path.exists(db_path):
         try:
@@ -766,38 +806,16 @@ def clear_school_database(school_id):
     """
     Очистить все данные из БД школы (удалить все таблицы и создать заново)
     """
-    from app.models.school import (
-        Subject, Teacher, ClassGroup, ClassLoad, TeacherAssignment,
-        PermanentSchedule, TemporarySchedule, Shift, ScheduleSettings,
-        PromptClassSubject, PromptClassSubjectTeacher
-    )
+    from app.models.school import Subject
     
     try:
         # Используем прямой create_engine для очистки таблиц
         db_uri = get_school_db_uri(school_id)
         engine = create_engine(db_uri, echo=False)
         
-        # Фильтруем только модели с __bind_key__ = 'school'
-        from app.models.school import (
-            Subject, Teacher, ClassGroup, ClassLoad, TeacherAssignment,
-            PermanentSchedule, TemporarySchedule, Shift, ScheduleSettings,
-            PromptClassSubject, PromptClassSubjectTeacher,
-            SubjectCabinet
-        )
-        tables = [
-            Subject.__table__,
-            Teacher.__table__,
-            ClassGroup.__table__,
-            ClassLoad.__table__,
-            TeacherAssignment.__table__,
-            PermanentSchedule.__table__,
-            TemporarySchedule.__table__,
-            Shift.__table__,
-            ScheduleSettings.__table__,
-            PromptClassSubject.__table__,
-            PromptClassSubjectTeacher.__table__,
-            SubjectCabinet.__table__
-        ]
+        # Таблицы моделей с __bind_key__ = 'school' из SCHOOL_CLEARED_TABLES
+        school_tables = Subject.__table__.metadata.tables
+        tables = [school_tables[name] for name in SCHOOL_CLEARED_TABLES]
         
         # Удаляем все таблицы
         db.Model.metadata.drop_all(engine, tables=tables)
@@ -0,0 +1,68 @@
+"""
+Кэш в памяти процесса с ограничением времени жизни записей
+"""
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class TTLCache:
+    """
+    Словарь {ключ: значение}, записи которого живут ttl_seconds секунд
+    
+    При clear_on_commit кэш сбрасывается после любого commit сессии: commit может
+    изменить данные, из которых построены записи. Кэш и сброс действуют только в
+    текущем процессе, в других воркерах gunicorn запись устаревает не позже чем
+    через ttl_seconds.
+    """
+    
+    def __init__(self, ttl_seconds, maxsize=None, clear_on_commit=True):
+        """
+        Args:
+            ttl_seconds: Время жизни записи (секунды)
+            maxsize: Максимальное число записей (None - без ограничения)
+            clear_on_commit: Сбрасывать кэш после commit сессии
+        """
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        # {ключ: (время записи, значение)}, порядок вставки - от старых к новым
+        self._data = {}
+        self._lock = threading.Lock()
+        
+        if clear_on_commit:
+            event.listen(Session, 'after_commit', lambda session: self.clear())
+    
+    def get(self, key, default=None):
+        """Значение по ключу или default (нет записи или истек ttl_seconds)"""
+        with self._lock:
+            cached = self._data.get(key)
+            if cached is None:
+                return default
+            if time.monotonic() - cached[0] >= self.ttl_seconds:
+                del self._data[key]
+                return default
+            return cached[1]
+    
+    def set(self, key, value):
+        """Сохранить значение; при переполнении удаляются истекшие, затем самые старые записи"""
+        now = time.monotonic()
+        with self._lock:
+            self._data.pop(key, None)
+            if self.maxsize is not None and len(self._data) >= self.maxsize:
+                for stale_key in [k for k, (stored_at, _) in self._data.items() if now - stored_at >= self.ttl_seconds]:
+                    del self._data[stale_key]
+                while len(self._data) >= self.maxsize:
+                    del self._data[next(iter(self._data))]
+            self._data[key] = (now, value)
+    
+    def pop(self, key):
+        """Удалить запись по ключу"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        """Удалить все записи"""
+        with self._lock:
+            self._data.clear()
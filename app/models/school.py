@@ -73,7 +73,11 @@ class ClassLoad(db.Model):
     class_id = db.Column(db.Integer, ForeignKey('classes.id'), nullable=False)
     subject_id = db.Column(db.Integer, ForeignKey('subjects.id'), nullable=False)
     hours_per_week = db.Column(db.Integer, nullable=False)
-    __table_args__ = (UniqueConstraint('class_id', 'subject_id', name='uix_class_subject'),)  # Убрали shift_id из уникального ключа
+    __table_args__ = (
+        UniqueConstraint('class_id', 'subject_id', name='uix_class_subject'),  # Убрали shift_id из уникального ключа
+        db.Index('ix_classload_subject', 'subject_id'),  # Выборки нагрузки по предмету
+        db.Index('ix_classload_shift_class', 'shift_id', 'class_id'),  # Нагрузка классов смены
+    )
     
     shift = db.relationship('Shift', backref='class_loads')
     class_group = db.relationship('ClassGroup', backref='class_loads')
@@ -89,7 +93,11 @@ class TeacherAssignment(db.Model):
     class_id = db.Column(db.Integer, ForeignKey('classes.id'), nullable=False)
     hours_per_week = db.Column(db.Integer, default=0)
     default_cabinet = db.Column(db.String(10))
-    __table_args__ = (UniqueConstraint('shift_id', 'teacher_id', 'subject_id', 'class_id'),)
+    __table_args__ = (
+        UniqueConstraint('shift_id', 'teacher_id', 'subject_id', 'class_id'),
+        db.Index('ix_ta_subject', 'subject_id', 'shift_id'),  # Матрица предметов: назначения по предмету и смене
+        db.Index('ix_ta_shift_class_subject', 'shift_id', 'class_id', 'subject_id'),  # Назначения на класс и предмет в смене
+    )
     
     shift = db.relationship('Shift', backref='teacher_assignments')
     teacher = db.relationship('Teacher', backref='teacher_assignments')
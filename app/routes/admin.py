@@ -5,7 +5,7 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for
 import os
 from app.core.db_manager import db, school_db_context, create_school_database, clear_school_database
 from app.models.system import School
-from app.models.school import Subject, ClassLoad, Shift, ScheduleSettings, PermanentSchedule, ClassGroup, Teacher
+from app.models.school import Shift, ScheduleSettings, PermanentSchedule, ClassGroup, Teacher
 from app.services.excel_loader import load_class_load_excel, load_teacher_assignments_excel, load_teacher_contacts_excel
 from app.core.auth import admin_required, get_current_school_id, current_user
 from app.routes.utils import get_sorted_classes
@@ -52,15 +52,9 @@ def admin_index():
                     db.session.add(active_shift)
                     db.session.commit()
             
-            # Получаем предметы
-            try:
-                subjects = db.session.query(Subject).join(ClassLoad).filter(
-                    ClassLoad.shift_id == active_shift.id
-                ).distinct().order_by(Subject.name).all()
-            except Exception:
-                subjects = db.session.query(Subject).order_by(Subject.name).all()
-            
-            return render_template('admin/index.html', subjects=subjects, current_user=current_user, school_name=school_name)
+            # Шаблон главной страницы не выводит список предметов (они на странице /admin/subjects),
+            # поэтому предметы здесь не запрашиваются
+            return render_template('admin/index.html', current_user=current_user, school_name=school_name)
     except Exception as e:
         flash(f'Ошибка при загрузке данных: {str(e)}', 'danger')
         import traceback
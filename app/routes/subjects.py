@@ -9,7 +9,10 @@ from app.models.school import (
     SUBJECT_CATEGORY_HUMANITIES, SUBJECT_CATEGORY_NATURAL_MATH
 )
 from app.core.auth import admin_required, get_current_school_id, current_user
-from app.routes.utils import get_class_group, get_sorted_classes
+from app.routes.utils import (
+    get_class_group, get_sorted_classes, sort_classes_key,
+    get_cached_subject_matrix, cache_subject_matrix
+)
 
 subjects_bp = Blueprint('subjects', __name__)
 
@@ -286,6 +289,12 @@ def subjects_page():
                              subject_subgroups_info=subject_subgroups_info if subject_name else {})
 
 
+def _sorted_unique_classes(assignments):
+    """Уникальные классы из пар (класс, часы), отсортированные как в get_sorted_classes"""
+    classes = {cls['id']: cls for cls, _ in assignments if cls is not None}
+    return sorted(classes.values(), key=lambda cls: sort_classes_key(cls['name']))
+
+
 @subjects_bp.route('/admin/matrix/<subject_name>')
 @admin_required
 def subject_matrix(subject_name):
@@ -296,69 +305,89 @@ def subject_matrix(subject_name):
         return redirect(url_for('logout'))
     
     with school_db_context(school_id):
-        subject = db.session.query(Subject).filter_by(name=subject_name).first_or_404()
-        
-        active_shift = db.session.query(Shift).filter_by(is_active=True).first()
-        if not active_shift:
-            return redirect(url_for('admin.admin_index'))
+        # Контекст шаблона собирается из строк и словарей (без ORM-объектов) и кэшируется
+        # до ближайшего commit или на SUBJECT_MATRIX_CACHE_TTL_SECONDS
+        cache_key = (request.endpoint, school_id, subject_name)
+        context = get_cached_subject_matrix(cache_key)
+        if context is None:
+            subject = db.session.query(Subject.id, Subject.name).filter_by(name=subject_name).first_or_404()
+            
+            active_shift = db.session.query(Shift).filter_by(is_active=True).first()
+            if not active_shift:
+                return redirect(url_for('admin.admin_index'))
+            
+            context = _build_subject_matrix_context(subject, active_shift.id)
+            cache_subject_matrix(cache_key, context)
         
-        teachers = db.session.query(Teacher).join(TeacherAssignment).filter(
-            TeacherAssignment.subject_id == subject.id,
-            TeacherAssignment.shift_id == active_shift.id
-        ).distinct().order_by(Teacher.full_name).all()
+        return render_template('admin/subject_matrix.html', **context)
+
+
+def _build_subject_matrix_context(subject, shift_id):
+    """Контекст шаблона матрицы предмета для смены"""
+    # Учителя, их назначения по предмету в смене и классы - одним запросом
+    # Строки разворачиваются в матрицу: учитель -> [(класс, часы)]
+    teachers_by_id = {}
+    assignments_by_teacher = {}
+    for teacher_id, full_name, phone, hours, class_id, class_name in db.session.query(
+        Teacher.id, Teacher.full_name, Teacher.phone, TeacherAssignment.hours_per_week,
+        ClassGroup.id, ClassGroup.name
+    ).join(
+        TeacherAssignment, TeacherAssignment.teacher_id == Teacher.id
+    ).outerjoin(
+        ClassGroup, ClassGroup.id == TeacherAssignment.class_id
+    ).filter(
+        TeacherAssignment.subject_id == subject.id,
+        TeacherAssignment.shift_id == shift_id
+    ).order_by(Teacher.full_name, Teacher.id, TeacherAssignment.id):
+        if teacher_id not in teachers_by_id:
+            teachers_by_id[teacher_id] = {'id': teacher_id, 'full_name': full_name, 'phone': phone}
+        class_group = {'id': class_id, 'name': class_name} if class_id is not None else None
+        assignments_by_teacher.setdefault(teacher_id, []).append((class_group, hours))
+    
+    teachers = list(teachers_by_id.values())
+    
+    teachers_with_classes = []
+    for teacher in teachers:
+        teacher_assignments = assignments_by_teacher[teacher['id']]
         
-        teachers_with_classes = []
-        for teacher in teachers:
-            teacher_assignments = db.session.query(TeacherAssignment).filter_by(
-                teacher_id=teacher.id,
-                subject_id=subject.id,
-                shift_id=active_shift.id
-            ).all()
+        # Если у учителя только одно назначение с hours_per_week=0,
+        # это означает, что учитель добавлен к предмету, но классы еще не назначены
+        # В этом случае не показываем классы
+        if len(teacher_assignments) == 1:
+            hours = teacher_assignments[0][1]
+            # Проверяем строго: hours должен быть равен 0 (int или может быть None)
+            # Преобразуем в int для надежности
+            try:
+                hours_int = int(hours) if hours is not None else None
+            except (ValueError, TypeError):
+                hours_int = None
             
-            # Если у учителя только одно назначение с hours_per_week=0,
-            # это означает, что учитель добавлен к предмету, но классы еще не назначены
-            # В этом случае не показываем классы
-            if len(teacher_assignments) == 1:
-                first_assignment = teacher_assignments[0]
-                hours = getattr(first_assignment, 'hours_per_week', None)
-                # Проверяем строго: hours должен быть равен 0 (int или может быть None)
-                # Преобразуем в int для надежности
-                try:
-                    hours_int = int(hours) if hours is not None else None
-                except (ValueError, TypeError):
-                    hours_int = None
-                
-                if hours_int == 0:
-                    # Это маркер того, что учитель добавлен к предмету без классов
-                    classes = []
-                else:
-                    # Если hours != 0, обрабатываем нормально
-                    class_ids = list(set([ta.class_id for ta in teacher_assignments if ta.class_id]))
-                    classes = get_sorted_classes(db.session.query(ClassGroup).filter(ClassGroup.id.in_(class_ids))) if class_ids else []
-            elif len(teacher_assignments) == 0:
+            if hours_int == 0:
+                # Это маркер того, что учитель добавлен к предмету без классов
                 classes = []
             else:
-                class_ids = list(set([ta.class_id for ta in teacher_assignments if ta.class_id]))
-                classes = get_sorted_classes(db.session.query(ClassGroup).filter(ClassGroup.id.in_(class_ids))) if class_ids else []
-            
-            teachers_with_classes.append({
-                'teacher': teacher,
-                'classes': classes
-            })
-        
-        if teachers:
-            all_teachers = db.session.query(Teacher).filter(
-                ~Teacher.id.in_([t.id for t in teachers])
-            ).order_by(Teacher.full_name).all()
+                # Если hours != 0, обрабатываем нормально
+                classes = _sorted_unique_classes(teacher_assignments)
         else:
-            all_teachers = db.session.query(Teacher).order_by(Teacher.full_name).all()
-
-        return render_template('admin/subject_matrix.html',
-                               subject=subject, 
-                               teachers_with_classes=teachers_with_classes, 
-                               teachers=teachers, 
-                               all_teachers=all_teachers, 
-                               shift_id=active_shift.id)
+            classes = _sorted_unique_classes(teacher_assignments)
+        
+        teachers_with_classes.append({
+            'teacher': teacher,
+            'classes': classes
+        })
+    
+    all_teachers = db.session.query(Teacher.id, Teacher.full_name, Teacher.phone)
+    if teachers:
+        all_teachers = all_teachers.filter(~Teacher.id.in_(list(teachers_by_id)))
+    all_teachers = all_teachers.order_by(Teacher.full_name).all()
+    
+    return {
+        'subject': subject,
+        'teachers_with_classes': teachers_with_classes,
+        'teachers': teachers,
+        'all_teachers': all_teachers,
+        'shift_id': shift_id
+    }
 
 
 @subjects_bp.route('/admin/update_hours', methods=['POST'])
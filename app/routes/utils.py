@@ -2,7 +2,9 @@
 Вспомогательные функции для маршрутов
 """
 import re
+from sqlalchemy import event
 from app.core.db_manager import db
+from app.core.ttl_cache import TTLCache
 from app.models.school import ClassGroup, AIConversation, AIConversationMessage
 
 
@@ -77,6 +79,28 @@ def get_sorted_classes(query=None):
     return sorted(classes, key=lambda cls: sort_classes_key(cls.name))
 
 
+# Кэш данных матрицы предмета (subject_matrix)
+SUBJECT_MATRIX_CACHE_TTL_SECONDS = 60
+
+# {(endpoint, school_id, название предмета): контекст шаблона без ORM-объектов}
+_subject_matrix_cache = TTLCache(SUBJECT_MATRIX_CACHE_TTL_SECONDS)
+
+def clear_subject_matrix_cache():
+    """Сбросить кэш матриц предметов"""
+    _subject_matrix_cache.clear()
+
+# Очистка БД школы пересоздает таблицы через metadata.drop_all без commit сессии
+event.listen(db.Model.metadata, 'after_drop', lambda target, connection, **kw: clear_subject_matrix_cache())
+
+def get_cached_subject_matrix(cache_key):
+    """Контекст матрицы предмета из кэша или None (нет записи или истек SUBJECT_MATRIX_CACHE_TTL_SECONDS)"""
+    return _subject_matrix_cache.get(cache_key)
+
+def cache_subject_matrix(cache_key, context):
+    """Сохранить контекст матрицы предмета в кэш"""
+    _subject_matrix_cache.set(cache_key, context)
+
+
 def ensure_ai_tables_exist():
     """Проверяет и создает таблицы для диалога с ИИ, если их нет"""
     try:
@@ -1,10 +1,184 @@
 # app/services/excel_loader.py
+import openpyxl
 import pandas as pd
 import re
+from functools import wraps
+from sqlalchemy import insert, inspect, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app.core.db_manager import db
 from app.models.school import Subject, Teacher, ClassGroup, ClassLoad, TeacherAssignment, Cabinet, CabinetTeacher
 
+# Пакетные INSERT/UPDATE (список словарей в session.execute) вместо устаревших bulk_*_mappings
+# Операторы создаются один раз, параметры передаются при выполнении
+_INSERT_CLASS_LOAD = insert(ClassLoad)
+_UPDATE_CLASS_LOAD = update(ClassLoad)
+_INSERT_TEACHER_ASSIGNMENT = insert(TeacherAssignment)
+_INSERT_CABINET_TEACHER = insert(CabinetTeacher)
 
+# Upsert нагрузки одним оператором: при совпадении (класс, предмет) обновляются часы
+# и снимается привязка к смене (нагрузка общая для всех смен)
+_upsert_class_load = sqlite_insert(ClassLoad)
+_UPSERT_CLASS_LOAD = _upsert_class_load.on_conflict_do_update(
+    index_elements=[ClassLoad.class_id, ClassLoad.subject_id],
+    set_={'shift_id': None, 'hours_per_week': _upsert_class_load.excluded.hours_per_week}
+)
+
+
+def _bulk_load(func):
+    """
+    Декоратор загрузчика: файл загружается одной транзакцией без autoflush
+    При ошибке откатываются все изменения файла
+    Для SQLite на время загрузки ослабляется синхронизация с диском (PRAGMA synchronous=NORMAL),
+    временные структуры держатся в памяти (PRAGMA temp_store=MEMORY); после загрузки значения восстанавливаются
+    """
+    @wraps(func)
+    def decorated_function(*args, **kwargs):
+        connection = db.session.connection(bind_arguments={'mapper': ClassGroup.__mapper__})
+        dbapi_connection = connection.connection.dbapi_connection
+        
+        # synchronous нельзя менять внутри транзакции, поэтому PRAGMA только вне ее
+        # Соединение возвращается в пул и переиспользуется, поэтому исходные значения восстанавливаются
+        previous_synchronous = previous_temp_store = None
+        if connection.dialect.name == 'sqlite' and not dbapi_connection.in_transaction:
+            previous_synchronous = dbapi_connection.execute('PRAGMA synchronous').fetchone()[0]
+            previous_temp_store = dbapi_connection.execute('PRAGMA temp_store').fetchone()[0]
+            dbapi_connection.execute('PRAGMA synchronous=NORMAL')
+            dbapi_connection.execute('PRAGMA temp_store=MEMORY')
+        
+        try:
+            with db.session.no_autoflush:
+                result = func(*args, **kwargs)
+            db.session.commit()
+            return result
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            if previous_synchronous is not None:
+                dbapi_connection.execute(f'PRAGMA synchronous={int(previous_synchronous)}')
+                dbapi_connection.execute(f'PRAGMA temp_store={int(previous_temp_store)}')
+    
+    return decorated_function
+
+
+# (URI БД, таблица, столбцы), для которых уникальный ключ уже найден
+_unique_keys_found = set()
+
+
+def _has_unique_key(model, columns):
+    """
+    Проверяет, есть ли в БД школы уникальный ключ по столбцам columns
+    Старые БД школ могли быть созданы с другим ключом (например, с shift_id)
+    Запоминаются только найденные ключи: таблицы пересоздаются только с новым ключом
+    """
+    connection = db.session.connection(bind_arguments={'mapper': model.__mapper__})
+    if connection.dialect.name != 'sqlite':
+        return False
+    
+    table_name = model.__tablename__
+    column_names = tuple(column.key for column in columns)
+    cache_key = (str(connection.engine.url), table_name, column_names)
+    if cache_key in _unique_keys_found:
+        return True
+    
+    inspector = inspect(connection)
+    unique_keys = {tuple(constraint['column_names']) for constraint in inspector.get_unique_constraints(table_name)}
+    unique_keys.update(tuple(index['column_names']) for index in inspector.get_indexes(table_name) if index['unique'])
+    if column_names not in unique_keys:
+        return False
+    
+    _unique_keys_found.add(cache_key)
+    return True
+
+
+def _insert_missing(model, key_column, rows, index):
+    """
+    Добавляет одним INSERT строки, ключей которых нет в index, и дополняет index их id
+    
+    Args:
+        model: модель таблицы
+        key_column: столбец-ключ (например, ClassGroup.name) или кортеж столбцов
+            (тогда ключ - кортеж значений)
+        rows: словарь {ключ: словарь значений столбцов}
+        index: словарь {ключ: id} уже существующих записей
+    """
+    missing = {key: row for key, row in rows.items() if key not in index}
+    if not missing:
+        return
+    
+    composite = isinstance(key_column, tuple)
+    key_columns = key_column if composite else (key_column,)
+    
+    # id новых записей возвращаются тем же запросом (RETURNING, SQLite 3.35+);
+    # insertmanyvalues объединяет строки в многострочные INSERT по insertmanyvalues_page_size
+    if db.session.get_bind(mapper=model.__mapper__).dialect.insert_executemany_returning:
+        inserted = db.session.execute(
+            insert(model).returning(*key_columns, model.id), list(missing.values())
+        ).tuples().all()
+    else:
+        db.session.execute(insert(model), list(missing.values()))
+        query = db.session.query(*key_columns, model.id)
+        if not composite:
+            query = query.filter(key_column.in_(list(missing)))
+        inserted = query.all()
+    
+    for *key, record_id in inserted:
+        key = tuple(key) if composite else key[0]
+        if key in missing:
+            index[key] = record_id
+
+
+def _iter_excel_rows(filepath):
+    """
+    Читает первый лист Excel за один проход (openpyxl, read_only), не загружая файл в DataFrame
+    Первая строка листа - названия столбцов, полностью пустые строки и столбцы пропускаются
+    
+    Returns:
+        (columns, rows): список названий столбцов и генератор строк {столбец: значение}
+    """
+    # Пустой столбец виден только после чтения всех строк, поэтому непустые строки
+    # сохраняются кортежами значений (намного легче DataFrame) - книга разбирается
+    # один раз и закрывается сразу после чтения
+    workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        sheet_rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(sheet_rows, ())
+        data = [values for values in sheet_rows if any(value is not None for value in values)]
+    finally:
+        workbook.close()
+    
+    # Столбцы, в которых есть хотя бы одно значение
+    used = set()
+    for values in data:
+        used.update(i for i, value in enumerate(values) if value is not None)
+    
+    # Названия столбцов как в pandas: пустой заголовок - "Unnamed: N", повторы - "Имя.1"
+    columns = []
+    seen = {}
+    for i in sorted(used):
+        name = header[i] if i < len(header) and header[i] is not None else f'Unnamed: {i}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        columns.append((i, name))
+    
+    rows = ({name: values[i] if i < len(values) else None for i, name in columns} for values in data)
+    return [name for _, name in columns], rows
+
+
+def _make_short_name(full_name):
+    """
+    Короткое имя учителя: инициалы по первым двум словам ФИО
+    """
+    parts = full_name.split()
+    if len(parts) >= 2:
+        return parts[0][0] + "." + parts[1][0] + "."
+    return parts[0][:2] + "."
+
+
+@_bulk_load
 def load_class_load_excel(filepath, shift_id=None, school_id=None):
     """
     Загружает файл 'Часы_Класс_Предмет'
@@ -21,25 +195,34 @@ def load_class_load_excel(filepath, shift_id=None, school_id=None):
     
     # Если shift_id не указан, создаем смены для каждого листа
     if not shift_id:
-        for sheet_name in sheet_names:
-            # Создаем или находим смену с названием листа
-            shift = db.session.query(Shift).filter_by(name=sheet_name).first()
-            if not shift:
-                shift = Shift(name=sheet_name, is_active=False)
-                db.session.add(shift)
-                db.session.flush()
-                
-                # Создаем настройки по умолчанию для смены
-                for day in range(1, 8):
-                    setting = ScheduleSettings(shift_id=shift.id, day_of_week=day, lessons_count=6)
-                    db.session.add(setting)
-                db.session.flush()
-                
-                created_shifts[sheet_name] = shift.id
-            else:
-                created_shifts[sheet_name] = shift.id
+        # Находим смены с названиями листов (при совпадении названий - смена с меньшим id)
+        shift_ids = dict(
+            db.session.query(Shift.name, Shift.id).filter(Shift.name.in_(sheet_names)).order_by(Shift.id.desc()).all()
+        )
+        new_sheet_names = [sheet_name for sheet_name in sheet_names if sheet_name not in shift_ids]
         
-        db.session.commit()
+        # Недостающие смены создаются одним INSERT, затем настройки по умолчанию для них
+        _insert_missing(Shift, Shift.name, {
+            sheet_name: {'name': sheet_name, 'is_active': False} for sheet_name in new_sheet_names
+        }, shift_ids)
+        settings = [
+            {'shift_id': shift_ids[sheet_name], 'day_of_week': day, 'lessons_count': 6}
+            for sheet_name in new_sheet_names
+            for day in range(1, 8)
+        ]
+        if settings:
+            db.session.execute(insert(ScheduleSettings), settings)
+        
+        created_shifts = {sheet_name: shift_ids[sheet_name] for sheet_name in sheet_names}
+    
+    # Справочники загружаются один раз, дальше поиск идет по словарям
+    class_ids = dict(db.session.query(ClassGroup.name, ClassGroup.id).all())
+    subject_ids = dict(db.session.query(Subject.name, Subject.id).all())
+    
+    # Классы, предметы и часы со всех листов; более поздний лист перекрывает ранний
+    class_names = {}
+    subject_names = {}
+    hours_by_pair = {}
     
     # Обрабатываем каждый лист
     for sheet_name in sheet_names:
@@ -51,7 +234,7 @@ def load_class_load_excel(filepath, shift_id=None, school_id=None):
                 continue
         
         # Читаем лист
-        df = pd.read_excel(filepath, sheet_name=sheet_name)
+        df = excel_file.parse(sheet_name)
         
         # Убираем полностью пустые строки и столбцы
         df = df.dropna(how='all').dropna(axis=1, how='all')
@@ -78,78 +261,66 @@ def load_class_load_excel(filepath, shift_id=None, school_id=None):
         # Убираем строки с пустым индексом (класс)
         df_indexed = df_indexed[df_indexed.index.notna()]
         df_indexed.index = df_indexed.index.astype(str).str.strip()
+        df_indexed = df_indexed[(df_indexed.index != '') & (df_indexed.index.str.lower() != 'nan')]
         
         # Получаем список предметов (столбцов) после установки индекса
         subject_columns = [col for col in df_indexed.columns if not pd.isna(col) and str(col).strip().lower() not in ['nan', '']]
         
-        # Проходим по всем строкам (классам) и столбцам (предметам)
-        for class_name in df_indexed.index:
-            if not class_name or str(class_name).lower() == 'nan':
-                continue
-            
-            # Создаем или находим класс
-            cls = db.session.query(ClassGroup).filter_by(name=str(class_name)).first()
-            if not cls:
-                cls = ClassGroup(name=str(class_name))
-                db.session.add(cls)
-            db.session.flush()
-            
-            # Проходим по всем столбцам (предметам)
-            for subject_name in subject_columns:
-                subject_name_clean = str(subject_name).strip()
-                
-                if not subject_name_clean or subject_name_clean.lower() in ['nan', '']:
-                    continue
-                
-                # Получаем количество часов из ячейки с обработкой ошибок
-                try:
-                    # Проверяем, что и класс, и предмет существуют в DataFrame
-                    if class_name not in df_indexed.index:
-                        continue
-                    if subject_name not in df_indexed.columns:
-                        continue
-                    
-                    cell_value = df_indexed.loc[class_name, subject_name]
-                except (KeyError, IndexError, TypeError) as e:
-                    # Пропускаем, если не удалось получить значение
-                    continue
-                
-                if pd.isna(cell_value):
-                    continue
-                
-                # Преобразуем в число
-                try:
-                    hours = int(float(cell_value))
-                except (ValueError, TypeError):
-                    continue
-                
-                if hours <= 0:
-                    continue
-                
-                # Создаем или находим предмет
-                subj = db.session.query(Subject).filter_by(name=subject_name_clean).first()
-                if not subj:
-                    subj = Subject(name=subject_name_clean)
-                    db.session.add(subj)
-                db.session.flush()
-                
-                # Нагрузка (общая для всех смен, shift_id = None)
-                # Проверяем существующую нагрузку без привязки к смене
-                load = db.session.query(ClassLoad).filter_by(shift_id=None, class_id=cls.id, subject_id=subj.id).first()
-                if load:
-                    load.hours_per_week = hours
-                else:
-                    # Если нет общей нагрузки, проверяем, есть ли для конкретной смены (для обратной совместимости)
-                    load = db.session.query(ClassLoad).filter_by(shift_id=current_shift_id, class_id=cls.id, subject_id=subj.id).first()
-                    if load:
-                        # Обновляем существующую, убирая привязку к смене
-                        load.shift_id = None
-                        load.hours_per_week = hours
-                    else:
-                        # Создаем новую нагрузку без привязки к смене
-                        db.session.add(ClassLoad(shift_id=None, class_id=cls.id, subject_id=subj.id, hours_per_week=hours))
+        # Класс создается, даже если у него нет часов
+        class_names.update((name, {'name': name}) for name in df_indexed.index)
+        
+        # Часы приводятся к числам сразу по столбцам: нечисловые ячейки становятся NaN
+        hours_table = df_indexed[subject_columns].apply(pd.to_numeric, errors='coerce')
+        hours_table.columns = [str(col).strip() for col in subject_columns]
+        
+        # Длинный формат (класс, предмет) -> часы: stack отбрасывает пустые ячейки,
+        # дробные значения отсекаются до целых, остаются только положительные
+        hours_series = hours_table.stack()
+        hours_series = hours_series[hours_series.abs() != float('inf')].astype('int64')
+        hours_series = hours_series[hours_series > 0]
         
-        db.session.commit()
+        # При повторе пары (класс, предмет) побеждает последнее значение
+        subject_names.update((name, {'name': name}) for name in hours_series.index.get_level_values(1))
+        hours_by_pair.update(zip(hours_series.index, hours_series.tolist()))
+    
+    # Недостающие классы и предметы добавляются пачкой
+    _insert_missing(ClassGroup, ClassGroup.name, class_names, class_ids)
+    _insert_missing(Subject, Subject.name, subject_names, subject_ids)
+    
+    # Нагрузка общая для всех смен (shift_id = None)
+    loads = [
+        {'shift_id': None, 'class_id': class_ids[class_name], 'subject_id': subject_ids[subject_name], 'hours_per_week': hours}
+        for (class_name, subject_name), hours in hours_by_pair.items()
+    ]
+    if not loads:
+        return created_shifts if not shift_id else None
+    
+    # Если в БД есть уникальный ключ (класс, предмет) - один INSERT ... ON CONFLICT DO UPDATE без чтения
+    if _has_unique_key(ClassLoad, (ClassLoad.class_id, ClassLoad.subject_id)):
+        db.session.execute(_UPSERT_CLASS_LOAD, loads)
+        return created_shifts if not shift_id else None
+    
+    # Иначе существующая запись ищется по (класс, предмет) без учета смены
+    load_ids = {
+        (class_id, subject_id): load_id
+        for load_id, class_id, subject_id in db.session.query(ClassLoad.id, ClassLoad.class_id, ClassLoad.subject_id)
+    }
+    
+    # Новые записи вставляются, существующие обновляются с удалением привязки к смене (для обратной совместимости)
+    to_insert = []
+    to_update = []
+    for load in loads:
+        load_id = load_ids.get((load['class_id'], load['subject_id']))
+        if load_id:
+            to_update.append({'id': load_id, 'shift_id': None, 'hours_per_week': load['hours_per_week']})
+        else:
+            to_insert.append(load)
+    
+    if to_insert:
+        db.session.execute(_INSERT_CLASS_LOAD, to_insert)
+    if to_update:
+        # UPDATE по первичному ключу (id в каждом словаре)
+        db.session.execute(_UPDATE_CLASS_LOAD, to_update)
     
     return created_shifts if not shift_id else None
 
@@ -180,6 +351,7 @@ def parse_teacher_names(cell_value):
     return result
 
 
+@_bulk_load
 def load_teacher_assignments_excel(filepath, shift_id=None, school_id=None):
     """
     Загружает файл 'Учителя_Предмет'
@@ -187,152 +359,122 @@ def load_teacher_assignments_excel(filepath, shift_id=None, school_id=None):
     ВАЖНО: Учителя добавляются к предмету БЕЗ автоматического назначения на классы.
     Классы нужно назначать вручную через интерфейс админ-панели.
     """
-    df = pd.read_excel(filepath)
-
-    # Убираем полностью пустые строки и столбцы
-    df = df.dropna(how='all').dropna(axis=1, how='all')
+    # Строки читаются потоково, полностью пустые строки и столбцы пропускаются
+    columns, rows = _iter_excel_rows(filepath)
 
     # Определяем структуру: столбцы = предметы, строки могут быть любыми (или одна строка)
     # Если есть столбец с "Класс", убираем его - нам он не нужен
     
     # Ищем столбец с классами и удаляем его, если есть
     class_col = None
-    for col in df.columns:
+    for col in columns:
         col_lower = str(col).strip().lower()
         if any(word in col_lower for word in ['класс', 'class']):
             class_col = col
             break
     
     if class_col:
-        df = df.drop(columns=[class_col])
+        columns.remove(class_col)
     
     # Если первый столбец выглядит как "Класс", тоже удаляем
-    if df.columns[0] and any(word in str(df.columns[0]).strip().lower() for word in ['класс', 'class']):
-        df = df.drop(columns=[df.columns[0]])
+    if columns and any(word in str(columns[0]).strip().lower() for word in ['класс', 'class']):
+        columns.pop(0)
 
     if not shift_id:
         return
 
-    # Проходим по всем столбцам (предметам)
-    for subject_name in df.columns:
+    # Предметы и их учителя из файла (порядок сохраняется, дубликаты убираются)
+    teachers_by_subject = {}
+    subject_columns = []
+    for subject_name in columns:
         if pd.isna(subject_name) or str(subject_name).strip().lower() in ['nan', '']:
             continue
-
-        subject_name = str(subject_name).strip()
-        
-        # Создаем или находим предмет
-        subj = db.session.query(Subject).filter_by(name=subject_name).first()
-        if not subj:
-            subj = Subject(name=subject_name)
-            db.session.add(subj)
-        db.session.flush()
-
-        # Собираем всех учителей для этого предмета из всех строк
-        all_teachers = []
-        for idx in df.index:
-            try:
-                # Проверяем, что столбец существует
-                if subject_name not in df.columns:
-                    continue
-                cell_value = df.loc[idx, subject_name]
-            except (KeyError, IndexError, TypeError):
-                continue
-            teacher_names = parse_teacher_names(cell_value)
-            all_teachers.extend(teacher_names)
-        
-        # Убираем дубликаты
-        all_teachers = list(set(all_teachers))
-
-        if not all_teachers:
+        teachers_by_subject.setdefault(str(subject_name).strip(), {})
+        subject_columns.append(subject_name)
+    
+    # Собираем всех учителей для каждого предмета из всех строк
+    for row in rows:
+        for subject_name in subject_columns:
+            subject_teachers = teachers_by_subject[str(subject_name).strip()]
+            for teacher_name in parse_teacher_names(row[subject_name]):
+                subject_teachers[teacher_name] = None
+    
+    # Справочники загружаются один раз, дальше поиск идет по словарям
+    subject_ids = dict(db.session.query(Subject.name, Subject.id).all())
+    # При совпадении ФИО используется учитель с меньшим id
+    teacher_ids = dict(db.session.query(Teacher.full_name, Teacher.id).order_by(Teacher.id.desc()).all())
+    
+    # Предметы создаются даже без учителей, учителя - только для предметов с учителями
+    _insert_missing(Subject, Subject.name, {name: {'name': name} for name in teachers_by_subject}, subject_ids)
+    # Короткие имена строятся один раз на каждого нового учителя, а не на каждую пару предмет-учитель
+    new_teacher_names = dict.fromkeys(
+        teacher_name
+        for subject_teachers in teachers_by_subject.values()
+        for teacher_name in subject_teachers
+        if teacher_name not in teacher_ids
+    )
+    _insert_missing(Teacher, Teacher.full_name, {
+        teacher_name: {'full_name': teacher_name, 'short_name': _make_short_name(teacher_name)}
+        for teacher_name in new_teacher_names
+    }, teacher_ids)
+    
+    # Учителя, уже добавленные к предметам в данной смене
+    assigned_pairs = set(db.session.query(TeacherAssignment.teacher_id, TeacherAssignment.subject_id).filter_by(shift_id=shift_id).all())
+    
+    # Первый класс, где есть предмет в данной смене, и первый класс вообще (если у предмета нет классов)
+    first_class_by_subject = {}
+    for subject_id, class_id in db.session.query(ClassLoad.subject_id, ClassLoad.class_id).filter_by(shift_id=shift_id).order_by(ClassLoad.id):
+        first_class_by_subject.setdefault(subject_id, class_id)
+    any_class_id = db.session.query(ClassGroup.id).limit(1).scalar()
+    
+    # ВАЖНО: НЕ создаем автоматически назначения на классы
+    # Учитель будет добавлен к предмету, но БЕЗ классов
+    # Классы нужно назначать вручную через интерфейс админ-панели
+    #
+    # Если назначений учителя на предмет нет, создаем минимальную запись для первого класса
+    # Это нужно только для того, чтобы учитель отображался в списке учителей предмета
+    # В интерфейсе будет показано, что классы не назначены, и админ должен проставить галочки вручную
+    new_assignments = []
+    for subject_name, subject_teachers in teachers_by_subject.items():
+        subject_id = subject_ids[subject_name]
+        class_id = first_class_by_subject.get(subject_id, any_class_id)
+        if not class_id:
             continue
-
-        # Находим все классы, где есть этот предмет в данной смене
-        class_loads = db.session.query(ClassLoad).filter_by(shift_id=shift_id, subject_id=subj.id).all()
         
-        # Для каждого учителя создаем или находим его
-        for teacher_name in all_teachers:
-            if not teacher_name or str(teacher_name).strip().lower() in ['nan', '']:
+        for teacher_name in subject_teachers:
+            teacher_id = teacher_ids[teacher_name]
+            if (teacher_id, subject_id) in assigned_pairs:
                 continue
-
-            teacher_name = str(teacher_name).strip()
-
-            # Создаем или находим учителя
-            teacher = db.session.query(Teacher).filter_by(full_name=teacher_name).first()
-            if not teacher:
-                # Генерируем короткое имя
-                parts = teacher_name.split()
-                if len(parts) >= 2:
-                    short = parts[0][0] + "." + parts[1][0] + "."
-                else:
-                    short = parts[0][:2] + "."
-                teacher = Teacher(full_name=teacher_name, short_name=short)
-                db.session.add(teacher)
-            db.session.flush()
-
-            # ВАЖНО: НЕ создаем автоматически назначения на классы
-            # Учитель будет добавлен к предмету, но БЕЗ классов
-            # Классы нужно назначать вручную через интерфейс админ-панели
-            
-            # Проверяем, есть ли уже хотя бы одно назначение этого учителя на этот предмет
-            # Если есть - значит учитель уже добавлен к предмету, пропускаем
-            existing_assignment = db.session.query(TeacherAssignment).filter_by(
-                shift_id=shift_id,
-                teacher_id=teacher.id,
-                subject_id=subj.id
-            ).first()
-            
-            # Если назначений нет, создаем минимальную запись для первого класса (если есть классы)
-            # Это нужно только для того, чтобы учитель отображался в списке учителей предмета
-            # В интерфейсе будет показано, что классы не назначены, и админ должен проставить галочки вручную
-            if not existing_assignment:
-                if class_loads:
-                    # Создаем назначение только для первого класса (как маркер, что учитель добавлен к предмету)
-                    # Это позволит учителю отображаться в списке, но в интерфейсе будет показано, что классы не назначены
-                    # Админ должен вручную проставить галочки для нужных классов
-                    first_class_id = class_loads[0].class_id
-                    db.session.add(TeacherAssignment(
-                        shift_id=shift_id,
-                        teacher_id=teacher.id,
-                        subject_id=subj.id,
-                        class_id=first_class_id,
-                        hours_per_week=0,
-                        default_cabinet=None
-                    ))
-                else:
-                    # Если классов нет, создаем временную запись с первым доступным классом из всех классов
-                    # или просто пропускаем - учитель будет добавлен вручную позже
-                    # Но лучше создать запись, чтобы учитель отображался
-                    first_class = db.session.query(ClassGroup).first()
-                    if first_class:
-                        db.session.add(TeacherAssignment(
-                            shift_id=shift_id,
-                            teacher_id=teacher.id,
-                            subject_id=subj.id,
-                            class_id=first_class.id,
-                            hours_per_week=0,
-                            default_cabinet=None
-                        ))
-
-    db.session.commit()
+            assigned_pairs.add((teacher_id, subject_id))
+            new_assignments.append({
+                'shift_id': shift_id,
+                'teacher_id': teacher_id,
+                'subject_id': subject_id,
+                'class_id': class_id,
+                'hours_per_week': 0,
+                'default_cabinet': None
+            })
+    
+    if new_assignments:
+        db.session.execute(_INSERT_TEACHER_ASSIGNMENT, new_assignments)
 
 
+@_bulk_load
 def load_teacher_contacts_excel(filepath, shift_id=None, school_id=None):
     """
     Загружает файл 'Учителя_Контакты'
     Формат: столбцы с именами учителей, телефонами и Telegram ID
     Обновляет поля phone и telegram_id для существующих учителей
     """
-    df = pd.read_excel(filepath)
-    
-    # Убираем полностью пустые строки и столбцы
-    df = df.dropna(how='all').dropna(axis=1, how='all')
+    # Строки читаются потоково, полностью пустые строки и столбцы пропускаются
+    columns, rows = _iter_excel_rows(filepath)
     
     # Ищем столбцы с именами, телефонами и Telegram ID
     name_col = None
     phone_col = None
     telegram_id_col = None
     
-    for col in df.columns:
+    for col in columns:
         col_lower = str(col).strip().lower()
         # Ищем столбец с именем учителя
         if name_col is None and any(word in col_lower for word in ['учитель', 'имя', 'фио', 'teacher', 'name', 'full_name']):
@@ -345,12 +487,12 @@ def load_teacher_contacts_excel(filepath, shift_id=None, school_id=None):
             telegram_id_col = col
     
     # Если не нашли столбцы по названиям, используем первые столбцы
-    if name_col is None and len(df.columns) > 0:
-        name_col = df.columns[0]
-    if phone_col is None and len(df.columns) > 1:
-        phone_col = df.columns[1]
-    if telegram_id_col is None and len(df.columns) > 2:
-        telegram_id_col = df.columns[2]
+    if name_col is None and len(columns) > 0:
+        name_col = columns[0]
+    if phone_col is None and len(columns) > 1:
+        phone_col = columns[1]
+    if telegram_id_col is None and len(columns) > 2:
+        telegram_id_col = columns[2]
     
     if not name_col:
         raise ValueError("Не удалось найти столбец с именами учителей")
@@ -358,10 +500,13 @@ def load_teacher_contacts_excel(filepath, shift_id=None, school_id=None):
     updated_count = 0
     created_count = 0
     
+    # Учителя загружаются один раз; при совпадении ФИО используется учитель с меньшим id
+    teachers = {teacher.full_name: teacher for teacher in db.session.query(Teacher).order_by(Teacher.id.desc())}
+    
     # Проходим по всем строкам
-    for idx in df.index:
+    for row in rows:
         # Получаем имя учителя
-        teacher_name = df.loc[idx, name_col]
+        teacher_name = row[name_col]
         if pd.isna(teacher_name) or str(teacher_name).strip().lower() in ['nan', '']:
             continue
         
@@ -370,7 +515,7 @@ def load_teacher_contacts_excel(filepath, shift_id=None, school_id=None):
         # Получаем телефон, если есть столбец
         phone = None
         if phone_col:
-            phone_value = df.loc[idx, phone_col]
+            phone_value = row[phone_col]
             if not pd.isna(phone_value):
                 phone = str(phone_value).strip()
                 if phone.lower() in ['nan', 'none', '']:
@@ -379,14 +524,14 @@ def load_teacher_contacts_excel(filepath, shift_id=None, school_id=None):
         # Получаем Telegram ID, если есть столбец
         telegram_id = None
         if telegram_id_col:
-            telegram_id_value = df.loc[idx, telegram_id_col]
+            telegram_id_value = row[telegram_id_col]
             if not pd.isna(telegram_id_value):
                 telegram_id = str(telegram_id_value).strip()
                 if telegram_id.lower() in ['nan', 'none', '']:
                     telegram_id = None
         
         # Ищем учителя по имени
-        teacher = db.session.query(Teacher).filter_by(full_name=teacher_name).first()
+        teacher = teachers.get(teacher_name)
         
         if teacher:
             # Обновляем существующего учителя
@@ -401,26 +546,20 @@ def load_teacher_contacts_excel(filepath, shift_id=None, school_id=None):
                 updated_count += 1
         else:
             # Создаем нового учителя, если его нет
-            # Генерируем короткое имя
-            parts = teacher_name.split()
-            if len(parts) >= 2:
-                short = parts[0][0] + "." + parts[1][0] + "."
-            else:
-                short = parts[0][:2] + "."
-            
             teacher = Teacher(
                 full_name=teacher_name,
-                short_name=short,
+                short_name=_make_short_name(teacher_name),
                 phone=phone,
                 telegram_id=telegram_id
             )
             db.session.add(teacher)
+            teachers[teacher_name] = teacher
             created_count += 1
     
-    db.session.commit()
     return updated_count, created_count
 
 
+@_bulk_load
 def load_cabinets_excel(filepath, school_id=None):
     """
     Загружает файл 'Учителя_Кабинет'
@@ -429,17 +568,15 @@ def load_cabinets_excel(filepath, school_id=None):
     Автоматически привязывает кабинеты к предметам на основе учителей
     ВАЖНО: Использует существующих учителей из БД, не создает дубли
     """
-    df = pd.read_excel(filepath)
-    
-    # Убираем полностью пустые строки и столбцы
-    df = df.dropna(how='all').dropna(axis=1, how='all')
+    # Строки читаются потоково, полностью пустые строки и столбцы пропускаются
+    columns, rows = _iter_excel_rows(filepath)
     
     # Ищем столбцы
     cabinet_col = None
     teachers_col = None
     subject_col = None  # Опциональный столбец с предметом
     
-    for col in df.columns:
+    for col in columns:
         col_lower = str(col).strip().lower()
         if cabinet_col is None and any(word in col_lower for word in ['кабинет', 'cabinet', 'номер']):
             cabinet_col = col
@@ -451,21 +588,21 @@ def load_cabinets_excel(filepath, school_id=None):
     # Если не нашли по названиям, используем стандартные
     if cabinet_col is None:
         # Ищем столбец "Кабинет"
-        for col in df.columns:
+        for col in columns:
             if 'кабинет' in str(col).lower():
                 cabinet_col = col
                 break
-        if cabinet_col is None and len(df.columns) >= 2:
-            cabinet_col = df.columns[1]  # Второй столбец обычно кабинет
+        if cabinet_col is None and len(columns) >= 2:
+            cabinet_col = columns[1]  # Второй столбец обычно кабинет
     
     if teachers_col is None:
         # Ищем столбец "Учителя"
-        for col in df.columns:
+        for col in columns:
             if 'учител' in str(col).lower():
                 teachers_col = col
                 break
-        if teachers_col is None and len(df.columns) >= 3:
-            teachers_col = df.columns[2]  # Третий столбец обычно учителя
+        if teachers_col is None and len(columns) >= 3:
+            teachers_col = columns[2]  # Третий столбец обычно учителя
     
     if not cabinet_col or not teachers_col:
         raise ValueError("Не удалось найти столбцы 'Кабинет' и 'Учителя' в файле")
@@ -478,10 +615,43 @@ def load_cabinets_excel(filepath, school_id=None):
     created_links = 0
     skipped_teachers = 0
     
+    # Справочники загружаются один раз, дальше поиск идет по словарям
+    subject_ids = dict(db.session.query(Subject.name, Subject.id).all())
+    # При совпадении ФИО используется учитель с меньшим id
+    teacher_ids = dict(db.session.query(Teacher.full_name, Teacher.id).order_by(Teacher.id.desc()).all())
+    cabinet_ids = {
+        (name, subject_id): cabinet_id
+        for cabinet_id, name, subject_id in db.session.query(Cabinet.id, Cabinet.name, Cabinet.subject_id)
+    }
+    new_cabinets = {}
+    
+    # Связи учитель-кабинет по ключу кабинета (название, предмет): у новых кабинетов еще нет id
+    existing_links = set(
+        db.session.query(Cabinet.name, Cabinet.subject_id, CabinetTeacher.teacher_id)
+        .join(CabinetTeacher, CabinetTeacher.cabinet_id == Cabinet.id)
+        .all()
+    )
+    new_links = []
+    
+    # Назначения с кабинетом по умолчанию: кабинет -> [(teacher_id, subject_id)]
+    assignments_by_cabinet = {}
+    for cabinet_name, teacher_id, subject_id in db.session.query(
+        TeacherAssignment.default_cabinet, TeacherAssignment.teacher_id, TeacherAssignment.subject_id
+    ).filter(TeacherAssignment.default_cabinet.isnot(None)).order_by(TeacherAssignment.id):
+        assignments_by_cabinet.setdefault(cabinet_name, []).append((teacher_id, subject_id))
+    
+    def add_cabinet(cabinet_name, subject_id):
+        """Запоминает новый кабинет для вставки, возвращает True, если такого кабинета еще нет"""
+        key = (cabinet_name, subject_id)
+        if key in cabinet_ids or key in new_cabinets:
+            return False
+        new_cabinets[key] = {'name': cabinet_name, 'subject_id': subject_id}
+        return True
+    
     # Проходим по всем строкам
-    for idx in df.index:
+    for row in rows:
         # Получаем название кабинета
-        cabinet_name = df.loc[idx, cabinet_col]
+        cabinet_name = row[cabinet_col]
         if pd.isna(cabinet_name) or str(cabinet_name).strip().lower() in ['nan', '']:
             continue
         
@@ -490,23 +660,15 @@ def load_cabinets_excel(filepath, school_id=None):
         # Получаем предмет, если есть столбец
         subject_id = None
         if subject_col:
-            subject_name = df.loc[idx, subject_col]
+            subject_name = row[subject_col]
             if not pd.isna(subject_name) and str(subject_name).strip().lower() not in ['nan', '']:
-                subject = db.session.query(Subject).filter_by(name=str(subject_name).strip()).first()
-                if subject:
-                    subject_id = subject.id
+                subject_id = subject_ids.get(str(subject_name).strip())
         
         # Получаем список учителей
-        teachers_value = df.loc[idx, teachers_col]
+        teachers_value = row[teachers_col]
         if pd.isna(teachers_value) or str(teachers_value).strip().lower() in ['nan', '']:
             # Кабинет без учителей - создаем его пустым
-            cabinet = db.session.query(Cabinet).filter_by(
-                name=cabinet_name,
-                subject_id=subject_id
-            ).first()
-            if not cabinet:
-                cabinet = Cabinet(name=cabinet_name, subject_id=subject_id)
-                db.session.add(cabinet)
+            if add_cabinet(cabinet_name, subject_id):
                 created_cabinets += 1
             continue
         
@@ -516,36 +678,21 @@ def load_cabinets_excel(filepath, school_id=None):
         
         if not teacher_names:
             # Кабинет без учителей - создаем его пустым
-            cabinet = db.session.query(Cabinet).filter_by(
-                name=cabinet_name,
-                subject_id=subject_id
-            ).first()
-            if not cabinet:
-                cabinet = Cabinet(name=cabinet_name, subject_id=subject_id)
-                db.session.add(cabinet)
+            if add_cabinet(cabinet_name, subject_id):
                 created_cabinets += 1
             continue
         
         # Если предмет не указан в файле, определяем его по учителям
         if not subject_id:
             # Находим предметы этих учителей из назначений
-            teacher_ids = []
-            for teacher_name in teacher_names:
-                teacher = db.session.query(Teacher).filter_by(full_name=teacher_name).first()
-                if teacher:
-                    teacher_ids.append(teacher.id)
+            row_teacher_ids = {teacher_ids[name] for name in teacher_names if name in teacher_ids}
             
-            if teacher_ids:
-                # Ищем назначения этих учителей с указанным кабинетом
-                assignments = db.session.query(TeacherAssignment).filter(
-                    TeacherAssignment.teacher_id.in_(teacher_ids),
-                    TeacherAssignment.default_cabinet == cabinet_name
-                ).all()
-                
-                # Группируем по предметам
+            if row_teacher_ids:
+                # Группируем по предметам назначения этих учителей с указанным кабинетом
                 subject_counts = {}
-                for assignment in assignments:
-                    subj_id = assignment.subject_id
+                for teacher_id, subj_id in assignments_by_cabinet.get(cabinet_name, []):
+                    if teacher_id not in row_teacher_ids:
+                        continue
                     if subj_id not in subject_counts:
                         subject_counts[subj_id] = 0
                     subject_counts[subj_id] += 1
@@ -555,43 +702,34 @@ def load_cabinets_excel(filepath, school_id=None):
                     subject_id = max(subject_counts, key=subject_counts.get)
         
         # Создаем или находим кабинет
-        cabinet = db.session.query(Cabinet).filter_by(
-            name=cabinet_name,
-            subject_id=subject_id
-        ).first()
-        if not cabinet:
-            cabinet = Cabinet(name=cabinet_name, subject_id=subject_id)
-            db.session.add(cabinet)
-            db.session.flush()  # Нужно для получения ID
+        if add_cabinet(cabinet_name, subject_id):
             created_cabinets += 1
         
         # Связываем учителей с кабинетом
         for teacher_name in teacher_names:
             # Ищем учителя в БД (используем существующих, не создаем дубли)
-            teacher = db.session.query(Teacher).filter_by(full_name=teacher_name).first()
+            teacher_id = teacher_ids.get(teacher_name)
             
-            if not teacher:
+            if not teacher_id:
                 # Учитель не найден - пропускаем (не создаем дубли)
                 skipped_teachers += 1
                 print(f"   ⚠️ Учитель '{teacher_name}' не найден в БД, пропущен")
                 continue
             
             # Проверяем, нет ли уже такой связи
-            existing_link = db.session.query(CabinetTeacher).filter_by(
-                cabinet_id=cabinet.id,
-                teacher_id=teacher.id
-            ).first()
-            
-            if not existing_link:
-                # Создаем связь
-                cabinet_teacher = CabinetTeacher(
-                    cabinet_id=cabinet.id,
-                    teacher_id=teacher.id
-                )
-                db.session.add(cabinet_teacher)
+            link = (cabinet_name, subject_id, teacher_id)
+            if link not in existing_links:
+                existing_links.add(link)
+                new_links.append(link)
                 created_links += 1
     
-    db.session.commit()
+    # Новые кабинеты добавляются одним INSERT ... RETURNING, затем связи одним INSERT
+    _insert_missing(Cabinet, (Cabinet.name, Cabinet.subject_id), new_cabinets, cabinet_ids)
+    if new_links:
+        db.session.execute(_INSERT_CABINET_TEACHER, [
+            {'cabinet_id': cabinet_ids[(cabinet_name, subject_id)], 'teacher_id': teacher_id}
+            for cabinet_name, subject_id, teacher_id in new_links
+        ])
     
     print(f"   ✅ Создано кабинетов: {created_cabinets}")
     print(f"   ✅ Создано связей учитель-кабинет: {created_links}")
@@ -5,7 +5,7 @@ from typing import List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class LessonSlot:
     """Слот для урока в расписании"""
     day_of_week: int  # 1=Понедельник, 7=Воскресенье
@@ -20,7 +20,7 @@ class LessonSlot:
         return self.day_of_week == other.day_of_week and self.lesson_number == other.lesson_number
 
 
-@dataclass
+@dataclass(slots=True)
 class ClassSubjectRequirement:
     """Требование для класса по предмету"""
     class_id: int
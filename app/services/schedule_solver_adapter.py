@@ -3,9 +3,14 @@
 """
 from typing import List, Dict, Set, Tuple
 from collections import defaultdict
+from functools import wraps
+import copy
 import logging
 
+from flask import current_app, has_app_context
+
 from app.core.db_manager import db
+from app.core.ttl_cache import TTLCache
 from app.models.school import (
     PromptClassSubject, PromptClassSubjectTeacher, ScheduleSettings,
     PermanentSchedule, Shift, Cabinet, ShiftClass, Subject, ClassGroup,
@@ -15,6 +20,50 @@ from app.services.schedule_solver import ClassSubjectRequirement, LessonSlot
 
 logger = logging.getLogger(__name__)
 
+# Время жизни кэша загрузки данных смены (секунды): покрывает повторные запуски
+# генерации подряд, а изменения из других процессов видны не позже чем через 30 с
+LOADER_CACHE_TTL_SECONDS = 30
+LOADER_CACHE_SIZE = 16
+
+# Кэш загрузчиков: {(функция, URI БД школы, shift_id): результат}
+_loader_cache = TTLCache(LOADER_CACHE_TTL_SECONDS, LOADER_CACHE_SIZE)
+
+
+def clear_loader_cache():
+    """
+    Сбрасывает кэш загрузки требований и настроек расписания
+    """
+    _loader_cache.clear()
+
+
+def _school_ttl_cache(func):
+    """
+    Кэширует результат загрузчика на LOADER_CACHE_TTL_SECONDS секунд
+    
+    Ключ - текущая БД школы (bind 'school') и shift_id. Возвращается копия,
+    чтобы алгоритмы не изменяли закэшированные данные.
+    """
+    @wraps(func)
+    def wrapper(shift_id: int):
+        school_uri = None
+        if has_app_context():
+            school_uri = current_app.config.get('SQLALCHEMY_BINDS', {}).get('school')
+        if school_uri is None:
+            return func(shift_id)
+        
+        key = (func.__name__, school_uri, shift_id)
+        cached = _loader_cache.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
+        result = func(shift_id)
+        _loader_cache.set(key, copy.deepcopy(result))
+        
+        return result
+    
+    wrapper.cache_clear = clear_loader_cache
+    return wrapper
+
 
 def get_available_cabinets_for_teacher(
     teacher_id: int,
@@ -133,6 +182,7 @@ def get_available_cabinets_for_teacher(
     return cabinets
 
 
+@_school_ttl_cache
 def load_requirements_from_db(shift_id: int) -> List[ClassSubjectRequirement]:
     """
     Загружает требования для составления расписания из БД
@@ -513,6 +563,7 @@ def _load_requirements_from_teacher_assignments(shift_id: int) -> List[ClassSubj
     return requirements
 
 
+@_school_ttl_cache
 def get_schedule_settings(shift_id: int) -> Dict[int, int]:
     """
     Получает настройки расписания для смены
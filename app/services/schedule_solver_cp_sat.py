@@ -28,7 +28,8 @@ def solve_schedule_cp_sat(
     clear_existing: bool = False,
     time_limit_seconds: int = 300,
     gap_weight: int = 100,
-    priority_weight: int = 1
+    priority_weight: int = 1,
+    fixed_suggestions: Optional[List[Dict]] = None
 ) -> Dict:
     """
     Решает задачу составления расписания используя CP-SAT solver
@@ -42,6 +43,8 @@ def solve_schedule_cp_sat(
         time_limit_seconds: Лимит времени для решения (секунды)
         gap_weight: Вес штрафа за окно
         priority_weight: Вес штрафа за использование кабинета с низким приоритетом
+        fixed_suggestions: Уже размещенные уроки (например, этапами pipeline) - они не входят
+            в решение, но их учителя, классы и кабинеты считаются занятыми в их слотах
     
     Returns:
         Словарь с результатами:
@@ -71,13 +74,16 @@ def solve_schedule_cp_sat(
     # Собираем информацию о кабинетах из требований
     cabinet_info = _extract_cabinet_info(requirements)
     
+    # Слоты, занятые уже размещенными уроками
+    occupancy = _build_fixed_occupancy(fixed_suggestions or [])
+    
     # Создаем переменные решения X[class][subject][teacher][time][room]
-    variables = _create_variables(model, requirements, schedule_settings, cabinet_info)
+    variables = _create_variables(model, requirements, schedule_settings, cabinet_info, occupancy)
     
     # Добавляем ограничения согласно математической модели
     _add_constraints(
         model, requirements, variables, schedule_settings, 
-        cabinet_info, existing_schedule, clear_existing
+        cabinet_info, existing_schedule, clear_existing, occupancy
     )
     
     # Добавляем целевую функцию (минимизация штрафов)
@@ -150,15 +156,45 @@ def _extract_cabinet_info(requirements: List[ClassSubjectRequirement]) -> Dict[s
     return cabinet_info
 
 
+def _build_fixed_occupancy(fixed_suggestions: List[Dict]) -> Dict:
+    """
+    Собирает слоты, занятые уже размещенными уроками
+    
+    Returns:
+        Словарь:
+        {
+            'teachers': {(teacher_id, day, slot)},
+            'classes': {(class_id, day, slot): {subject_id}},
+            'rooms': {(cabinet, day, slot): {class_id}}
+        }
+    """
+    teachers = set()
+    classes = defaultdict(set)
+    rooms = defaultdict(set)
+    
+    for suggestion in fixed_suggestions:
+        day, slot = suggestion['day_of_week'], suggestion['lesson_number']
+        teachers.add((suggestion['teacher_id'], day, slot))
+        classes[(suggestion['class_id'], day, slot)].add(suggestion['subject_id'])
+        if suggestion.get('cabinet'):
+            rooms[(suggestion['cabinet'], day, slot)].add(suggestion['class_id'])
+    
+    return {'teachers': teachers, 'classes': dict(classes), 'rooms': dict(rooms)}
+
+
 def _create_variables(
     model: cp_model.CpModel,
     requirements: List[ClassSubjectRequirement],
     schedule_settings: Dict[int, int],
-    cabinet_info: Dict[str, Dict]
+    cabinet_info: Dict[str, Dict],
+    occupancy: Optional[Dict] = None
 ) -> Dict:
     """
     Создает переменные решения X[class][subject][teacher][time][room] ∈ {0,1}
     
+    Для слотов, где учитель или класс уже заняты уроками из occupancy (кроме подгрупп
+    того же предмета), а также для заполненных ими кабинетов переменные не создаются
+    
     Returns:
         Словарь с переменными:
         {
@@ -168,6 +204,9 @@ def _create_variables(
     """
     lesson_vars = {}
     requirements_map = {}
+    busy_teachers = occupancy['teachers'] if occupancy else set()
+    busy_classes = occupancy['classes'] if occupancy else {}
+    busy_rooms = occupancy['rooms'] if occupancy else {}
     
     for req_idx, req in enumerate(requirements):
         class_id = req.class_id
@@ -187,6 +226,15 @@ def _create_variables(
                 
                 # Для каждого слота урока
                 for slot in range(1, max_lessons + 1):
+                    # Учитель уже ведет урок в этом слоте
+                    if (teacher_id, day, slot) in busy_teachers:
+                        continue
+                    
+                    # В классе уже идет урок (одновременно можно только подгруппы того же предмета)
+                    class_subjects = busy_classes.get((class_id, day, slot))
+                    if class_subjects and not (req.has_subgroups and class_subjects == {subject_id}):
+                        continue
+                    
                     # Для каждого доступного кабинета
                     for cab in available_cabinets:
                         cab_name = cab['name']
@@ -194,6 +242,10 @@ def _create_variables(
                         # Проверяем ограничения кабинета
                         cab_info = cabinet_info.get(cab_name, {})
                         
+                        # Кабинет уже заполнен размещенными уроками
+                        if len(busy_rooms.get((cab_name, day, slot), ())) >= cab_info.get('max_classes_simultaneously', 1):
+                            continue
+                        
                         # Если кабинет только для подгрупп, а это не подгруппа - пропускаем
                         if cab_info.get('subgroups_only', False) and not req.has_subgroups:
                             continue
@@ -220,7 +272,8 @@ def _add_constraints(
     schedule_settings: Dict[int, int],
     cabinet_info: Dict[str, Dict],
     existing_schedule: Dict[Tuple[int, int, int], List[Dict]],
-    clear_existing: bool
+    clear_existing: bool,
+    occupancy: Optional[Dict] = None
 ):
     """
     Добавляет все ограничения согласно математической модели
@@ -238,7 +291,9 @@ def _add_constraints(
     _add_class_time_constraints(model, lesson_vars, schedule_settings)
     
     # 4. Комната вместимость: sum(class, subject) X[room][time] ≤ capacity(room)
-    _add_room_capacity_constraints(model, lesson_vars, cabinet_info, schedule_settings)
+    _add_room_capacity_constraints(
+        model, lesson_vars, cabinet_info, schedule_settings, occupancy['rooms'] if occupancy else None
+    )
     
     # 5. Не более 2 уроков одного предмета в день для класса
     _add_max_lessons_per_day_constraints(model, requirements, lesson_vars, requirements_map, schedule_settings)
@@ -375,11 +430,14 @@ def _add_room_capacity_constraints(
     model: cp_model.CpModel,
     lesson_vars: Dict,
     cabinet_info: Dict[str, Dict],
-    schedule_settings: Dict[int, int]
+    schedule_settings: Dict[int, int],
+    busy_rooms: Optional[Dict[Tuple[str, int, int], Set[int]]] = None
 ):
     """
     Ограничение 4: Комната вместимость
     sum(class, subject) X[room][time] ≤ capacity(room)
+    
+    Классы, уже занимающие кабинет (busy_rooms), уменьшают его свободную вместимость
     """
     # Группируем переменные по (cabinet, day, slot)
     room_time_vars = defaultdict(list)
@@ -391,6 +449,8 @@ def _add_room_capacity_constraints(
     for (cab, day, slot), vars_list in room_time_vars.items():
         cab_info = cabinet_info.get(cab, {})
         max_capacity = cab_info.get('max_classes_simultaneously', 1)
+        if busy_rooms:
+            max_capacity -= len(busy_rooms.get((cab, day, slot), ()))
         
         # Создаем индикаторы для каждого класса
         class_indicators = {}
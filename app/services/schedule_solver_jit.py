@@ -0,0 +1,195 @@
+"""
+JIT-ядра (Numba) для этапа Graph Coloring в pipeline
+Если Numba не установлена, pipeline использует реализацию на Python/NumPy
+Ядра отпускают GIL (nogil), поэтому компоненты графа раскрашиваются в потоках параллельно
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(*args, **kwargs):
+        """Заглушка декоратора: функции выполняются как обычный Python"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def _is_conflict(teacher1, class1, subject1, subgroups1, teacher2, class2, subject2, subgroups2):
+    """
+    Конфликт: общий учитель или общий класс (кроме подгрупп одного предмета)
+    """
+    return (teacher1 == teacher2) | ((class1 == class2) & ((subject1 != subject2) | ~(subgroups1 & subgroups2)))
+
+
+def group_indices(keys):
+    """
+    Группирует индексы требований по значению ключа (учитель или класс)
+    
+    Returns:
+        CSR-представление групп (indptr, items): индексы группы g -
+        items[indptr[g]:indptr[g + 1]], внутри группы по возрастанию
+    """
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    items = np.argsort(inverse, kind='stable').astype(np.int32)
+    indptr = np.zeros(counts.shape[0] + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, items
+
+
+@njit(cache=True, nogil=True)
+def build_conflict_edges(teacher_ptr, teacher_items, class_ptr, class_items,
+                         teacher_ids, class_ids, subject_ids, subgroup_flags):
+    """
+    Строит список ребер графа конфликтов
+    
+    Конфликт возможен только при общем учителе или общем классе, поэтому пары
+    сравниваются только внутри групп (group_indices) по учителю и по классу.
+    Пары с общим учителем конфликтуют всегда и берутся из групп учителей;
+    в группах классов они пропускаются, чтобы ребро не попало в список дважды.
+    
+    Args:
+        teacher_ptr, teacher_items: группы индексов по учителю (CSR)
+        class_ptr, class_items: группы индексов по классу (CSR)
+        teacher_ids, class_ids, subject_ids: массивы int32 длины N (SoA)
+        subgroup_flags: массив bool длины N - требование делится на подгруппы
+    
+    Returns:
+        Массив (E, 2) int32 с парами (i, j), i < j
+    """
+    # Первый проход: количество ребер
+    total = 0
+    for g in range(teacher_ptr.shape[0] - 1):
+        size = teacher_ptr[g + 1] - teacher_ptr[g]
+        total += size * (size - 1) // 2
+    for g in range(class_ptr.shape[0] - 1):
+        for a in range(class_ptr[g], class_ptr[g + 1]):
+            i = class_items[a]
+            for b in range(a + 1, class_ptr[g + 1]):
+                j = class_items[b]
+                if teacher_ids[i] != teacher_ids[j] and _is_conflict(
+                    teacher_ids[i], class_ids[i], subject_ids[i], subgroup_flags[i],
+                    teacher_ids[j], class_ids[j], subject_ids[j], subgroup_flags[j]
+                ):
+                    total += 1
+    
+    # Второй проход: заполняем ребра
+    edges = np.empty((total, 2), dtype=np.int32)
+    k = 0
+    for g in range(teacher_ptr.shape[0] - 1):
+        for a in range(teacher_ptr[g], teacher_ptr[g + 1]):
+            for b in range(a + 1, teacher_ptr[g + 1]):
+                edges[k, 0] = teacher_items[a]
+                edges[k, 1] = teacher_items[b]
+                k += 1
+    for g in range(class_ptr.shape[0] - 1):
+        for a in range(class_ptr[g], class_ptr[g + 1]):
+            i = class_items[a]
+            for b in range(a + 1, class_ptr[g + 1]):
+                j = class_items[b]
+                if teacher_ids[i] != teacher_ids[j] and _is_conflict(
+                    teacher_ids[i], class_ids[i], subject_ids[i], subgroup_flags[i],
+                    teacher_ids[j], class_ids[j], subject_ids[j], subgroup_flags[j]
+                ):
+                    edges[k, 0] = i
+                    edges[k, 1] = j
+                    k += 1
+    
+    return edges
+
+
+def edges_to_csr(edges, n):
+    """
+    Преобразует список ребер в CSR-представление (indptr, indices)
+    """
+    heads = np.concatenate((edges[:, 0], edges[:, 1]))
+    tails = np.concatenate((edges[:, 1], edges[:, 0]))
+    order = np.argsort(heads, kind='stable')
+    
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=n), out=indptr[1:])
+    
+    return indptr, tails[order].astype(np.int32)
+
+
+@njit(cache=True, nogil=True)
+def _trailing_zeros(word):
+    """
+    Номер младшего установленного бита (word != 0)
+    """
+    index = 0
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = (np.uint64(1) << np.uint64(shift)) - np.uint64(1)
+        if word & mask == 0:
+            word >>= np.uint64(shift)
+            index += shift
+    return index
+
+
+@njit(cache=True, nogil=True)
+def dsatur_color(indptr, indices, n, n_slots):
+    """
+    Раскраска графа DSATUR
+    
+    Слоты, занятые соседями, хранятся битовыми масками uint64
+    (по ceil(n_slots / 64) слов на узел)
+    
+    Args:
+        indptr, indices: CSR-представление графа конфликтов
+        n: количество узлов
+        n_slots: количество доступных слотов (цветов)
+    
+    Returns:
+        Массив int32 длины N с индексом слота, -1 - слот не назначен
+        (изолированные узлы и узлы без свободного слота)
+    """
+    colors = np.full(n, -1, dtype=np.int32)
+    n_words = (n_slots + 63) // 64
+    blocked = np.zeros((n, n_words), dtype=np.uint64)
+    saturation = np.zeros(n, dtype=np.int32)
+    degree = indptr[1:] - indptr[:-1]
+    processed = np.zeros(n, dtype=np.bool_)
+    
+    # Маска допустимых слотов в последнем слове
+    tail_bits = n_slots - (n_words - 1) * 64
+    tail_mask = ~np.uint64(0) if tail_bits == 64 else (np.uint64(1) << np.uint64(tail_bits)) - np.uint64(1)
+    
+    for _ in range(n):
+        # Узел с наибольшей насыщенностью, при равенстве - с наибольшей степенью
+        best = -1
+        for v in range(n):
+            if processed[v] or degree[v] == 0:
+                continue
+            if best == -1 or saturation[v] > saturation[best] or (
+                saturation[v] == saturation[best] and degree[v] > degree[best]
+            ):
+                best = v
+        if best == -1:
+            break
+        processed[best] = True
+        
+        # Первый свободный слот - младший нулевой бит маски
+        for word in range(n_words):
+            free = ~blocked[best, word]
+            if word == n_words - 1:
+                free &= tail_mask
+            if free != 0:
+                colors[best] = word * 64 + _trailing_zeros(free)
+                break
+        if colors[best] < 0:
+            continue
+        
+        slot = colors[best]
+        slot_word = slot // 64
+        slot_bit = np.uint64(1) << np.uint64(slot % 64)
+        for k in range(indptr[best], indptr[best + 1]):
+            neighbor = indices[k]
+            if not processed[neighbor] and blocked[neighbor, slot_word] & slot_bit == 0:
+                blocked[neighbor, slot_word] |= slot_bit
+                saturation[neighbor] += 1
+    
+    return colors
@@ -4,11 +4,32 @@ Pipeline: Greedy -> Graph Coloring -> Bipartite Matching -> CP-SAT -> (опци
 """
 from typing import List, Dict, Set, Tuple, Optional
 from collections import defaultdict
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, repeat
+import heapq
 import logging
+import os
+
+import numpy as np
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import maximum_bipartite_matching
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
 
 from app.services.schedule_solver import ClassSubjectRequirement, LessonSlot
 from app.services.schedule_solver_greedy import solve_schedule_greedy
 from app.services.schedule_solver_cp_sat import solve_schedule_cp_sat
+from app.services.schedule_solver_jit import (
+    NUMBA_AVAILABLE,
+    build_conflict_edges,
+    edges_to_csr,
+    group_indices,
+    dsatur_color
+)
 
 logger = logging.getLogger(__name__)
 
@@ -59,11 +80,10 @@ def solve_schedule_pipeline(
     if existing_schedule is None:
         existing_schedule = {}
     
-    logger.info(f"Начало pipeline для смены {shift_id}")
-    logger.info(f"Требований: {len(requirements)}")
+    logger.info("Начало pipeline для смены %s", shift_id)
+    logger.info("Требований: %s", len(requirements))
     
     all_warnings = []
-    all_suggestions = []
     
     # Этап 1: Greedy - предварительная расстановка 70-85% уроков
     logger.info("Этап 1: Greedy - предварительная расстановка")
@@ -78,65 +98,87 @@ def solve_schedule_pipeline(
     greedy_suggestions = greedy_result.get('suggestions', [])
     all_warnings.extend(greedy_result.get('warnings', []))
     
-    logger.info(f"Greedy разместил {len(greedy_suggestions)} уроков")
+    logger.info("Greedy разместил %s уроков", len(greedy_suggestions))
     
     # Этап 2: Graph Coloring - определение тайм-слотов для оставшихся уроков
     logger.info("Этап 2: Graph Coloring - определение тайм-слотов")
-    remaining_requirements = _get_remaining_requirements(requirements, greedy_suggestions)
+    remaining_requirements, placed_count = _get_remaining_requirements(requirements, greedy_suggestions)
     
     if remaining_requirements:
         graph_coloring_suggestions = _graph_coloring_assign_slots(
             remaining_requirements, schedule_settings, greedy_suggestions
         )
-        logger.info(f"Graph Coloring разместил {len(graph_coloring_suggestions)} уроков")
+        logger.info("Graph Coloring разместил %s уроков", len(graph_coloring_suggestions))
     else:
         graph_coloring_suggestions = []
     
+    # Раскраска выдает слот каждому часу, в том числе узлам без свободного цвета (слот
+    # по умолчанию) и без учета уроков Greedy - размещенными считаются только бесконфликтные
+    conflict_free_suggestions, conflicting_suggestions = _split_conflict_free(
+        graph_coloring_suggestions, greedy_suggestions, requirements
+    )
+    if conflicting_suggestions:
+        logger.info("Graph Coloring: %s уроков конфликтуют с уже размещенными", len(conflicting_suggestions))
+    
+    # Конфликтующие уроки заменит CP-SAT, поэтому кабинеты им не назначаются
+    if use_cp_sat:
+        graph_coloring_suggestions = conflict_free_suggestions
+    
     # Этап 3: Bipartite Matching - распределение кабинетов
     logger.info("Этап 3: Bipartite Matching - распределение кабинетов")
-    all_suggestions = greedy_suggestions + graph_coloring_suggestions
-    
     if graph_coloring_suggestions:
-        # Для уроков без кабинетов из Graph Coloring применяем Bipartite Matching
-        matched_suggestions = _bipartite_matching_assign_cabinets(
-            graph_coloring_suggestions, requirements, schedule_settings
+        # Для уроков без кабинетов из Graph Coloring применяем Bipartite Matching (на месте)
+        _assign_cabinets_inplace(
+            graph_coloring_suggestions, requirements, schedule_settings, greedy_suggestions
         )
-        # Заменяем suggestions с кабинетами
-        all_suggestions = greedy_suggestions + matched_suggestions
-        logger.info(f"Bipartite Matching распределил кабинеты для {len(matched_suggestions)} уроков")
+        logger.info("Bipartite Matching распределил кабинеты для %s уроков", len(graph_coloring_suggestions))
+    
+    all_suggestions = greedy_suggestions + graph_coloring_suggestions
+    
+    # Общий счетчик - все уроки предыдущих этапов (для учета);
+    # решение о запуске CP-SAT принимается только по бесконфликтным размещениям
+    conflict_free_count = _count_placed_lessons(conflict_free_suggestions, placed_count)
+    placed_count = _count_placed_lessons(graph_coloring_suggestions, placed_count)
     
     # Этап 4: CP-SAT - финальная сборка и устранение конфликтов (опционально)
     if use_cp_sat:
-        remaining_count = len(requirements) * 2 - len(all_suggestions)  # Примерная оценка
+        unmet_hours = _count_unmet_hours(requirements, conflict_free_count)
         
-        if remaining_count > 0 and len(all_suggestions) < len(requirements) * 0.9:
-            # Есть неразмещенные уроки - используем CP-SAT для финализации
-            logger.info(f"Этап 4: CP-SAT - финальная сборка и устранение конфликтов (осталось ~{remaining_count} уроков)")
+        if unmet_hours > 0:
+            # Есть неразмещенные уроки - CP-SAT размещает только остаток,
+            # уроки предыдущих этапов сохраняются и занимают свои слоты
+            logger.info("Этап 4: CP-SAT - финальная сборка и устранение конфликтов (осталось %s уроков)", unmet_hours)
             
-            # Создаем частичное решение из предыдущих этапов
-            partial_schedule = _convert_suggestions_to_schedule(all_suggestions)
+            residual_requirements = _build_residual_requirements(requirements, conflict_free_count)
             
             # Используем короткий лимит времени для быстрого ответа
             cp_sat_time_limit = min(time_limit_seconds, 30)  # Максимум 30 секунд для быстрого ответа
             
             cp_sat_result = solve_schedule_cp_sat(
-                requirements=requirements,
+                requirements=residual_requirements,
                 shift_id=shift_id,
-                existing_schedule=partial_schedule,
+                existing_schedule={},
                 schedule_settings=schedule_settings,
-                clear_existing=False,  # Не очищаем, используем как начальное решение
+                clear_existing=False,
                 time_limit_seconds=cp_sat_time_limit,
                 gap_weight=100,
-                priority_weight=1
+                priority_weight=1,
+                fixed_suggestions=all_suggestions
             )
             
-            final_suggestions = cp_sat_result.get('suggestions', [])
+            cp_sat_suggestions = cp_sat_result.get('suggestions', [])
             all_warnings.extend(cp_sat_result.get('warnings', []))
+            final_suggestions = all_suggestions + cp_sat_suggestions
             
-            logger.info(f"CP-SAT финализировал {len(final_suggestions)} уроков за {cp_sat_time_limit} секунд")
+            if len(cp_sat_suggestions) < unmet_hours:
+                all_warnings.append(
+                    f"Не размещено уроков: {unmet_hours - len(cp_sat_suggestions)} из {unmet_hours} оставшихся"
+                )
+            
+            logger.info("CP-SAT разместил %s из %s оставшихся уроков", len(cp_sat_suggestions), unmet_hours)
         else:
-            # Все уроки размещены или почти все - пропускаем CP-SAT для экономии времени
-            logger.info(f"Этап 4: CP-SAT пропущен - уже размещено {len(all_suggestions)} уроков ({(len(all_suggestions) / (len(requirements) * 2) * 100):.1f}%)")
+            # Все уроки размещены - пропускаем CP-SAT для экономии времени
+            logger.info("Этап 4: CP-SAT пропущен - все %s уроков уже размещены", sum(placed_count.values()))
             final_suggestions = all_suggestions
     else:
         # CP-SAT отключен
@@ -151,7 +193,7 @@ def solve_schedule_pipeline(
         )
         if improved_suggestions:
             final_suggestions = improved_suggestions
-            logger.info(f"Genetic Algorithm улучшил решение")
+            logger.info("Genetic Algorithm улучшил решение")
     
     summary = (
         f"Pipeline: Greedy({len(greedy_suggestions)}) -> "
@@ -173,16 +215,15 @@ def solve_schedule_pipeline(
 def _get_remaining_requirements(
     requirements: List[ClassSubjectRequirement],
     placed_suggestions: List[Dict]
-) -> List[Dict]:
+) -> Tuple[List[Dict], Dict[Tuple[int, int, int], int]]:
     """
     Определяет оставшиеся требования, которые не были размещены Greedy
-    """
-    # Подсчитываем размещенные уроки по требованиям
-    placed_count = defaultdict(int)
     
-    for suggestion in placed_suggestions:
-        key = (suggestion['class_id'], suggestion['subject_id'], suggestion['teacher_id'])
-        placed_count[key] += 1
+    Returns:
+        Кортеж (оставшиеся требования, счетчик размещенных уроков
+        {(class_id, subject_id, teacher_id): count})
+    """
+    placed_count = _count_placed_lessons(placed_suggestions)
     
     # Создаем список оставшихся задач
     remaining = []
@@ -196,14 +237,121 @@ def _get_remaining_requirements(
             remaining_hours = hours - placed
             
             if remaining_hours > 0:
-                for _ in range(remaining_hours):
-                    remaining.append({
-                        'req': req,
-                        'teacher_id': teacher_id,
-                        'teacher': teacher
-                    })
+                # Один общий (неизменяемый далее) словарь на все часы требования
+                entry = {
+                    'req': req,
+                    'teacher_id': teacher_id,
+                    'teacher': teacher
+                }
+                remaining.extend(repeat(entry, remaining_hours))
+    
+    return remaining, placed_count
+
+
+def _count_placed_lessons(
+    suggestions: List[Dict],
+    placed_count: Optional[Dict[Tuple[int, int, int], int]] = None
+) -> Dict[Tuple[int, int, int], int]:
+    """
+    Подсчитывает размещенные уроки по ключу (class_id, subject_id, teacher_id)
+    
+    Если передан placed_count, к нему добавляются уроки из suggestions
+    (исходный словарь не изменяется)
+    """
+    placed_count = dict(placed_count) if placed_count else {}
+    
+    for suggestion in suggestions:
+        key = (suggestion['class_id'], suggestion['subject_id'], suggestion['teacher_id'])
+        placed_count[key] = placed_count.get(key, 0) + 1
     
-    return remaining
+    return placed_count
+
+
+def _count_unmet_hours(
+    requirements: List[ClassSubjectRequirement],
+    placed_count: Dict[Tuple[int, int, int], int]
+) -> int:
+    """
+    Считает количество часов, которые еще не размещены (по счетчику placed_count)
+    """
+    unmet = 0
+    for req in requirements:
+        for teacher in req.teachers:
+            key = (req.class_id, req.subject_id, teacher['teacher_id'])
+            unmet += max(0, teacher.get('hours_per_week', 0) - placed_count.get(key, 0))
+    
+    return unmet
+
+
+def _split_conflict_free(
+    suggestions: List[Dict],
+    placed_suggestions: List[Dict],
+    requirements: List[ClassSubjectRequirement]
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Разделяет уроки на бесконфликтные и конфликтующие
+    
+    Урок конфликтует, если в его слоте учитель уже ведет урок или в классе уже идет
+    урок (кроме подгрупп одного предмета) - среди placed_suggestions и ранее принятых уроков
+    
+    Returns:
+        Кортеж (бесконфликтные уроки, конфликтующие уроки)
+    """
+    subgroup_keys = {(req.class_id, req.subject_id) for req in requirements if req.has_subgroups}
+    busy_teachers = set()
+    class_subjects = defaultdict(set)
+    
+    for suggestion in placed_suggestions:
+        slot = (suggestion['day_of_week'], suggestion['lesson_number'])
+        busy_teachers.add((suggestion['teacher_id'], slot))
+        class_subjects[(suggestion['class_id'], slot)].add(suggestion['subject_id'])
+    
+    conflict_free = []
+    conflicting = []
+    
+    for suggestion in suggestions:
+        slot = (suggestion['day_of_week'], suggestion['lesson_number'])
+        class_key = (suggestion['class_id'], slot)
+        subjects = class_subjects.get(class_key)
+        
+        if (suggestion['teacher_id'], slot) in busy_teachers or (subjects and not (
+            subjects == {suggestion['subject_id']}
+            and (suggestion['class_id'], suggestion['subject_id']) in subgroup_keys
+        )):
+            conflicting.append(suggestion)
+            continue
+        
+        busy_teachers.add((suggestion['teacher_id'], slot))
+        class_subjects[class_key].add(suggestion['subject_id'])
+        conflict_free.append(suggestion)
+    
+    return conflict_free, conflicting
+
+
+def _build_residual_requirements(
+    requirements: List[ClassSubjectRequirement],
+    placed_count: Dict[Tuple[int, int, int], int]
+) -> List[ClassSubjectRequirement]:
+    """
+    Строит требования на неразмещенный остаток часов
+    
+    У учителей остаются только неразмещенные часы (hours_per_week), учителя
+    без остатка и требования без таких учителей не включаются
+    """
+    residual = []
+    
+    for req in requirements:
+        teachers = []
+        for teacher in req.teachers:
+            key = (req.class_id, req.subject_id, teacher['teacher_id'])
+            unmet = teacher.get('hours_per_week', 0) - placed_count.get(key, 0)
+            if unmet > 0:
+                teachers.append({**teacher, 'hours_per_week': unmet})
+        
+        if teachers:
+            residual.append(replace(req, teachers=teachers))
+    
+    return residual
 
 
 def _graph_coloring_assign_slots(
@@ -220,167 +368,384 @@ def _graph_coloring_assign_slots(
     if not remaining_requirements:
         return suggestions
     
-    # Создаем граф конфликтов
-    conflict_graph = _build_conflict_graph(remaining_requirements, existing_suggestions)
+    # Целочисленные ID в виде массивов int32 (SoA) - строятся один раз
+    id_arrays = _build_id_arrays(remaining_requirements)
     
-    # Применяем жадную раскраску графа
-    colored = _greedy_graph_coloring(remaining_requirements, conflict_graph, schedule_settings)
+    # Независимые компоненты (без общих классов и учителей) раскрашиваем параллельно
+    components = _split_independent_components(id_arrays)
+    
+    if len(components) == 1:
+        colored_day, colored_slot = _color_component(id_arrays, schedule_settings)
+    else:
+        colored_day = np.empty(len(remaining_requirements), dtype=np.int8)
+        colored_slot = np.empty(len(remaining_requirements), dtype=np.int8)
+        with ThreadPoolExecutor(max_workers=min(len(components), os.cpu_count() or 1)) as executor:
+            colored_parts = executor.map(
+                lambda indices: _color_component(
+                    {name: values[indices] for name, values in id_arrays.items()}, schedule_settings
+                ),
+                components
+            )
+            for indices, (days, slots) in zip(components, colored_parts):
+                colored_day[indices] = days
+                colored_slot[indices] = slots
     
     # Создаем suggestions из раскрашенных узлов
-    for node_idx, (day, slot) in colored.items():
-        req_data = remaining_requirements[node_idx]
+    for req_data, day, slot in zip(remaining_requirements, colored_day.tolist(), colored_slot.tolist()):
         req = req_data['req']
-        teacher_id = req_data['teacher_id']
         
         suggestions.append({
             'day_of_week': day,
             'lesson_number': slot,
             'class_id': req.class_id,
             'subject_id': req.subject_id,
-            'teacher_id': teacher_id,
+            'teacher_id': req_data['teacher_id'],
             'cabinet': None  # Кабинет будет назначен на следующем этапе
         })
     
     return suggestions
 
 
-def _build_conflict_graph(
-    remaining_requirements: List[Dict],
-    existing_suggestions: List[Dict]
-) -> Dict:
-    """
-    Строит граф конфликтов для Graph Coloring
+def _build_id_arrays(remaining_requirements: List[Dict]) -> Dict[str, np.ndarray]:
     """
-    # Граф конфликтов: узлы - индексы требований, ребра - конфликты
-    conflict_graph = defaultdict(set)
+    Преобразует оставшиеся требования в параллельные массивы int32 (SoA)
     
-    for i, req1 in enumerate(remaining_requirements):
-        for j, req2 in enumerate(remaining_requirements):
-            if i >= j:
-                continue
-            
-            # Проверяем конфликты
-            if _has_conflict(req1, req2, existing_suggestions):
-                conflict_graph[i].add(j)
-                conflict_graph[j].add(i)
+    Returns:
+        Словарь {'teacher_id', 'class_id', 'subject_id', 'has_subgroups'} -> массив длины N
+    """
+    count = len(remaining_requirements)
+    return {
+        'teacher_id': np.fromiter(
+            (req_data['teacher_id'] for req_data in remaining_requirements), dtype=np.int32, count=count
+        ),
+        'class_id': np.fromiter(
+            (req_data['req'].class_id for req_data in remaining_requirements), dtype=np.int32, count=count
+        ),
+        'subject_id': np.fromiter(
+            (req_data['req'].subject_id for req_data in remaining_requirements), dtype=np.int32, count=count
+        ),
+        'has_subgroups': np.fromiter(
+            (req_data['req'].has_subgroups for req_data in remaining_requirements), dtype=np.bool_, count=count
+        )
+    }
+
+
+def _split_independent_components(id_arrays: Dict[str, np.ndarray]) -> List[np.ndarray]:
+    """
+    Разбивает требования на компоненты, не связанные общими классами или учителями
     
-    return conflict_graph
+    Между компонентами нет ребер графа конфликтов, поэтому их можно раскрашивать
+    независимо. Возвращает массивы индексов требований (по возрастанию).
+    """
+    teacher_ids = id_arrays['teacher_id'].tolist()
+    class_ids = id_arrays['class_id'].tolist()
+    parent = {}
+    
+    def find(node):
+        root = node
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+    
+    for teacher_id, class_id in zip(teacher_ids, class_ids):
+        parent[find(('teacher', teacher_id))] = find(('class', class_id))
+    
+    components = defaultdict(list)
+    for idx, class_id in enumerate(class_ids):
+        components[find(('class', class_id))].append(idx)
+    
+    return [np.asarray(indices) for indices in components.values()]
 
 
-def _has_conflict(req1: Dict, req2: Dict, existing_suggestions: List[Dict]) -> bool:
+def _color_component(
+    id_arrays: Dict[str, np.ndarray],
+    schedule_settings: Dict[int, int]
+) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Проверяет, есть ли конфликт между двумя требованиями
+    Строит граф конфликтов и раскрашивает его для одной компоненты
+    
+    Returns:
+        Массивы (day, lesson_number) для каждого требования компоненты
     """
-    # Конфликт: один учитель, один класс, один предмет в одно время
-    if req1['teacher_id'] == req2['teacher_id']:
-        if req1['req'].class_id != req2['req'].class_id:
-            return True  # Учитель в разных классах одновременно
+    if NUMBA_AVAILABLE:
+        # Граф конфликтов и раскраска в JIT-ядрах
+        return _jit_graph_coloring(id_arrays, schedule_settings)
     
-    if req1['req'].class_id == req2['req'].class_id:
-        if req1['req'].subject_id != req2['req'].subject_id:
-            # Разные предметы в одном классе - конфликт
-            # Но если это подгруппы (один предмет, разные учителя) - разрешаем
-            if req1['req'].has_subgroups and req2['req'].has_subgroups:
-                if req1['req'].subject_id == req2['req'].subject_id:
-                    return False  # Подгруппы одного предмета - разрешаем
-            return True
+    # Создаем граф конфликтов
+    conflict_graph = _build_conflict_graph(id_arrays)
     
-    return False
+    # Применяем жадную раскраску графа
+    return _greedy_graph_coloring(len(id_arrays['teacher_id']), conflict_graph, schedule_settings)
 
 
-def _greedy_graph_coloring(
-    remaining_requirements: List[Dict],
-    conflict_graph: Dict,
+def _jit_graph_coloring(
+    id_arrays: Dict[str, np.ndarray],
     schedule_settings: Dict[int, int]
-) -> Dict:
+) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Жадная раскраска графа для определения тайм-слотов
+    Graph Coloring через JIT-ядра: граф конфликтов + DSATUR
     """
-    # Сортируем узлы по степени (количество конфликтов)
-    nodes = sorted(conflict_graph.keys(), key=lambda x: len(conflict_graph[x]), reverse=True)
+    count = len(id_arrays['teacher_id'])
+    teacher_ptr, teacher_items = group_indices(id_arrays['teacher_id'])
+    class_ptr, class_items = group_indices(id_arrays['class_id'])
+    edges = build_conflict_edges(
+        teacher_ptr, teacher_items, class_ptr, class_items,
+        id_arrays['teacher_id'], id_arrays['class_id'], id_arrays['subject_id'], id_arrays['has_subgroups']
+    )
+    indptr, indices = edges_to_csr(edges, count)
+    
+    available_slots = _build_available_slots(schedule_settings)
+    colors = dsatur_color(indptr, indices, count, len(available_slots))
     
-    colored = {}
+    return _colors_to_slots(colors, available_slots)
+
+
+def _build_available_slots(schedule_settings: Dict[int, int]) -> List[Tuple[int, int]]:
+    """
+    Создает упорядоченный список доступных слотов (day, lesson_number)
+    """
     available_slots = []
     
-    # Создаем список доступных слотов
     for day in sorted(schedule_settings.keys()):
         max_lessons = schedule_settings[day]
         for slot in range(1, max_lessons + 1):
             available_slots.append((day, slot))
     
+    return available_slots
+
+
+def _build_conflict_graph(id_arrays: Dict[str, np.ndarray]) -> Dict:
+    """
+    Строит граф конфликтов для Graph Coloring
+    """
+    teacher_ids = id_arrays['teacher_id']
+    class_ids = id_arrays['class_id']
+    subject_ids = id_arrays['subject_id']
+    subgroup_flags = id_arrays['has_subgroups']
+    
+    # Граф конфликтов: узлы - индексы требований, ребра - конфликты
+    # Конфликт возможен только при общем учителе или общем классе,
+    # поэтому сравниваем пары только внутри соответствующих корзин
+    by_teacher: Dict[int, List[int]] = defaultdict(list)
+    by_class: Dict[int, List[int]] = defaultdict(list)
+    
+    for idx, (teacher_id, class_id) in enumerate(zip(teacher_ids.tolist(), class_ids.tolist())):
+        by_teacher[teacher_id].append(idx)
+        by_class[class_id].append(idx)
+    
+    edges: Set[Tuple[int, int]] = set()
+    
+    for indices in chain(by_teacher.values(), by_class.values()):
+        if len(indices) < 2:
+            continue
+        
+        idx = np.asarray(indices)
+        tid, cid, sid, sub = teacher_ids[idx], class_ids[idx], subject_ids[idx], subgroup_flags[idx]
+        same_t = tid[:, None] == tid[None, :]
+        same_c = cid[:, None] == cid[None, :]
+        same_s = sid[:, None] == sid[None, :]
+        both_sub = sub[:, None] & sub[None, :]
+        
+        # Учитель занят или в классе уже идет урок (кроме подгрупп одного предмета)
+        mask = np.triu(same_t | (same_c & (~same_s | ~both_sub)), 1)
+        
+        # Индексы в корзине возрастают, поэтому пара (i, j) всегда упорядочена
+        for a, b in np.argwhere(mask):
+            edges.add((int(idx[a]), int(idx[b])))
+    
+    conflict_graph = defaultdict(set)
+    for i, j in edges:
+        conflict_graph[i].add(j)
+        conflict_graph[j].add(i)
+    
+    return conflict_graph
+
+
+def _greedy_graph_coloring(
+    node_count: int,
+    conflict_graph: Dict,
+    schedule_settings: Dict[int, int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Жадная раскраска графа для определения тайм-слотов (DSATUR)
+    
+    Следующим раскрашивается узел с наибольшей насыщенностью (число различных
+    слотов у уже раскрашенных соседей), при равенстве - с наибольшей степенью.
+    Слоты, занятые соседями, хранятся битовой маской (бит i - i-й слот).
+    
+    Returns:
+        Массивы (day, lesson_number) длины node_count
+    """
+    available_slots = _build_available_slots(schedule_settings)
+    all_slots_mask = (1 << len(available_slots)) - 1
+    
+    # Индекс слота для каждого узла, -1 - слот не назначен
+    colors = np.full(node_count, -1, dtype=np.int16)
+    
+    # Битовая маска слотов, занятых раскрашенными соседями каждого узла
+    blocked = dict.fromkeys(conflict_graph, 0)
+    degree = {node: len(neighbors) for node, neighbors in conflict_graph.items()}
+    
+    heap = [(0, -degree[node], node) for node in conflict_graph]
+    heapq.heapify(heap)
+    processed = set()
+    
     # Раскрашиваем узлы
-    for node in nodes:
-        # Находим цвета (слоты), используемые соседями
-        neighbor_colors = set()
-        for neighbor in conflict_graph[node]:
-            if neighbor in colored:
-                neighbor_colors.add(colored[neighbor])
+    while heap:
+        neg_saturation, _, node = heapq.heappop(heap)
+        # Пропускаем обработанные узлы и устаревшие записи кучи
+        if node in processed or -neg_saturation != blocked[node].bit_count():
+            continue
+        processed.add(node)
+        
+        # Выбираем первый доступный цвет (слот) - младший свободный бит
+        free_mask = all_slots_mask & ~blocked[node]
+        if not free_mask:
+            continue
+        slot_bit = free_mask & -free_mask
+        colors[node] = slot_bit.bit_length() - 1
         
-        # Выбираем первый доступный цвет (слот)
-        for slot in available_slots:
-            if slot not in neighbor_colors:
-                colored[node] = slot
-                break
+        # Обновляем насыщенность нераскрашенных соседей
+        for neighbor in conflict_graph[node]:
+            if neighbor not in processed and not blocked[neighbor] & slot_bit:
+                blocked[neighbor] |= slot_bit
+                heapq.heappush(heap, (-blocked[neighbor].bit_count(), -degree[neighbor], neighbor))
+    
+    return _colors_to_slots(colors, available_slots)
+
+
+def _colors_to_slots(
+    colors: np.ndarray,
+    available_slots: List[Tuple[int, int]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Преобразует индексы слотов в массивы (day, lesson_number)
     
-    # Раскрашиваем узлы без конфликтов
-    for i in range(len(remaining_requirements)):
-        if i not in colored:
-            # Выбираем первый доступный слот
-            colored[i] = available_slots[0] if available_slots else (1, 1)
+    Узлы без слота (-1: без конфликтов или без свободного слота) получают первый слот
+    """
+    default_slot = available_slots[0] if available_slots else (1, 1)
+    
+    # Индекс -1 указывает на последний элемент - слот по умолчанию
+    slot_days = np.array([day for day, _ in available_slots] + [default_slot[0]], dtype=np.int8)
+    slot_numbers = np.array([slot for _, slot in available_slots] + [default_slot[1]], dtype=np.int8)
     
-    return colored
+    return slot_days[colors], slot_numbers[colors]
 
 
-def _bipartite_matching_assign_cabinets(
+def _assign_cabinets_inplace(
     suggestions: List[Dict],
     requirements: List[ClassSubjectRequirement],
-    schedule_settings: Dict[int, int]
-) -> List[Dict]:
+    schedule_settings: Dict[int, int],
+    existing_suggestions: Optional[List[Dict]] = None
+) -> None:
     """
     Bipartite Matching: распределяет кабинеты для уроков без кабинетов
+    Изменяет переданные suggestions на месте
+    
+    Для каждого тайм-слота строится двудольный граф «урок - кабинет» и ищется
+    максимальное паросочетание, чтобы один кабинет не был занят дважды.
+    Уроки без пары получают кабинет с наивысшим приоритетом.
     """
-    # Создаем словарь требований для быстрого поиска
-    req_map = {}
-    for req in requirements:
-        for teacher in req.teachers:
-            key = (req.class_id, req.subject_id, teacher['teacher_id'])
-            req_map[key] = {'req': req, 'teacher': teacher}
+    if not any(suggestion.get('cabinet') is None for suggestion in suggestions):
+        return
+    
+    # Кабинеты каждой тройки класс-предмет-учитель в порядке приоритета
+    teacher_cabinets = {
+        (req.class_id, req.subject_id, teacher['teacher_id']): sorted(
+            teacher['available_cabinets'], key=lambda cab: cab.get('priority', 4)
+        )
+        for req in requirements
+        for teacher in req.teachers
+        if teacher.get('available_cabinets')
+    }
+    
+    # Кабинеты, уже занятые на предыдущих этапах
+    occupied = defaultdict(int)
+    for suggestion in existing_suggestions or []:
+        if suggestion.get('cabinet'):
+            occupied[(suggestion['day_of_week'], suggestion['lesson_number'], suggestion['cabinet'])] += 1
     
-    # Обрабатываем suggestions без кабинетов
+    # Группируем suggestions без кабинетов по тайм-слотам
+    slot_groups = defaultdict(list)
     for suggestion in suggestions:
         if suggestion.get('cabinet') is None:
-            key = (suggestion['class_id'], suggestion['subject_id'], suggestion['teacher_id'])
-            req_data = req_map.get(key)
-            
-            if req_data:
-                available_cabinets = req_data['teacher'].get('available_cabinets', [])
-                if available_cabinets:
-                    # Выбираем кабинет с наивысшим приоритетом
-                    best_cabinet = min(available_cabinets, key=lambda x: x.get('priority', 4))
-                    suggestion['cabinet'] = best_cabinet['name']
+            slot_groups[(suggestion['day_of_week'], suggestion['lesson_number'])].append(suggestion)
     
-    return suggestions
+    for (day, lesson), group in slot_groups.items():
+        candidates = [
+            teacher_cabinets.get((s['class_id'], s['subject_id'], s['teacher_id']), [])
+            for s in group
+        ]
+        
+        # Столбцы - места в кабинетах с учетом вместимости и занятости
+        columns = []
+        column_index = defaultdict(list)
+        for cabinets in candidates:
+            for cab in cabinets:
+                name = cab['name']
+                if name in column_index:
+                    continue
+                capacity = cab.get('max_classes_simultaneously', 1) - occupied[(day, lesson, name)]
+                column_index[name] = list(range(len(columns), len(columns) + max(capacity, 0)))
+                columns.extend([name] * max(capacity, 0))
+        
+        adjacency = [
+            [col for cab in cabinets for col in column_index[cab['name']]]
+            for cabinets in candidates
+        ]
+        matching = _maximum_bipartite_matching(adjacency, len(columns))
+        
+        for suggestion, cabinets, col in zip(group, candidates, matching):
+            if col >= 0:
+                suggestion['cabinet'] = columns[col]
+            elif cabinets:
+                # Свободного кабинета нет - выбираем кабинет с наивысшим приоритетом
+                suggestion['cabinet'] = cabinets[0]['name']
 
 
-def _convert_suggestions_to_schedule(suggestions: List[Dict]) -> Dict:
+def _maximum_bipartite_matching(adjacency: List[List[int]], n_columns: int) -> List[int]:
     """
-    Конвертирует suggestions в формат existing_schedule
-    """
-    schedule = defaultdict(list)
+    Максимальное паросочетание строк (уроков) и столбцов (мест в кабинетах)
     
-    for suggestion in suggestions:
-        key = (
-            suggestion['day_of_week'],
-            suggestion['lesson_number'],
-            suggestion['class_id']
+    Returns:
+        Для каждой строки индекс столбца или -1, если пары нет
+    """
+    if not adjacency or n_columns == 0:
+        return [-1] * len(adjacency)
+    
+    if SCIPY_AVAILABLE:
+        # Hopcroft-Karp из scipy
+        rows = [row for row, cols in enumerate(adjacency) for _ in cols]
+        cols = [col for row_cols in adjacency for col in row_cols]
+        graph = csr_matrix(
+            (np.ones(len(cols), dtype=np.int8), (rows, cols)),
+            shape=(len(adjacency), n_columns)
         )
-        schedule[key].append({
-            'teacher_id': suggestion['teacher_id'],
-            'subject_id': suggestion['subject_id'],
-            'cabinet': suggestion.get('cabinet', '')
-        })
+        return maximum_bipartite_matching(graph, perm_type='column').tolist()
     
-    return dict(schedule)
+    # Алгоритм Куна (увеличивающие пути), столбцы перебираются в порядке приоритета
+    column_owner = [-1] * n_columns
+    
+    def try_assign(row: int, visited: List[bool]) -> bool:
+        for col in adjacency[row]:
+            if visited[col]:
+                continue
+            visited[col] = True
+            if column_owner[col] == -1 or try_assign(column_owner[col], visited):
+                column_owner[col] = row
+                return True
+        return False
+    
+    for row in range(len(adjacency)):
+        try_assign(row, [False] * n_columns)
+    
+    matching = [-1] * len(adjacency)
+    for col, row in enumerate(column_owner):
+        if row >= 0:
+            matching[row] = col
+    return matching
 
 
 def _genetic_algorithm_improve(
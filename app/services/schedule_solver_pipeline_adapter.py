@@ -1,7 +1,12 @@
 """
 Адаптер для эталонной архитектуры составления расписания
 """
-from typing import Dict
+from typing import Dict, List, Tuple
+from collections import OrderedDict
+from dataclasses import asdict
+import copy
+import hashlib
+import json
 import logging
 
 from app.core.db_manager import db, school_db_context
@@ -10,10 +15,18 @@ from app.services.schedule_solver_adapter import (
     get_schedule_settings,
     get_existing_schedule
 )
+from app.services.schedule_solver import ClassSubjectRequirement
 from app.services.schedule_solver_pipeline import solve_schedule_pipeline
 
 logger = logging.getLogger(__name__)
 
+# Версия формата ключа кэша: увеличить при изменении логики pipeline
+PIPELINE_CACHE_VERSION = 1
+PIPELINE_CACHE_SIZE = 16
+
+# Кэш результатов pipeline: {fingerprint: result}
+_pipeline_cache: "OrderedDict[str, Dict]" = OrderedDict()
+
 
 def generate_schedule_pipeline(
     shift_id: int,
@@ -63,17 +76,17 @@ def _generate_pipeline(
     import time
     start_load = time.time()
     
-    logger.info(f"[PIPELINE АЛГОРИТМ] Этап 1: Загрузка данных из БД...")
+    logger.info("[PIPELINE АЛГОРИТМ] Этап 1: Загрузка данных из БД...")
     
     # Загружаем требования из БД
-    logger.info(f"[PIPELINE АЛГОРИТМ] Загрузка требований для смены {shift_id}...")
+    logger.info("[PIPELINE АЛГОРИТМ] Загрузка требований для смены %s...", shift_id)
     requirements = load_requirements_from_db(shift_id)
     
     load_time = time.time() - start_load
-    logger.info(f"[PIPELINE АЛГОРИТМ] ✓ Загружено {len(requirements)} требований за {load_time:.2f} секунд")
+    logger.info("[PIPELINE АЛГОРИТМ] ✓ Загружено %s требований за %.2f секунд", len(requirements), load_time)
     
     if not requirements:
-        logger.error(f"[PIPELINE АЛГОРИТМ] ОШИБКА: Нет требований для составления расписания")
+        logger.error("[PIPELINE АЛГОРИТМ] ОШИБКА: Нет требований для составления расписания")
         return {
             'suggestions': [],
             'warnings': ['Нет требований для составления расписания'],
@@ -81,18 +94,31 @@ def _generate_pipeline(
         }
     
     # Загружаем настройки расписания
-    logger.info(f"[PIPELINE АЛГОРИТМ] Загрузка настроек расписания...")
+    logger.info("[PIPELINE АЛГОРИТМ] Загрузка настроек расписания...")
     schedule_settings = get_schedule_settings(shift_id)
-    logger.info(f"[PIPELINE АЛГОРИТМ] ✓ Настройки загружены: {schedule_settings}")
+    logger.info("[PIPELINE АЛГОРИТМ] ✓ Настройки загружены: %s", schedule_settings)
     
     # Загружаем существующее расписание
     existing_schedule = get_existing_schedule(shift_id) if not clear_existing else {}
     if existing_schedule:
-        logger.info(f"[PIPELINE АЛГОРИТМ] Загружено существующее расписание: {len(existing_schedule)} слотов")
+        logger.info("[PIPELINE АЛГОРИТМ] Загружено существующее расписание: %s слотов", len(existing_schedule))
     
     # Вызываем pipeline
-    logger.info(f"[PIPELINE АЛГОРИТМ] Этап 2: Запуск Pipeline алгоритма...")
-    logger.info(f"[PIPELINE АЛГОРИТМ] Параметры: time_limit={time_limit_seconds}с, use_genetic={use_genetic}, use_cp_sat={use_cp_sat}")
+    logger.info("[PIPELINE АЛГОРИТМ] Этап 2: Запуск Pipeline алгоритма...")
+    logger.info("[PIPELINE АЛГОРИТМ] Параметры: time_limit=%sс, use_genetic=%s, use_cp_sat=%s", time_limit_seconds, use_genetic, use_cp_sat)
+    fingerprint = _pipeline_fingerprint(
+        requirements,
+        shift_id,
+        schedule_settings,
+        existing_schedule,
+        (clear_existing, time_limit_seconds, use_genetic, use_cp_sat)
+    )
+    cached_result = _pipeline_cache.get(fingerprint)
+    if cached_result is not None:
+        _pipeline_cache.move_to_end(fingerprint)
+        logger.info("[PIPELINE АЛГОРИТМ] ✓ Входные данные не изменились, результат взят из кэша")
+        return copy.deepcopy(cached_result)
+    
     start_pipeline = time.time()
     result = solve_schedule_pipeline(
         requirements=requirements,
@@ -106,8 +132,42 @@ def _generate_pipeline(
     )
     
     pipeline_time = time.time() - start_pipeline
-    logger.info(f"[PIPELINE АЛГОРИТМ] ✓ Pipeline завершен за {pipeline_time:.2f} секунд")
-    logger.info(f"[PIPELINE АЛГОРИТМ] Результат: {len(result.get('suggestions', []))} предложений, {len(result.get('warnings', []))} предупреждений")
+    logger.info("[PIPELINE АЛГОРИТМ] ✓ Pipeline завершен за %.2f секунд", pipeline_time)
+    logger.info("[PIPELINE АЛГОРИТМ] Результат: %s предложений, %s предупреждений", len(result.get('suggestions', [])), len(result.get('warnings', [])))
+    
+    _pipeline_cache[fingerprint] = copy.deepcopy(result)
+    if len(_pipeline_cache) > PIPELINE_CACHE_SIZE:
+        _pipeline_cache.popitem(last=False)
     
     return result
 
+
+def _pipeline_fingerprint(
+    requirements: List[ClassSubjectRequirement],
+    shift_id: int,
+    schedule_settings: Dict[int, int],
+    existing_schedule: Dict[Tuple[int, int, int], List[Dict]],
+    params: Tuple
+) -> str:
+    """
+    Строит хэш входных данных pipeline для кэширования результата
+    """
+    payload = {
+        'version': PIPELINE_CACHE_VERSION,
+        'shift_id': shift_id,
+        'requirements': [asdict(req) for req in requirements],
+        'schedule_settings': sorted(schedule_settings.items()),
+        'existing_schedule': sorted((list(key), lessons) for key, lessons in existing_schedule.items()),
+        'params': list(params)
+    }
+    serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.blake2b(serialized.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _json_default(value):
+    """
+    Сериализует множества (например, availability_grid) в стабильном порядке
+    """
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
@@ -1,13 +1,281 @@
 """
 Утилита для работы с Telegram Bot API
 """
+import logging
 import requests
-from flask import current_app
+import threading
+import time
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import current_app, g, has_app_context, has_request_context
 from datetime import datetime, date
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.core.auth import get_current_school_id
 from app.core.db_manager import db
+from app.core.ttl_cache import TTLCache
+from app.models.system import School
+from app.models.school import PermanentSchedule, TemporarySchedule, Shift, ClassGroup, Subject, Teacher
+
+logger = logging.getLogger(__name__)
 
 DAYS = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота', 'Воскресенье']
 
+# Количество параллельных запросов к Telegram API при рассылке
+# (по умолчанию, переопределяется TELEGRAM_BROADCAST_WORKERS в конфигурации)
+TELEGRAM_BROADCAST_WORKERS = 10
+
+# Максимум соединений в пуле сессии; число потоков рассылки не превышает его,
+# чтобы каждый поток работал через keep-alive соединение из пула
+TELEGRAM_POOL_MAXSIZE = 32
+
+# Общая HTTP-сессия: соединения с api.telegram.org переиспользуются (keep-alive)
+# Повторяются только ошибки установки соединения (запрос еще не отправлен):
+# после таймаута чтения или ответа 5xx сообщение могло уже дойти, и повтор
+# sendMessage продублировал бы его. 429 обрабатывается в _post_telegram_message
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=TELEGRAM_POOL_MAXSIZE,
+    max_retries=Retry(
+        total=2,
+        connect=2,
+        read=0,
+        status=0,
+        backoff_factor=0.3,
+        raise_on_status=False
+    )
+)
+_session = requests.Session()
+_session.mount('https://', _adapter)
+_session.mount('http://', _adapter)  # Локальный Bot API сервер (TELEGRAM_API_URL)
+
+# Размер пачки при чтении строк расписания для рассылки
+TEACHER_QUERY_BATCH_SIZE = 200
+
+# Лимит Telegram API: не более 30 сообщений в секунду на одного бота
+TELEGRAM_RATE_LIMIT = 30
+
+class _RateLimiter:
+    """Потокобезопасный ограничитель: запросы выпускаются с интервалом period / rate"""
+    
+    def __init__(self, rate, period=1.0):
+        self.interval = period / rate
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Дождаться очередного разрешенного момента отправки"""
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+# Ограничители по URL метода (URL содержит токен, лимит действует на бота)
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def _get_rate_limiter(url):
+    """Получить ограничитель частоты для бота"""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(url)
+        if limiter is None:
+            limiter = _rate_limiters[url] = _RateLimiter(TELEGRAM_RATE_LIMIT)
+        return limiter
+
+# Время жизни кэша токенов ботов школ (секунды)
+BOT_TOKEN_CACHE_TTL_SECONDS = 300
+
+# Кэш токенов: {school_id: (время загрузки, токен бота школы или None)}
+_bot_token_cache = {}
+
+def _drop_cached_bot_token(mapper, connection, school):
+    """Сбросить токен школы из кэша при изменении или удалении школы"""
+    _bot_token_cache.pop(school.id, None)
+
+event.listen(School, 'after_update', _drop_cached_bot_token)
+event.listen(School, 'after_delete', _drop_cached_bot_token)
+
+def _get_school_bot_token(school_id):
+    """Получить токен бота школы (с кэшированием на BOT_TOKEN_CACHE_TTL_SECONDS)"""
+    now = time.monotonic()
+    cached = _bot_token_cache.get(school_id)
+    if cached is not None and now - cached[0] < BOT_TOKEN_CACHE_TTL_SECONDS:
+        return cached[1]
+    
+    school = School.query.get(school_id)
+    token = school.telegram_bot_token if school else None
+    _bot_token_cache[school_id] = (now, token)
+    return token
+
+def _resolve_bot_token(school_id=None, bot_token=None):
+    """
+    Определить токен бота: переданный напрямую, токен школы или общий из конфигурации
+    """
+    # 1. Если передан bot_token напрямую, используем его
+    if bot_token:
+        return bot_token
+    
+    # 2. Если передан school_id, пытаемся получить токен из БД школы
+    if school_id:
+        token = _get_school_bot_token(school_id)
+        if token:
+            return token
+    
+    # 3. Если токен не найден, используем общий токен из конфигурации
+    return current_app.config.get('TELEGRAM_BOT_TOKEN')
+
+@lru_cache(maxsize=1024)
+def _parse_chat_id(telegram_id):
+    """
+    Разобрать строковый telegram_id (результат кэшируется: строки неизменяемы)
+    
+    Returns:
+        int (числовой ID) или str (username без @)
+    """
+    telegram_id_clean = telegram_id.strip()
+    # Пытаемся преобразовать в число (обрабатываем и целые, и float в строковом формате)
+    try:
+        # Сначала пытаемся преобразовать в float, затем в int
+        return int(float(telegram_id_clean))
+    except (ValueError, OverflowError):
+        # Если не число, это username
+        # Telegram API требует username БЕЗ символа @
+        # Убираем @ если есть
+        if telegram_id_clean.startswith('@'):
+            return telegram_id_clean[1:]  # Убираем @
+        return telegram_id_clean
+
+def _normalize_chat_id(telegram_id):
+    """
+    Преобразовать telegram_id в chat_id для Telegram API
+    
+    Returns:
+        int (числовой ID), str (username без @) или None, если telegram_id пустой
+    """
+    if not telegram_id:
+        return None
+    
+    # Числовой ID уже в нужном формате
+    if isinstance(telegram_id, int):
+        return telegram_id
+    
+    # Преобразуем telegram_id в правильный формат
+    # Telegram API принимает:
+    # - числовой ID (например: 123456789)
+    # - username с @ (например: @username)
+    # - username без @ (например: username) - Telegram API автоматически добавит @
+    if isinstance(telegram_id, str):
+        chat_id = _parse_chat_id(telegram_id)
+        if isinstance(chat_id, str):
+            logger.debug("📤 Отправка сообщения по username: %s (из %s)", chat_id, telegram_id)
+        return chat_id
+    
+    try:
+        return int(telegram_id) if isinstance(telegram_id, float) else str(telegram_id)
+    except (ValueError, OverflowError) as e:
+        logger.warning("Ошибка преобразования telegram_id '%s': %s", telegram_id, e)
+        return str(telegram_id)
+
+def _post_telegram_message(url, chat_id, message, parse_mode='HTML'):
+    """
+    Выполнить запрос sendMessage к Telegram API
+    
+    Не обращается к БД и контексту Flask, поэтому может выполняться в потоках рассылки
+    
+    Returns:
+        bool: True если успешно, False если ошибка
+    """
+    logger.debug("📤 Попытка отправки сообщения chat_id: %s (тип: %s)", chat_id, type(chat_id).__name__)
+    
+    limiter = _get_rate_limiter(url)
+    
+    # При превышении лимита (HTTP 429) ждем retry_after и повторяем один раз
+    for attempt in range(2):
+        limiter.acquire()
+        try:
+            response = _session.post(url, json={
+                'chat_id': chat_id,
+                'text': message,
+                'parse_mode': parse_mode
+            }, timeout=10)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Ошибка сети при отправке в Telegram: %s", e)
+            return False
+        
+        if response.status_code != 429 or attempt:
+            break
+        try:
+            retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+        except ValueError:
+            retry_after = 1
+        logger.warning("⚠️ Превышен лимит Telegram API, повтор через %s с", retry_after)
+        time.sleep(retry_after)
+    
+    if response.status_code == 200:
+        try:
+            result = response.json()
+        except ValueError:
+            logger.warning("⚠️ Ошибка отправки в Telegram: некорректный ответ API - %s", response.text)
+            return False
+        if result.get('ok'):
+            return True
+        else:
+            error_code = result.get('error_code', 'Unknown')
+            error_desc = result.get('description', 'Unknown error')
+            
+            # Специальная обработка ошибок
+            if error_code == 400:
+                if 'chat not found' in error_desc.lower():
+                    logger.warning(
+                        "⚠️ Telegram ID %s: Чат не найден. Учитель должен начать диалог с ботом (/start). "
+                        "Попросите учителя написать боту любое сообщение или /start", chat_id
+                    )
+                elif 'user not found' in error_desc.lower() or 'username not found' in error_desc.lower():
+                    logger.warning(
+                        "⚠️ Telegram ID %s: Пользователь не найден. Проверьте правильность Telegram ID/username. "
+                        "Убедитесь, что username существует и пользователь не заблокировал бота", chat_id
+                    )
+                elif 'bad request' in error_desc.lower():
+                    logger.warning("⚠️ Telegram ID %s: Неверный запрос - %s", chat_id, error_desc)
+                    if '@' in str(chat_id):
+                        logger.warning("   💡 Попробуйте использовать числовой ID вместо username")
+                else:
+                    logger.warning("⚠️ Telegram ID %s: %s", chat_id, error_desc)
+            elif error_code == 403:
+                logger.warning("⚠️ Telegram ID %s: Бот заблокирован пользователем", chat_id)
+            else:
+                logger.warning("⚠️ Telegram ID %s: Ошибка %s - %s", chat_id, error_code, error_desc)
+            
+            return False
+    else:
+        logger.warning("⚠️ Ошибка отправки в Telegram: HTTP %s - %s", response.status_code, response.text)
+        return False
+
+def _resolve_school_id(school_id=None):
+    """Определить ID школы: переданный, из g текущего запроса или из авторизации"""
+    if school_id:
+        return school_id
+    if has_request_context():
+        school_id = getattr(g, 'school_id', None)
+        if school_id:
+            return school_id
+    # Пытаемся получить из auth
+    try:
+        return get_current_school_id()
+    except Exception:
+        return None
+
+def _get_send_message_url(token):
+    """Получить URL метода sendMessage для токена бота"""
+    api_url = current_app.config.get('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
+    return f"{api_url}{token}/sendMessage"
+
 def send_telegram_message(telegram_id, message, parse_mode='HTML', school_id=None, bot_token=None):
     """
     Отправить сообщение в Telegram
@@ -23,119 +291,97 @@ def send_telegram_message(telegram_id, message, parse_mode='HTML', school_id=Non
         bool: True если успешно, False если ошибка
     """
     try:
-        from flask import has_app_context
         if not has_app_context():
-            print("Ошибка: нет контекста Flask приложения")
+            logger.error("Ошибка: нет контекста Flask приложения")
             return False
         
-        # Определяем токен бота
-        token = None
-        
-        # 1. Если передан bot_token напрямую, используем его
-        if bot_token:
-            token = bot_token
-        # 2. Если передан school_id, пытаемся получить токен из БД школы
-        elif school_id:
-            from app.models.system import School
-            school = School.query.get(school_id)
-            if school and school.telegram_bot_token:
-                token = school.telegram_bot_token
-        
-        # 3. Если токен не найден, используем общий токен из конфигурации
-        if not token:
-            token = current_app.config.get('TELEGRAM_BOT_TOKEN')
-        
+        token = _resolve_bot_token(school_id, bot_token)
         if not token:
-            print("TELEGRAM_BOT_TOKEN не настроен")
+            logger.error("TELEGRAM_BOT_TOKEN не настроен")
             return False
         
-        api_url = current_app.config.get('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
-        url = f"{api_url}{token}/sendMessage"
-        
-        # Преобразуем telegram_id в правильный формат
         # Telegram API принимает числовой ID или строку (для username)
-        if not telegram_id:
-            print(f"Ошибка: telegram_id пустой")
+        chat_id = _normalize_chat_id(telegram_id)
+        if chat_id is None:
+            logger.warning("Ошибка: telegram_id пустой")
             return False
         
-        # Преобразуем telegram_id в правильный формат
-        # Telegram API принимает:
-        # - числовой ID (например: 123456789)
-        # - username с @ (например: @username)
-        # - username без @ (например: username) - Telegram API автоматически добавит @
-        try:
-            if isinstance(telegram_id, (int, float)):
-                chat_id = int(telegram_id)
-            elif isinstance(telegram_id, str):
-                telegram_id_clean = telegram_id.strip()
-                # Пытаемся преобразовать в число (обрабатываем и целые, и float в строковом формате)
-                try:
-                    # Сначала пытаемся преобразовать в float, затем в int
-                    numeric_value = float(telegram_id_clean)
-                    chat_id = int(numeric_value)
-                except ValueError:
-                    # Если не число, это username
-                    # Telegram API требует username БЕЗ символа @
-                    # Убираем @ если есть
-                    if telegram_id_clean.startswith('@'):
-                        chat_id = telegram_id_clean[1:]  # Убираем @
-                    else:
-                        chat_id = telegram_id_clean
-                    print(f"📤 Отправка сообщения по username: {chat_id} (из {telegram_id})")
-            else:
-                chat_id = str(telegram_id)
-        except (ValueError, TypeError) as e:
-            print(f"Ошибка преобразования telegram_id '{telegram_id}': {e}")
-            chat_id = str(telegram_id)
-        
-        print(f"📤 Попытка отправки сообщения chat_id: {chat_id} (тип: {type(chat_id).__name__})")
-        
-        response = requests.post(url, json={
-            'chat_id': chat_id,
-            'text': message,
-            'parse_mode': parse_mode
-        }, timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('ok'):
-                return True
-            else:
-                error_code = result.get('error_code', 'Unknown')
-                error_desc = result.get('description', 'Unknown error')
-                
-                # Специальная обработка ошибок
-                if error_code == 400:
-                    if 'chat not found' in error_desc.lower():
-                        print(f"⚠️ Telegram ID {chat_id}: Чат не найден. Учитель должен начать диалог с ботом (/start)")
-                        print(f"   📝 Попросите учителя написать боту любое сообщение или /start")
-                    elif 'user not found' in error_desc.lower() or 'username not found' in error_desc.lower():
-                        print(f"⚠️ Telegram ID {chat_id}: Пользователь не найден. Проверьте правильность Telegram ID/username")
-                        print(f"   📝 Убедитесь, что username существует и пользователь не заблокировал бота")
-                    elif 'bad request' in error_desc.lower():
-                        print(f"⚠️ Telegram ID {chat_id}: Неверный запрос - {error_desc}")
-                        if '@' in str(chat_id):
-                            print(f"   💡 Попробуйте использовать числовой ID вместо username")
-                    else:
-                        print(f"⚠️ Telegram ID {chat_id}: {error_desc}")
-                elif error_code == 403:
-                    print(f"⚠️ Telegram ID {chat_id}: Бот заблокирован пользователем")
-                else:
-                    print(f"⚠️ Telegram ID {chat_id}: Ошибка {error_code} - {error_desc}")
-                
-                return False
-        else:
-            print(f"⚠️ Ошибка отправки в Telegram: HTTP {response.status_code} - {response.text}")
-            return False
-    except requests.exceptions.RequestException as e:
-        print(f"Ошибка сети при отправке в Telegram: {str(e)}")
-        return False
+        return _post_telegram_message(_get_send_message_url(token), chat_id, message, parse_mode)
     except Exception as e:
-        print(f"Исключение при отправке в Telegram: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Исключение при отправке в Telegram: %s", e)
         return False
 
+def _prepare_broadcast(teacher_messages, school_id=None):
+    """
+    Подготовить рассылку: токен бота, chat_id и данные учителей для отчета
+    
+    Выполняется в потоке запроса: читает конфигурацию, БД и атрибуты ORM-объектов,
+    чтобы сама отправка (_run_broadcast) не зависела от контекста Flask и сессии
+    
+    Args:
+        teacher_messages: Список пар (teacher, message), teacher - объект или строка
+            с полями full_name и telegram_id
+        school_id: ID школы (опционально, для получения токена бота школы)
+    
+    Returns:
+        dict: {'url': str или None, 'workers': int, 'jobs': список (chat_id, message, full_name, telegram_id)}
+    """
+    token = _resolve_bot_token(school_id) if teacher_messages else None
+    if teacher_messages and not token:
+        logger.error("TELEGRAM_BOT_TOKEN не настроен")
+    
+    return {
+        'url': _get_send_message_url(token) if token else None,
+        'workers': current_app.config.get('TELEGRAM_BROADCAST_WORKERS', TELEGRAM_BROADCAST_WORKERS),
+        'jobs': [
+            (_normalize_chat_id(teacher.telegram_id), message, teacher.full_name, teacher.telegram_id)
+            for teacher, message in teacher_messages
+        ]
+    }
+
+def _run_broadcast(broadcast, results):
+    """
+    Разослать подготовленные сообщения параллельно и записать итоги в results
+    """
+    url = broadcast['url']
+    jobs = broadcast['jobs']
+    if not jobs:
+        return
+    
+    def send(job):
+        chat_id, message = job[0], job[1]
+        if url is None or chat_id is None:
+            return False
+        # Ошибка отправки одному учителю не должна прерывать подсчет остальных
+        try:
+            return _post_telegram_message(url, chat_id, message)
+        except Exception as e:
+            logger.exception("Ошибка отправки в Telegram chat_id %s: %s", chat_id, e)
+            return False
+    
+    workers = min(broadcast['workers'], TELEGRAM_POOL_MAXSIZE, len(jobs))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for (_, _, full_name, telegram_id), ok in zip(jobs, executor.map(send, jobs)):
+            if ok:
+                results['success'] += 1
+            else:
+                _add_send_error(results, full_name, telegram_id)
+
+def _add_send_error(results, full_name, telegram_id):
+    """Записать ошибку отправки учителю в результаты рассылки"""
+    results['failed'] += 1
+    error_detail = f"{full_name}"
+    if telegram_id:
+        error_detail += f" (ID: {telegram_id})"
+    else:
+        error_detail += " (ID не указан)"
+    results['errors'].append(error_detail)
+    results['details'].append({
+        'teacher': full_name,
+        'telegram_id': telegram_id or 'не указан',
+        'reason': 'Ошибка отправки'
+    })
+
 def format_schedule_for_teacher(teacher, shift_id=None, schedule_type='permanent', schedule_date=None):
     """
     Форматировать расписание учителя для отправки
@@ -157,61 +403,169 @@ def format_schedule_for_teacher(teacher, shift_id=None, schedule_type='permanent
             schedule_date = date.today()
         return format_temporary_schedule(teacher, schedule_date)
 
+def _active_shift_id():
+    """
+    ID активной смены текущей БД школы или None
+    
+    Кэшируется в g на время контекста приложения (запроса), ключ - URI БД школы
+    """
+    bind_uri = current_app.config.get('SQLALCHEMY_BINDS', {}).get('school')
+    cached = getattr(g, '_active_shift_ids', None)
+    if cached is None:
+        cached = g._active_shift_ids = {}
+    elif bind_uri in cached:
+        return cached[bind_uri]
+    
+    # Только id, без загрузки объекта Shift
+    shift_id = db.session.query(Shift.id).filter_by(is_active=True).limit(1).scalar()
+    cached[bind_uri] = shift_id
+    return shift_id
+
+# Кэш отформатированного постоянного расписания (format_permanent_schedule)
+PERMANENT_SCHEDULE_CACHE_TTL_SECONDS = 600
+PERMANENT_SCHEDULE_CACHE_SIZE = 2048
+
+# {(URI БД школы, teacher_id, shift_id): (ФИО учителя, сообщение)}
+# Записи сбрасываются точечно при изменении уроков учителя, а не после каждого commit
+_permanent_schedule_cache = TTLCache(
+    PERMANENT_SCHEDULE_CACHE_TTL_SECONDS, PERMANENT_SCHEDULE_CACHE_SIZE, clear_on_commit=False
+)
+
+def clear_permanent_schedule_cache():
+    """Сбросить кэш отформатированного постоянного расписания"""
+    _permanent_schedule_cache.clear()
+
+def _school_bind_uri():
+    """URI текущей БД школы (часть ключа кэша расписания)"""
+    return current_app.config.get('SQLALCHEMY_BINDS', {}).get('school')
+
+def _invalidate_permanent_schedule(mapper, connection, target):
+    """Сбросить кэш учителя и смены измененного урока (и прежних, если урок переназначен)"""
+    state = inspect(target)
+    school_uri = _school_bind_uri()
+    for teacher_id in {target.teacher_id, *state.attrs.teacher_id.history.deleted}:
+        for shift_id in {target.shift_id, *state.attrs.shift_id.history.deleted}:
+            _permanent_schedule_cache.pop((school_uri, teacher_id, shift_id))
+
+def _clear_on_bulk_statement(orm_execute_state):
+    """Массовые insert/update/delete по PermanentSchedule не вызывают событий маппера - сбрасываем весь кэш"""
+    if not orm_execute_state.is_select and any(
+        mapper.class_ is PermanentSchedule for mapper in orm_execute_state.all_mappers
+    ):
+        clear_permanent_schedule_cache()
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(PermanentSchedule, _event_name, _invalidate_permanent_schedule)
+# Переименование класса или предмета меняет текст расписания всех учителей
+event.listen(ClassGroup, 'after_update', lambda mapper, connection, target: clear_permanent_schedule_cache())
+event.listen(Subject, 'after_update', lambda mapper, connection, target: clear_permanent_schedule_cache())
+event.listen(Session, 'do_orm_execute', _clear_on_bulk_statement)
+# Очистка БД школы пересоздает таблицы через metadata.drop_all
+event.listen(db.Model.metadata, 'after_drop', lambda target, connection, **kw: clear_permanent_schedule_cache())
+
+def _permanent_schedule_query(shift_id):
+    """
+    Запрос уроков постоянного расписания смены
+    
+    Возвращает кортежи (teacher_id, day_of_week, lesson_number, subject_name, class_name, cabinet)
+    без загрузки ORM-объектов
+    """
+    return db.session.query(
+        PermanentSchedule.teacher_id,
+        PermanentSchedule.day_of_week,
+        PermanentSchedule.lesson_number,
+        Subject.name.label('subject_name'),
+        ClassGroup.name.label('class_name'),
+        PermanentSchedule.cabinet
+    ).join(
+        ClassGroup, PermanentSchedule.class_id == ClassGroup.id
+    ).join(
+        Subject, PermanentSchedule.subject_id == Subject.id
+    ).filter(
+        PermanentSchedule.shift_id == shift_id
+    ).order_by(
+        PermanentSchedule.day_of_week,
+        PermanentSchedule.lesson_number
+    )
+
+def _temporary_schedule_query(schedule_date):
+    """
+    Запрос уроков временного расписания на дату
+    
+    Возвращает кортежи (teacher_id, lesson_number, subject_name, class_name, cabinet)
+    без загрузки ORM-объектов
+    """
+    # Временное расписание не имеет поля shift_id, фильтруем только по дате
+    return db.session.query(
+        TemporarySchedule.teacher_id,
+        TemporarySchedule.lesson_number,
+        Subject.name.label('subject_name'),
+        ClassGroup.name.label('class_name'),
+        TemporarySchedule.cabinet
+    ).join(
+        ClassGroup, TemporarySchedule.class_id == ClassGroup.id
+    ).join(
+        Subject, TemporarySchedule.subject_id == Subject.id
+    ).filter(
+        TemporarySchedule.date == schedule_date
+    ).order_by(
+        TemporarySchedule.lesson_number
+    )
+
 def format_permanent_schedule(teacher, shift_id=None):
-    """Форматировать постоянное расписание учителя"""
-    from app.models.school import PermanentSchedule, Shift, ClassGroup, Subject
-    
-    if shift_id:
-        schedule_items = db.session.query(PermanentSchedule).filter_by(
-            teacher_id=teacher.id,
-            shift_id=shift_id
-        ).join(ClassGroup).join(Subject).order_by(
-            PermanentSchedule.day_of_week,
-            PermanentSchedule.lesson_number
-        ).all()
-    else:
+    """Форматировать постоянное расписание учителя
+    
+    Результат кэшируется на PERMANENT_SCHEDULE_CACHE_TTL_SECONDS (до изменения уроков учителя)
+    """
+    if not shift_id:
         # Берем активную смену
-        active_shift = db.session.query(Shift).filter_by(is_active=True).first()
-        if not active_shift:
+        shift_id = _active_shift_id()
+        if not shift_id:
             return "❌ Нет активной смены"
-        schedule_items = db.session.query(PermanentSchedule).filter_by(
-            teacher_id=teacher.id,
-            shift_id=active_shift.id
-        ).join(ClassGroup).join(Subject).order_by(
-            PermanentSchedule.day_of_week,
-            PermanentSchedule.lesson_number
-        ).all()
     
+    key = (_school_bind_uri(), teacher.id, shift_id)
+    cached = _permanent_schedule_cache.get(key)
+    if cached is not None and cached[0] == teacher.full_name:
+        return cached[1]
+    
+    schedule_items = _permanent_schedule_query(shift_id).filter(
+        PermanentSchedule.teacher_id == teacher.id
+    ).all()
+    message = format_permanent_schedule_from_rows(teacher, schedule_items)
+    _permanent_schedule_cache.set(key, (teacher.full_name, message))
+    
+    return message
+
+def format_permanent_schedule_from_rows(teacher, schedule_items):
+    """Форматировать постоянное расписание учителя по уже загруженным урокам
+    
+    Args:
+        teacher: Объект Teacher (или строка запроса с полем full_name)
+        schedule_items: Строки _permanent_schedule_query учителя, упорядоченные по дню и номеру урока
+    
+    Returns:
+        str: Отформатированное расписание
+    """
     if not schedule_items:
         return f"📅 <b>Расписание для {teacher.full_name}</b>\n\nРасписание пока не составлено."
     
-    # Группируем по дням
+    # Группируем строки уроков по дням
+    # Уроки уже упорядочены по номеру урока (ORDER BY в запросе)
     schedule_by_day = {}
-    for item in schedule_items:
-        day = item.day_of_week
+    for _, day, lesson_num, subject_name, class_name, cabinet in schedule_items:
         if day not in schedule_by_day:
             schedule_by_day[day] = []
-        schedule_by_day[day].append(item)
+        schedule_by_day[day].append(f"  {lesson_num}. {subject_name} - {class_name} (каб. {cabinet or '—'})\n")
     
-    message = f"📅 <b>Расписание для {teacher.full_name}</b>\n\n"
+    parts = [f"📅 <b>Расписание для {teacher.full_name}</b>\n\n"]
     
     for day_num in sorted(schedule_by_day.keys()):
         day_name = DAYS[day_num - 1]
-        message += f"<b>{day_name}:</b>\n"
-        
-        # Сортируем по номеру урока
-        day_items = sorted(schedule_by_day[day_num], key=lambda x: x.lesson_number)
-        
-        for item in day_items:
-            class_name = item.class_group.name
-            subject_name = item.subject.name
-            lesson_num = item.lesson_number
-            cabinet = item.cabinet or "—"
-            message += f"  {lesson_num}. {subject_name} - {class_name} (каб. {cabinet})\n"
-        
-        message += "\n"
+        parts.append(f"<b>{day_name}:</b>\n")
+        parts.extend(schedule_by_day[day_num])
+        parts.append("\n")
     
-    return message
+    return ''.join(parts)
 
 def format_temporary_schedule(teacher, schedule_date=None):
     """Форматировать временное расписание учителя на дату
@@ -223,41 +577,44 @@ def format_temporary_schedule(teacher, schedule_date=None):
     Returns:
         str или None: Отформатированное расписание или None, если нет расписания на эту дату
     """
-    from app.models.school import TemporarySchedule, ClassGroup, Subject
-    
     if not schedule_date:
         schedule_date = date.today()
     
-    # Временное расписание не имеет поля shift_id, фильтруем только по дате и учителю
-    schedule_items = db.session.query(TemporarySchedule).filter_by(
-        teacher_id=teacher.id,
-        date=schedule_date
-    ).join(ClassGroup).join(Subject).order_by(
-        TemporarySchedule.lesson_number
+    schedule_items = _temporary_schedule_query(schedule_date).filter(
+        TemporarySchedule.teacher_id == teacher.id
     ).all()
     
+    return format_temporary_schedule_from_rows(teacher, schedule_date, schedule_items)
+
+def format_temporary_schedule_from_rows(teacher, schedule_date, schedule_items):
+    """Форматировать временное расписание учителя по уже загруженным урокам
+    
+    Args:
+        teacher: Объект Teacher (или строка запроса с полем full_name)
+        schedule_date: Дата временного расписания
+        schedule_items: Строки _temporary_schedule_query учителя, упорядоченные по номеру урока
+    
+    Returns:
+        str или None: Отформатированное расписание или None, если нет расписания на эту дату
+    """
     if not schedule_items:
         return None  # Нет изменений на эту дату
     
     date_str = schedule_date.strftime('%d.%m.%Y')
-    day_name = DAYS[schedule_date.weekday()] if schedule_date.weekday() < 7 else ''
-    
-    message = f"📢 <b>Изменения в расписании</b>\n\n"
-    message += f"<b>Дата:</b> {date_str} ({day_name})\n"
-    message += f"<b>Учитель:</b> {teacher.full_name}\n\n"
-    message += "<b>Расписание на этот день:</b>\n"
+    day_name = DAYS[schedule_date.weekday()]
     
-    # Сортируем по номеру урока
-    schedule_items = sorted(schedule_items, key=lambda x: x.lesson_number)
+    parts = [
+        "📢 <b>Изменения в расписании</b>\n\n",
+        f"<b>Дата:</b> {date_str} ({day_name})\n",
+        f"<b>Учитель:</b> {teacher.full_name}\n\n",
+        "<b>Расписание на этот день:</b>\n"
+    ]
     
-    for item in schedule_items:
-        class_name = item.class_group.name
-        subject_name = item.subject.name
-        lesson_num = item.lesson_number
-        cabinet = item.cabinet or "—"
-        message += f"  {lesson_num}. {subject_name} - {class_name} (каб. {cabinet})\n"
+    # Уроки уже упорядочены по номеру урока (ORDER BY в запросе)
+    for _, lesson_num, subject_name, class_name, cabinet in schedule_items:
+        parts.append(f"  {lesson_num}. {subject_name} - {class_name} (каб. {cabinet or '—'})\n")
     
-    return message
+    return ''.join(parts)
 
 def send_schedule_to_teacher(teacher, shift_id=None, school_id=None):
     """Отправить постоянное расписание учителю"""
@@ -265,28 +622,16 @@ def send_schedule_to_teacher(teacher, shift_id=None, school_id=None):
         return False
     
     # Получаем school_id из контекста, если не передан
-    if not school_id:
-        from flask import g, has_request_context
-        if has_request_context():
-            school_id = getattr(g, 'school_id', None)
-        if not school_id:
-            # Пытаемся получить из auth
-            try:
-                from app.core.auth import get_current_school_id
-                school_id = get_current_school_id()
-            except:
-                pass
+    school_id = _resolve_school_id(school_id)
     
     try:
         message = format_permanent_schedule(teacher, shift_id)
         if not message:
-            print(f"Не удалось сформировать сообщение для учителя {teacher.full_name}")
+            logger.warning("Не удалось сформировать сообщение для учителя %s", teacher.full_name)
             return False
         return send_telegram_message(teacher.telegram_id, message, school_id=school_id)
     except Exception as e:
-        print(f"Ошибка при отправке расписания учителю {teacher.full_name}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Ошибка при отправке расписания учителю %s: %s", teacher.full_name, e)
         return False
 
 def send_temporary_changes_to_teacher(teacher, schedule_date, shift_id=None, school_id=None):
@@ -295,17 +640,7 @@ def send_temporary_changes_to_teacher(teacher, schedule_date, shift_id=None, sch
         return False
     
     # Получаем school_id из контекста, если не передан
-    if not school_id:
-        from flask import g, has_request_context
-        if has_request_context():
-            school_id = getattr(g, 'school_id', None)
-        if not school_id:
-            # Пытаемся получить из auth
-            try:
-                from app.core.auth import get_current_school_id
-                school_id = get_current_school_id()
-            except:
-                pass
+    school_id = _resolve_school_id(school_id)
     
     message = format_temporary_schedule(teacher, schedule_date)
     if message:
@@ -313,56 +648,57 @@ def send_temporary_changes_to_teacher(teacher, schedule_date, shift_id=None, sch
     return False
 
 def send_schedule_to_all_teachers(shift_id=None, school_id=None):
-    """Отправить расписание всем учителям с уроками в постоянном расписании"""
-    from app.models.school import Teacher, PermanentSchedule, Shift
+    """Отправить расписание всем учителям с уроками в постоянном расписании
     
+    Args:
+        shift_id: ID смены (если None, используется активная смена)
+        school_id: ID школы (опционально, для получения токена бота школы)
+    
+    Returns:
+        dict: Результаты отправки {'success': int, 'failed': int, 'errors': list}
+    """
     # Получаем school_id из контекста, если не передан
-    if not school_id:
-        from flask import g, has_request_context
-        if has_request_context():
-            school_id = getattr(g, 'school_id', None)
-        if not school_id:
-            # Пытаемся получить из auth
-            try:
-                from app.core.auth import get_current_school_id
-                school_id = get_current_school_id()
-            except:
-                pass
+    school_id = _resolve_school_id(school_id)
     
     # Определяем смену
     if not shift_id:
-        active_shift = db.session.query(Shift).filter_by(is_active=True).first()
-        if not active_shift:
+        shift_id = _active_shift_id()
+        if not shift_id:
             return {'success': 0, 'failed': 0, 'errors': ['Нет активной смены']}
-        shift_id = active_shift.id
-    
-    # Получаем учителей, у которых есть уроки в постоянном расписании для этой смены
-    teachers_with_schedule = db.session.query(Teacher).join(
-        PermanentSchedule, Teacher.id == PermanentSchedule.teacher_id
-    ).filter(
-        PermanentSchedule.shift_id == shift_id,
-        Teacher.telegram_id.isnot(None)
-    ).distinct().all()
     
     results = {'success': 0, 'failed': 0, 'errors': [], 'details': []}
     
-    for teacher in teachers_with_schedule:
-        if send_schedule_to_teacher(teacher, shift_id, school_id=school_id):
-            results['success'] += 1
+    # Уроки смены вместе с данными учителей одним запросом, упорядочены по учителю
+    # Строки читаются пачками и группируются по teacher_id за один проход
+    rows = _permanent_schedule_query(shift_id).join(
+        Teacher, PermanentSchedule.teacher_id == Teacher.id
+    ).filter(
+        Teacher.telegram_id.isnot(None)
+    ).add_columns(
+        Teacher.full_name, Teacher.telegram_id
+    ).order_by(None).order_by(
+        PermanentSchedule.teacher_id,
+        PermanentSchedule.day_of_week,
+        PermanentSchedule.lesson_number
+    ).yield_per(TEACHER_QUERY_BATCH_SIZE)
+    
+    # Формируем сообщения заранее, затем отправляем параллельно
+    teacher_messages = []
+    for _, group in groupby(rows, key=itemgetter(0)):
+        teacher_rows = list(group)
+        # Строка содержит full_name и telegram_id учителя
+        teacher = teacher_rows[0]
+        try:
+            message = format_permanent_schedule_from_rows(teacher, [row[:6] for row in teacher_rows])
+        except Exception as e:
+            logger.exception("Ошибка при формировании расписания учителя %s: %s", teacher.full_name, e)
+            message = None
+        if message:
+            teacher_messages.append((teacher, message))
         else:
-            results['failed'] += 1
-            error_detail = f"{teacher.full_name}"
-            if teacher.telegram_id:
-                error_detail += f" (ID: {teacher.telegram_id})"
-            else:
-                error_detail += " (ID не указан)"
-            results['errors'].append(error_detail)
-            results['details'].append({
-                'teacher': teacher.full_name,
-                'telegram_id': teacher.telegram_id or 'не указан',
-                'reason': 'Ошибка отправки'
-            })
+            _add_send_error(results, teacher.full_name, teacher.telegram_id)
     
+    _run_broadcast(_prepare_broadcast(teacher_messages, school_id), results)
     return results
 
 def send_temporary_changes_to_all_teachers(schedule_date, school_id=None):
@@ -375,53 +711,35 @@ def send_temporary_changes_to_all_teachers(schedule_date, school_id=None):
     Returns:
         dict: Результаты отправки {'success': int, 'failed': int, 'no_changes': int, 'errors': list}
     """
-    from app.models.school import Teacher, TemporarySchedule
-    
     # Получаем school_id из контекста, если не передан
-    if not school_id:
-        from flask import g, has_request_context
-        if has_request_context():
-            school_id = getattr(g, 'school_id', None)
-        if not school_id:
-            # Пытаемся получить из auth
-            try:
-                from app.core.auth import get_current_school_id
-                school_id = get_current_school_id()
-            except:
-                pass
-    
-    # Получаем учителей, у которых есть уроки во временном расписании на эту дату
-    # Временное расписание не связано со сменой, поэтому shift_id не используется
-    teachers_with_temporary = db.session.query(Teacher).join(
-        TemporarySchedule, Teacher.id == TemporarySchedule.teacher_id
-    ).filter(
-        TemporarySchedule.date == schedule_date,
-        Teacher.telegram_id.isnot(None)
-    ).distinct().all()
+    school_id = _resolve_school_id(school_id)
     
     results = {'success': 0, 'failed': 0, 'no_changes': 0, 'errors': [], 'details': []}
     
-    for teacher in teachers_with_temporary:
-        # Временное расписание не связано со сменой, поэтому shift_id не используется
-        message = format_temporary_schedule(teacher, schedule_date)
+    # Уроки на дату вместе с данными учителей одним запросом, упорядочены по учителю
+    # Временное расписание не связано со сменой, поэтому shift_id не используется
+    rows = _temporary_schedule_query(schedule_date).join(
+        Teacher, TemporarySchedule.teacher_id == Teacher.id
+    ).filter(
+        Teacher.telegram_id.isnot(None)
+    ).add_columns(
+        Teacher.full_name, Teacher.telegram_id
+    ).order_by(None).order_by(
+        TemporarySchedule.teacher_id,
+        TemporarySchedule.lesson_number
+    ).yield_per(TEACHER_QUERY_BATCH_SIZE)
+    
+    # Формируем сообщения заранее, затем отправляем параллельно
+    teacher_messages = []
+    for _, group in groupby(rows, key=itemgetter(0)):
+        teacher_rows = list(group)
+        # Строка содержит full_name и telegram_id учителя
+        teacher = teacher_rows[0]
+        message = format_temporary_schedule_from_rows(teacher, schedule_date, [row[:5] for row in teacher_rows])
         if message:
-            if send_telegram_message(teacher.telegram_id, message, school_id=school_id):
-                results['success'] += 1
-            else:
-                results['failed'] += 1
-                error_detail = f"{teacher.full_name}"
-                if teacher.telegram_id:
-                    error_detail += f" (ID: {teacher.telegram_id})"
-                else:
-                    error_detail += " (ID не указан)"
-                results['errors'].append(error_detail)
-                results['details'].append({
-                    'teacher': teacher.full_name,
-                    'telegram_id': teacher.telegram_id or 'не указан',
-                    'reason': 'Ошибка отправки'
-                })
+            teacher_messages.append((teacher, message))
         else:
             results['no_changes'] += 1
     
+    _run_broadcast(_prepare_broadcast(teacher_messages, school_id), results)
     return results
-
@@ -12,6 +12,7 @@ class Config:
     # Telegram Bot API настройки
     TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '8266665318:AAH9vyLlel7UoAWT4iyRBqWCIbnpLkEnvcM')  # Токен бота из @BotFather
     TELEGRAM_API_URL = 'https://api.telegram.org/bot'
+    TELEGRAM_BROADCAST_WORKERS = int(os.environ.get('TELEGRAM_BROADCAST_WORKERS', 10))  # Параллельных запросов при рассылке
     
     # AI API настройки (Qwen, DeepSeek, OpenAI или Yandex GPT)
     # Приоритет: Qwen > DeepSeek > OpenAI > Yandex GPT
@@ -280,6 +280,7 @@ class TeacherAssignment(db.Model):
 ''',
         "app.py": '''from flask import Flask, render_template, request, flash, redirect, url_for
 import os
+from collections import defaultdict
 from config import Config
 from models import db, Subject, ClassGroup, Teacher, ClassLoad, TeacherAssignment
 from utils.excel_loader import load_class_load_excel, load_teacher_assignments_excel
@@ -299,7 +300,8 @@ def public_index():
 
 @app.route('/admin')
 def admin_index():
-    subjects = Subject.query.order_by(Subject.name).all()
+    # Шаблону нужны только названия - ORM-объекты не создаются
+    subjects = Subject.query.with_entities(Subject.id, Subject.name).order_by(Subject.name).all()
     return render_template('admin/index.html', subjects=subjects)
 
 @app.route('/admin/matrix/<subject_name>')
@@ -308,16 +310,23 @@ def subject_matrix(subject_name):
     classes = ClassGroup.query.order_by(ClassGroup.name).all()
     teachers = Teacher.query.order_by(Teacher.full_name).all()
 
+    # Нагрузка и назначения по предмету двумя запросами вместо запроса на каждую ячейку
+    loads = dict(db.session.query(ClassLoad.class_id, ClassLoad.hours_per_week).filter_by(subject_id=subject.id).all())
+    assigned_hours = defaultdict(lambda: defaultdict(int))
+    for class_id, teacher_id, hours in db.session.query(
+        TeacherAssignment.class_id, TeacherAssignment.teacher_id, TeacherAssignment.hours_per_week
+    ).filter_by(subject_id=subject.id):
+        assigned_hours[class_id][teacher_id] += hours or 0
+
     matrix = []
     for cls in classes:
         row = {'class': cls}
-        load = ClassLoad.query.filter_by(class_id=cls.id, subject_id=subject.id).first()
-        row['required'] = load.hours_per_week if load else 0
+        row['required'] = loads.get(cls.id, 0)
 
         assigned = 0
+        class_hours = assigned_hours.get(cls.id, {})
         for t in teachers:
-            ass = TeacherAssignment.query.filter_by(teacher_id=t.id, subject_id=subject.id, class_id=cls.id).first()
-            hours = ass.hours_per_week if ass else 0
+            hours = class_hours.get(t.id, 0)
             row[f'teacher_{t.id}'] = hours
             assigned += hours
         row['assigned'] = assigned
@@ -361,16 +370,32 @@ if __name__ == '__main__':
     }
 }
 
+def _flatten(struct, base_path):
+    """Разворачивает вложенную структуру в список (путь, содержимое); у папок содержимое None"""
+    entries = []
+    stack = [(base_path, struct)]
+    while stack:
+        path, node = stack.pop()
+        for name, content in node.items():
+            item_path = os.path.join(path, name)
+            if isinstance(content, dict):
+                entries.append((item_path, None))
+                stack.append((item_path, content))
+            else:
+                entries.append((item_path, content))
+    return entries
+
 def create_structure(base_path, struct):
-    for name, content in struct.items():
-        path = os.path.join(base_path, name)
-        if isinstance(content, dict):
-            os.makedirs(path, exist_ok=True)
-            create_structure(path, content)
-        else:
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(content.lstrip())
-            print(f"Создан: {path}")
+    entries = _flatten(struct, base_path)
+    # Сначала все папки (каждая один раз), затем запись файлов подряд
+    for path in sorted({path for path, content in entries if content is None}):
+        os.makedirs(path, exist_ok=True)
+    for path, content in entries:
+        if content is None:
+            continue
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content.lstrip())
+        print(f"Создан: {path}")
 
 if __name__ == '__main__':
     project_dir = "schedule_app"
@@ -1,9 +1,13 @@
 """
-Пример использования ScheduleSolver для составления расписания
+Пример использования pipeline-алгоритма для составления расписания
+Этап Graph Coloring использует JIT-ядра Numba (cache=True), поэтому
+скомпилированный код переиспользуется между запусками
 """
-from app.services.schedule_solver import (
-    ScheduleSolver, ClassSubjectRequirement, LessonSlot
-)
+from app.services.schedule_solver import ClassSubjectRequirement
+from app.services.schedule_solver_pipeline import solve_schedule_pipeline
+
+# 6 уроков в день, понедельник-пятница
+schedule_settings = {1: 6, 2: 6, 3: 6, 4: 6, 5: 6}
 
 # Пример 1: Простое расписание для одного класса
 requirements = [
@@ -12,36 +16,40 @@ requirements = [
         subject_id=1,  # Математика
         total_hours_per_week=5,
         has_subgroups=False,
-        teachers=[{'teacher_id': 1, 'default_cabinet': '101', 'hours_per_week': 5}]
+        teachers=[{
+            'teacher_id': 1, 'default_cabinet': '101', 'hours_per_week': 5,
+            'available_cabinets': [{'name': '101', 'priority': 1}]
+        }]
     ),
     ClassSubjectRequirement(
         class_id=1,
         subject_id=2,  # Русский язык
         total_hours_per_week=4,
         has_subgroups=False,
-        teachers=[{'teacher_id': 2, 'default_cabinet': '102', 'hours_per_week': 4}]
+        teachers=[{
+            'teacher_id': 2, 'default_cabinet': '102', 'hours_per_week': 4,
+            'available_cabinets': [{'name': '102', 'priority': 1}]
+        }]
     ),
 ]
 
-# Создаем solver
-solver = ScheduleSolver(
-    class_subject_requirements=requirements,
-    study_days=[1, 2, 3, 4, 5],  # Понедельник-пятница
-    max_lessons_per_day={1: 6, 2: 6, 3: 6, 4: 6, 5: 6}  # 6 уроков в день
+# Решаем (existing_schedule и schedule_settings переданы явно - БД не нужна)
+result = solve_schedule_pipeline(
+    requirements,
+    shift_id=1,
+    existing_schedule={},
+    schedule_settings=schedule_settings
 )
 
-# Решаем
-success, schedule, warnings = solver.solve()
-
-if success:
-    print(f"✅ Расписание успешно создано! Всего уроков: {len(schedule)}")
-    for lesson in schedule:
-        print(f"  День {lesson.day_of_week}, Урок {lesson.lesson_number}: "
-              f"Класс {lesson.class_id}, Предмет {lesson.subject_id}, "
-              f"Учитель {lesson.teacher_id}, Кабинет {lesson.cabinet}")
+if not result['warnings']:
+    print(f"✅ Расписание успешно создано! Всего уроков: {len(result['suggestions'])}")
+    for lesson in result['suggestions']:
+        print(f"  День {lesson['day_of_week']}, Урок {lesson['lesson_number']}: "
+              f"Класс {lesson['class_id']}, Предмет {lesson['subject_id']}, "
+              f"Учитель {lesson['teacher_id']}, Кабинет {lesson['cabinet']}")
 else:
     print(f"⚠️ Не удалось разместить все уроки")
-    for warning in warnings:
+    for warning in result['warnings']:
         print(f"  {warning}")
 
 # Пример 2: Расписание с подгруппами
@@ -52,24 +60,24 @@ requirements_with_subgroups = [
         total_hours_per_week=2,
         has_subgroups=True,  # Есть подгруппы!
         teachers=[
-            {'teacher_id': 3, 'default_cabinet': '201', 'hours_per_week': 1},
-            {'teacher_id': 4, 'default_cabinet': '202', 'hours_per_week': 1}
+            {'teacher_id': 3, 'default_cabinet': '201', 'hours_per_week': 1,
+             'available_cabinets': [{'name': '201', 'priority': 1}]},
+            {'teacher_id': 4, 'default_cabinet': '202', 'hours_per_week': 1,
+             'available_cabinets': [{'name': '202', 'priority': 1}]}
         ]
     ),
 ]
 
-solver2 = ScheduleSolver(
-    class_subject_requirements=requirements_with_subgroups,
-    study_days=[1, 2, 3, 4, 5],
-    max_lessons_per_day={1: 6, 2: 6, 3: 6, 4: 6, 5: 6}
+result2 = solve_schedule_pipeline(
+    requirements_with_subgroups,
+    shift_id=1,
+    existing_schedule={},
+    schedule_settings=schedule_settings
 )
 
-success2, schedule2, warnings2 = solver2.solve()
-
-if success2:
+if not result2['warnings']:
     print(f"\n✅ Расписание с подгруппами создано!")
     # Подгруппы должны быть в одно время
-    for lesson in schedule2:
-        print(f"  День {lesson.day_of_week}, Урок {lesson.lesson_number}: "
-              f"Учитель {lesson.teacher_id}, Кабинет {lesson.cabinet}")
-
+    for lesson in result2['suggestions']:
+        print(f"  День {lesson['day_of_week']}, Урок {lesson['lesson_number']}: "
+              f"Учитель {lesson['teacher_id']}, Кабинет {lesson['cabinet']}")
@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration (loaded automatically from the project root)
+
+app.py is imported once in the master process (preload_app) and workers
+inherit it via fork, instead of every worker re-executing app.py and
+re-registering blueprints on startup.
+"""
+
+# Import the application in the master before forking workers
+preload_app = True
+
+
+def post_fork(server, worker):
+    """
+    Drop SQLAlchemy connection pools inherited from the master
+
+    Importing app.py opens SQLite connections (startup migrations); they must
+    not be shared between processes. dispose(close=False) discards the pools
+    without closing the master's connections, so each worker opens its own.
+    """
+    from wsgi import app
+    from app.core.db_manager import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    db.dispose_school_engines(close=False)
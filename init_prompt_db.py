@@ -4,7 +4,10 @@
 Создает структуру: Класс -> Предмет -> Учителя
 Определяет подгруппы на основе количества учителей
 """
+import multiprocessing
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from flask import Flask
 from config import Config
 from app.core.db_manager import init_system_db, db, switch_school_db
@@ -12,60 +15,96 @@ from app.models.system import School
 from app.models.school import PromptClassSubject, PromptClassSubjectTeacher
 from utils.prompt_db import build_prompt_database
 
-# Создаем Flask app для работы с БД
-app = Flask(__name__)
-app.config.from_object(Config)
-init_system_db(app)
+# Flask app для работы с БД создается при первом обращении, а не при импорте модуля
+_app = None
 
-def init_prompt_db_for_all_schools():
-    """Инициализирует БД промпта для всех школ"""
-    with app.app_context():
-        schools = db.session.query(School).all()
+
+def _get_app():
+    """Возвращает Flask app скрипта, при первом вызове создает его и подключает системную БД"""
+    global _app
+    if _app is None:
+        _app = Flask(__name__)
+        _app.config.from_object(Config)
+        init_system_db(_app)
+    return _app
+
+
+def _init_prompt_db_for_school_shifts(school_id, school_name):
+    """
+    Строит БД промпта для всех смен одной школы
+    Выполняется в отдельном процессе: у каждой школы своя БД SQLite,
+    а bind 'school' в конфигурации приложения у каждого процесса свой
+    Вывод школ, обрабатываемых параллельно, перемешивается, поэтому в строках смен указана школа
+    """
+    from app.models.school import Shift
     
-        if not schools:
-            print("❌ Нет школ в системе. Сначала создайте школу.")
+    print(f"\n📚 Обработка школы: {school_name} (ID: {school_id})")
+    
+    with _get_app().app_context():
+        switch_school_db(school_id)
+        
+        # Получаем все смены одним запросом (только id и название)
+        shifts = db.session.query(Shift.id, Shift.name).all()
+        
+        if not shifts:
+            print(f"   ⚠️ Нет смен в школе {school_name}")
             return
         
-        for school in schools:
-            print(f"\n📚 Обработка школы: {school.name} (ID: {school.id})")
-            switch_school_db(school.id)
-            
-            # Получаем все смены
-            from app.models.school import Shift
-            shifts = db.session.query(Shift).all()
-            
-            if not shifts:
-                print(f"   ⚠️ Нет смен в школе {school.name}")
-                continue
-            
-            for shift in shifts:
-                print(f"   🔄 Обработка смены: {shift.name} (ID: {shift.id})")
+        for shift_id, shift_name in shifts:
+            print(f"   🔄 Обработка смены: {shift_name} (ID: {shift_id}), школа {school_name}")
+            try:
+                build_prompt_database(shift_id, school_id)
+                print(f"   ✅ БД промпта создана для смены {shift_name}, школа {school_name}")
+            except Exception as e:
+                print(f"   ❌ Ошибка при создании БД промпта для смены {shift_name}, школа {school_name}: {e}")
+                import traceback
+                traceback.print_exc()
+
+
+def init_prompt_db_for_all_schools():
+    """Инициализирует БД промпта для всех школ (школы обрабатываются параллельно в процессах)"""
+    with _get_app().app_context():
+        schools = db.session.query(School.id, School.name).all()
+        db.session.remove()
+    
+    if not schools:
+        print("❌ Нет школ в системе. Сначала создайте школу.")
+        return
+    
+    if len(schools) == 1:
+        _init_prompt_db_for_school_shifts(*schools[0])
+    else:
+        # spawn: процессы не наследуют открытые соединения SQLite родителя
+        max_workers = min(len(schools), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {
+                executor.submit(_init_prompt_db_for_school_shifts, school_id, school_name): school_name
+                for school_id, school_name in schools
+            }
+            for future in as_completed(futures):
                 try:
-                    build_prompt_database(shift.id, school.id)
-                    print(f"   ✅ БД промпта создана для смены {shift.name}")
+                    future.result()
                 except Exception as e:
-                    print(f"   ❌ Ошибка при создании БД промпта для смены {shift.name}: {e}")
-                    import traceback
-                    traceback.print_exc()
-        
-        print("\n✅ Инициализация БД промпта завершена!")
+                    print(f"   ❌ Ошибка при обработке школы {futures[future]}: {e}")
+    
+    print("\n✅ Инициализация БД промпта завершена!")
 
 
 def init_prompt_db_for_school(school_id, shift_id=None):
     """Инициализирует БД промпта для конкретной школы и смены"""
-    with app.app_context():
+    with _get_app().app_context():
         school = db.session.query(School).filter_by(id=school_id).first()
         if not school:
             print(f"❌ Школа с ID {school_id} не найдена")
             return
         
-        print(f"📚 Обработка школы: {school.name} (ID: {school.id})")
         switch_school_db(school.id)
     
         from app.models.school import Shift
         
         if shift_id:
             # Обрабатываем конкретную смену
+            print(f"📚 Обработка школы: {school.name} (ID: {school.id})")
             shift = db.session.query(Shift).filter_by(id=shift_id).first()
             if not shift:
                 print(f"❌ Смена с ID {shift_id} не найдена")
@@ -80,22 +119,9 @@ def init_prompt_db_for_school(school_id, shift_id=None):
                 import traceback
                 traceback.print_exc()
         else:
-            # Обрабатываем все смены
-            shifts = db.session.query(Shift).all()
-            
-            if not shifts:
-                print(f"   ⚠️ Нет смен в школе {school.name}")
-                return
-            
-            for shift in shifts:
-                print(f"   🔄 Обработка смены: {shift.name} (ID: {shift.id})")
-                try:
-                    build_prompt_database(shift.id, school.id)
-                    print(f"   ✅ БД промпта создана для смены {shift.name}")
-                except Exception as e:
-                    print(f"   ❌ Ошибка при создании БД промпта для смены {shift.name}: {e}")
-                    import traceback
-                    traceback.print_exc()
+            # Обрабатываем все смены последовательно: смены одной школы пишут в одну БД SQLite,
+            # а сборка смены быстрее запуска отдельного процесса
+            _init_prompt_db_for_school_shifts(school.id, school.name)
         
         print("\n✅ Инициализация БД промпта завершена!")
 
@@ -4,6 +4,7 @@
 """
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # Добавляем путь к проекту в PYTHONPATH
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -20,31 +21,43 @@ app = app_module.app
 from app.core.db_manager import migrate_school_database, db
 from app.models.system import School
 
+def _migrate_school(school):
+    """Мигрировать БД одной школы, возвращает True при успехе"""
+    school_id, school_name = school
+    print(f"\n{'='*50}")
+    print(f"Миграция школы: {school_name} (ID: {school_id})")
+    print(f"{'='*50}")
+    
+    # migrate_school_database сама перехватывает и печатает ошибки, возвращая статус
+    if migrate_school_database(school_id):
+        print(f"✅ Миграция успешно выполнена для школы {school_name}")
+        return True
+    print(f"❌ Ошибка при миграции школы {school_name} (ID: {school_id})")
+    return False
+
 def migrate_all_schools():
     """Мигрировать все существующие базы данных школ"""
     with app.app_context():
-        # Получаем все школы из главной БД
-        schools = School.query.all()
-        
-        print(f"Найдено школ: {len(schools)}")
-        
-        for school in schools:
-            print(f"\n{'='*50}")
-            print(f"Миграция школы: {school.name} (ID: {school.id})")
-            print(f"{'='*50}")
-            
-            try:
-                # Запускаем миграцию для этой школы
-                migrate_school_database(school.id)
-                print(f"✅ Миграция успешно выполнена для школы {school.name}")
-            except Exception as e:
-                print(f"❌ Ошибка при миграции школы {school.name}: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        print(f"\n{'='*50}")
-        print("Миграция завершена!")
-        print(f"{'='*50}")
+        # Получаем все школы из главной БД (только id и название)
+        schools = db.session.query(School.id, School.name).all()
+        db.session.remove()
+    
+    print(f"Найдено школ: {len(schools)}")
+    
+    # У каждой школы свой файл SQLite, поэтому БД мигрируются параллельно в потоках:
+    # тяжелые шаги (CREATE INDEX, UPDATE) выполняет SQLite без GIL,
+    # а запуск процессов стоил бы дороже миграции одной школы
+    max_workers = min(len(schools), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_migrate_school, schools))
+    
+    failed = results.count(False)
+    if failed:
+        print(f"\n❌ Миграция с ошибками: {failed} из {len(schools)} школ")
+    
+    print(f"\n{'='*50}")
+    print("Миграция завершена!")
+    print(f"{'='*50}")
 
 if __name__ == '__main__':
     migrate_all_schools()
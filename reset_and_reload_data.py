@@ -3,8 +3,20 @@
 """
 import os
 import sys
-from app import app
-from app.core.db_manager import db, school_db_context, clear_school_database
+from collections import defaultdict
+from sqlalchemy import and_, exists, func, insert, inspect, select, table
+
+# Импортируем app напрямую из app.py, обходя пакет app (from app import app находит пакет)
+import importlib.util
+spec = importlib.util.spec_from_file_location("app_main", os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+app_module = importlib.util.module_from_spec(spec)
+sys.modules["app_main"] = app_module
+spec.loader.exec_module(app_module)
+app = app_module.app
+
+from app.core.db_manager import (
+    db, school_db_context, clear_school_database, migrate_school_database, SCHOOL_CLEARED_TABLES
+)
 from app.models.school import (
     Subject, Teacher, ClassGroup, ClassLoad, TeacherAssignment,
     Cabinet, CabinetTeacher, Shift
@@ -14,6 +26,22 @@ from app.services.excel_loader import (
     load_teacher_contacts_excel, load_cabinets_excel
 )
 
+def _school_database_is_empty(engine):
+    """
+    Проверить, что все очищаемые таблицы (SCHOOL_CLEARED_TABLES) уже существуют и не содержат строк.
+    В этом случае DROP/CREATE в clear_school_database не меняет данных
+    """
+    existing_tables = set(inspect(engine).get_table_names())
+    if any(name not in existing_tables for name in SCHOOL_CLEARED_TABLES):
+        return False
+    
+    # Одним запросом: EXISTS по каждой таблице
+    has_rows = db.session.execute(
+        select(*[exists().select_from(table(name)) for name in SCHOOL_CLEARED_TABLES]),
+        bind_arguments={'bind': engine}
+    ).one()
+    return not any(has_rows)
+
 
 def reset_and_reload_school_data(school_id, excel_files_dir=None):
     """
@@ -36,8 +64,15 @@ def reset_and_reload_school_data(school_id, excel_files_dir=None):
             # Шаг 1: Очистка БД
             print("📋 Шаг 1: Очистка базы данных...")
             try:
-                clear_school_database(school_id)
-                print("   ✅ База данных очищена\n")
+                engine = db.session.get_bind(mapper=Subject.__mapper__)
+                if _school_database_is_empty(engine):
+                    # Таблицы не пересоздаются, поэтому схему (колонки, индексы)
+                    # доводим до текущей миграциями, как при открытии БД школы
+                    migrate_school_database(school_id, engine)
+                    print("   ✅ База данных уже пуста, очистка не требуется\n")
+                else:
+                    clear_school_database(school_id)
+                    print("   ✅ База данных очищена\n")
             except Exception as e:
                 print(f"   ⚠️ Предупреждение при очистке: {e}\n")
             
@@ -53,15 +88,17 @@ def reset_and_reload_school_data(school_id, excel_files_dir=None):
             else:
                 print(f"   ⚠️ Файл не найден: {class_load_file}\n")
             
+            # Первая смена для загрузки (шаги 3 и 4 ее не меняют, поэтому запрашиваем один раз).
+            # Храним id, а не объект: commit в загрузчиках делает объект expired и вызвал бы повторный SELECT
+            shift_id = db.session.query(Shift.id).limit(1).scalar()
+            
             # Шаг 3: Загрузка учителей и их назначений (Учителя_Предмет.xlsx)
             print("📋 Шаг 3: Загрузка учителей и назначений...")
             teacher_assign_file = os.path.join(excel_files_dir, "Учителя_Предмет.xlsx")
             if os.path.exists(teacher_assign_file):
                 try:
-                    # Получаем первую смену для загрузки
-                    shift = db.session.query(Shift).first()
-                    if shift:
-                        load_teacher_assignments_excel(teacher_assign_file, shift_id=shift.id)
+                    if shift_id:
+                        load_teacher_assignments_excel(teacher_assign_file, shift_id=shift_id)
                         print("   ✅ Учителя и назначения загружены\n")
                     else:
                         print("   ⚠️ Нет смен в БД, создайте смену сначала\n")
@@ -75,8 +112,7 @@ def reset_and_reload_school_data(school_id, excel_files_dir=None):
             teacher_contacts_file = os.path.join(excel_files_dir, "Учителя_Контакты.xlsx")
             if os.path.exists(teacher_contacts_file):
                 try:
-                    shift = db.session.query(Shift).first()
-                    updated, created = load_teacher_contacts_excel(teacher_contacts_file, shift_id=shift.id if shift else None)
+                    updated, created = load_teacher_contacts_excel(teacher_contacts_file, shift_id=shift_id)
                     print(f"   ✅ Обновлено: {updated}, Создано: {created}\n")
                 except Exception as e:
                     print(f"   ❌ Ошибка при загрузке: {e}\n")
@@ -86,41 +122,43 @@ def reset_and_reload_school_data(school_id, excel_files_dir=None):
             # Шаг 5: Привязка кабинетов к предметам на основе TeacherAssignment
             print("📋 Шаг 5: Привязка кабинетов к предметам...")
             try:
-                # Получаем все назначения учителей с кабинетами
-                assignments = db.session.query(TeacherAssignment).filter(
+                # Получаем все назначения учителей с кабинетами (только нужные столбцы)
+                assignments = db.session.query(
+                    TeacherAssignment.subject_id, TeacherAssignment.default_cabinet
+                ).filter(
                     TeacherAssignment.default_cabinet.isnot(None),
                     TeacherAssignment.default_cabinet != ''
                 ).all()
                 
                 # Словарь для группировки: предмет -> множество кабинетов
-                subject_cabinets = {}
+                subject_cabinets = defaultdict(set)
                 
-                for assignment in assignments:
-                    subject_id = assignment.subject_id
-                    cabinet_name = assignment.default_cabinet.strip()
-                    
-                    if subject_id not in subject_cabinets:
-                        subject_cabinets[subject_id] = set()
-                    subject_cabinets[subject_id].add(cabinet_name)
+                for subject_id, default_cabinet in assignments:
+                    subject_cabinets[subject_id].add(default_cabinet.strip())
                 
-                # Создаем кабинеты и привязываем их к предметам
-                created_cabinets = 0
-                for subject_id, cabinet_names in subject_cabinets.items():
-                    subject = db.session.query(Subject).filter_by(id=subject_id).first()
-                    if not subject:
-                        continue
-                    
-                    for cabinet_name in cabinet_names:
-                        # Проверяем, существует ли уже такой кабинет для этого предмета
-                        existing = db.session.query(Cabinet).filter_by(
-                            name=cabinet_name,
-                            subject_id=subject_id
-                        ).first()
-                        
-                        if not existing:
-                            cabinet = Cabinet(name=cabinet_name, subject_id=subject_id)
-                            db.session.add(cabinet)
-                            created_cabinets += 1
+                # Существующие предметы и кабинеты загружаются один раз, дальше поиск идет по множествам
+                existing_subject_ids = {
+                    subject_id for subject_id, in db.session.query(Subject.id).filter(
+                        Subject.id.in_(list(subject_cabinets))
+                    )
+                }
+                existing_cabinets = set(
+                    db.session.query(Cabinet.name, Cabinet.subject_id).filter(
+                        Cabinet.subject_id.in_(list(existing_subject_ids))
+                    ).all()
+                )
+                
+                # Создаем недостающие кабинеты одним executemany вместо add() на каждую строку
+                cabinet_rows = [
+                    {'name': cabinet_name, 'subject_id': subject_id}
+                    for subject_id, cabinet_names in subject_cabinets.items()
+                    if subject_id in existing_subject_ids
+                    for cabinet_name in cabinet_names
+                    if (cabinet_name, subject_id) not in existing_cabinets
+                ]
+                if cabinet_rows:
+                    db.session.execute(insert(Cabinet), cabinet_rows)
+                created_cabinets = len(cabinet_rows)
                 
                 db.session.commit()
                 print(f"   ✅ Создано кабинетов: {created_cabinets}\n")
@@ -144,35 +182,34 @@ def reset_and_reload_school_data(school_id, excel_files_dir=None):
                         subject_id=None
                     ).all()
                     
+                    # Назначения учителей кабинета с этим кабинетом по умолчанию, сгруппированные
+                    # по (кабинет, предмет), - одним запросом вместо двух запросов на кабинет
+                    subject_counts_by_cabinet = {}
+                    for cabinet_id, subject_id, count, first_assignment_id in db.session.query(
+                        Cabinet.id, TeacherAssignment.subject_id,
+                        func.count(TeacherAssignment.id), func.min(TeacherAssignment.id)
+                    ).join(
+                        CabinetTeacher, CabinetTeacher.cabinet_id == Cabinet.id
+                    ).join(
+                        TeacherAssignment, and_(
+                            TeacherAssignment.teacher_id == CabinetTeacher.teacher_id,
+                            TeacherAssignment.default_cabinet == Cabinet.name
+                        )
+                    ).filter(
+                        Cabinet.subject_id.is_(None)
+                    ).group_by(Cabinet.id, TeacherAssignment.subject_id):
+                        subject_counts_by_cabinet.setdefault(cabinet_id, []).append(
+                            (count, -first_assignment_id, subject_id)
+                        )
+                    
                     linked_count = 0
                     for cabinet in cabinets_without_subject:
-                        # Получаем учителей этого кабинета
-                        cabinet_teachers = db.session.query(CabinetTeacher).filter_by(
-                            cabinet_id=cabinet.id
-                        ).all()
-                        
-                        if not cabinet_teachers:
-                            continue
-                        
-                        # Находим предметы этих учителей
-                        teacher_ids = [ct.teacher_id for ct in cabinet_teachers]
-                        assignments = db.session.query(TeacherAssignment).filter(
-                            TeacherAssignment.teacher_id.in_(teacher_ids),
-                            TeacherAssignment.default_cabinet == cabinet.name
-                        ).all()
-                        
-                        # Группируем по предметам
-                        subject_counts = {}
-                        for assignment in assignments:
-                            subject_id = assignment.subject_id
-                            if subject_id not in subject_counts:
-                                subject_counts[subject_id] = 0
-                            subject_counts[subject_id] += 1
+                        subject_counts = subject_counts_by_cabinet.get(cabinet.id)
                         
                         # Привязываем к предмету с наибольшим количеством назначений
+                        # (при равенстве - к предмету, назначение по которому встретилось раньше)
                         if subject_counts:
-                            most_common_subject_id = max(subject_counts, key=subject_counts.get)
-                            cabinet.subject_id = most_common_subject_id
+                            cabinet.subject_id = max(subject_counts)[2]
                             linked_count += 1
                     
                     db.session.commit()
@@ -185,16 +222,18 @@ def reset_and_reload_school_data(school_id, excel_files_dir=None):
             
             # Шаг 7: Финальная проверка и статистика
             print("📋 Шаг 7: Статистика...")
-            subjects_count = db.session.query(Subject).count()
-            teachers_count = db.session.query(Teacher).count()
-            classes_count = db.session.query(ClassGroup).count()
-            cabinets_count = db.session.query(Cabinet).count()
-            cabinets_with_subject = db.session.query(Cabinet).filter(
-                Cabinet.subject_id.isnot(None)
-            ).count()
-            cabinets_without_subject = db.session.query(Cabinet).filter_by(
-                subject_id=None
-            ).count()
+            # Все счетчики одним запросом: count(subject_id) не учитывает NULL
+            (
+                subjects_count, teachers_count, classes_count,
+                cabinets_count, cabinets_with_subject
+            ) = db.session.query(
+                db.session.query(func.count(Subject.id)).scalar_subquery(),
+                db.session.query(func.count(Teacher.id)).scalar_subquery(),
+                db.session.query(func.count(ClassGroup.id)).scalar_subquery(),
+                func.count(Cabinet.id),
+                func.count(Cabinet.subject_id)
+            ).one()
+            cabinets_without_subject = cabinets_count - cabinets_with_subject
             
             print(f"   📊 Предметов: {subjects_count}")
             print(f"   📊 Учителей: {teachers_count}")
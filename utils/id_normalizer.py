@@ -20,12 +20,9 @@ def create_class_id_mapping(assigned_class_ids: Set[int]) -> Tuple[Dict[int, int
     """
     sorted_class_ids = sorted(assigned_class_ids)
     
-    normalized_to_real = {}
-    real_to_normalized = {}
-    
-    for normalized_id, real_id in enumerate(sorted_class_ids, start=1):
-        normalized_to_real[normalized_id] = real_id
-        real_to_normalized[real_id] = normalized_id
+    # Оба словаря строятся конструкторами dict без поэлементного цикла на Python
+    normalized_to_real = dict(enumerate(sorted_class_ids, start=1))
+    real_to_normalized = dict(zip(sorted_class_ids, range(1, len(sorted_class_ids) + 1)))
     
     return normalized_to_real, real_to_normalized
 
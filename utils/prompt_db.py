@@ -4,12 +4,52 @@
 Создает и обновляет структуру: Класс -> Предмет -> Учителя
 Определяет подгруппы: если в классе по предмету 2+ учителя, то has_subgroups = True
 """
-from app.core.db_manager import db
+import sys
+import weakref
+from collections import defaultdict
+from sqlalchemy import insert, update
+from sqlalchemy.orm import selectinload
+from app.core.db_manager import db, get_school_db_uri, switch_school_db
 from app.models.school import (
     ClassLoad, TeacherAssignment, PromptClassSubject, PromptClassSubjectTeacher,
     ClassGroup, Subject, Teacher, Shift
 )
 
+# engine БД школы -> имена таблиц, уже проверенных/созданных в этом процессе
+# (engine пересоздается при удалении БД школы, поэтому запись пропадает вместе с ним)
+_created_tables = weakref.WeakKeyDictionary()
+
+
+def _ensure_tables(engine, *tables):
+    """
+    Создает таблицы (checkfirst=True), если их нет
+    Для каждого engine проверка выполняется один раз, дальше - без запросов к sqlite_master
+    """
+    created = _created_tables.setdefault(engine, set())
+    for table in tables:
+        if table.name not in created:
+            table.create(engine, checkfirst=True)
+            created.add(table.name)
+
+
+def _bind_school_db(school_id):
+    """
+    Направляет bind 'school' на БД школы school_id (если не указан - на g.school_id, когда bind не задан)
+    Если bind уже указывает на эту БД, конфигурация и кэш engines не трогаются
+    """
+    from flask import current_app, g, has_app_context
+    if not has_app_context():
+        return
+    
+    binds = current_app.config.get('SQLALCHEMY_BINDS', {})
+    if not school_id:
+        if 'school' in binds or getattr(g, 'school_id', None) is None:
+            return
+        school_id = g.school_id
+    
+    if binds.get('school') != get_school_db_uri(school_id):
+        switch_school_db(school_id)
+
 
 def build_prompt_database(shift_id, school_id=None):
     """
@@ -32,44 +72,20 @@ def build_prompt_database(shift_id, school_id=None):
         school_id: ID школы (опционально, для контекста БД)
     """
     # ВАЖНО: Эта функция должна вызываться внутри school_db_context!
-    # Если school_id указан, убеждаемся что контекст установлен
-    from flask import has_app_context, g, has_request_context
-    if school_id and has_app_context():
-        # Устанавливаем school_id в контекст Flask, если его там нет
-        if has_request_context():
-            if not hasattr(g, 'school_id') or g.school_id != school_id:
-                from app.core.db_manager import switch_school_db
-                switch_school_db(school_id)
-                # Убеждаемся что school_id установлен в контексте
-                g.school_id = school_id
-        else:
-            # Нет request context, но есть app context - устанавливаем bind напрямую
-            from flask import current_app
-            from app.core.db_manager import get_school_db_uri
-            if 'SQLALCHEMY_BINDS' not in current_app.config:
-                current_app.config['SQLALCHEMY_BINDS'] = {}
-            current_app.config['SQLALCHEMY_BINDS']['school'] = get_school_db_uri(school_id)
-    
-    # Создаем таблицы, если их нет (checkfirst=True создаст только если не существуют)
+    # Если school_id указан, убеждаемся что bind 'school' указывает на БД этой школы
+    _bind_school_db(school_id)
+    from flask import current_app, has_request_context, g
+    if school_id and has_request_context():
+        # Убеждаемся что school_id установлен в контексте
+        g.school_id = school_id
+    
+    # engine БД школы получаем один раз на вызов - дальше работа идет только через db.session
+    engine = None
     try:
-        from flask import current_app
-        # Убеждаемся что bind 'school' установлен в конфигурации
-        if 'SQLALCHEMY_BINDS' not in current_app.config:
-            current_app.config['SQLALCHEMY_BINDS'] = {}
-        if 'school' not in current_app.config['SQLALCHEMY_BINDS']:
-            # Если bind не установлен, но есть school_id, устанавливаем его
-            if school_id:
-                from app.core.db_manager import get_school_db_uri
-                current_app.config['SQLALCHEMY_BINDS']['school'] = get_school_db_uri(school_id)
-            elif has_app_context() and hasattr(g, 'school_id'):
-                from app.core.db_manager import get_school_db_uri
-                current_app.config['SQLALCHEMY_BINDS']['school'] = get_school_db_uri(g.school_id)
-        
         engine = db.get_engine(current_app, bind='school')
         
-        # Создаем таблицы с checkfirst=True (создаст только если не существуют)
-        PromptClassSubject.__table__.create(engine, checkfirst=True)
-        PromptClassSubjectTeacher.__table__.create(engine, checkfirst=True)
+        # Создаем таблицы с checkfirst=True (создаст только если не существуют, один раз на engine)
+        _ensure_tables(engine, PromptClassSubject.__table__, PromptClassSubjectTeacher.__table__)
         print(f"✅ Таблицы БД промпта проверены/созданы")
     except Exception as e:
         print(f"⚠️ Ошибка при создании таблиц: {e}")
@@ -85,28 +101,16 @@ def build_prompt_database(shift_id, school_id=None):
     
     # Создаем таблицу, если её нет
     try:
-        from flask import current_app, g
-        # Убеждаемся что bind 'school' установлен
-        if 'SQLALCHEMY_BINDS' not in current_app.config:
-            current_app.config['SQLALCHEMY_BINDS'] = {}
-        if 'school' not in current_app.config['SQLALCHEMY_BINDS']:
-            if school_id:
-                from app.core.db_manager import get_school_db_uri
-                current_app.config['SQLALCHEMY_BINDS']['school'] = get_school_db_uri(school_id)
-            elif has_app_context() and hasattr(g, 'school_id'):
-                from app.core.db_manager import get_school_db_uri
-                current_app.config['SQLALCHEMY_BINDS']['school'] = get_school_db_uri(g.school_id)
-        
-        engine = db.get_engine(current_app, bind='school')
-        ShiftClass.__table__.create(engine, checkfirst=True)
+        if engine is not None:
+            _ensure_tables(engine, ShiftClass.__table__)
     except Exception as e:
         print(f"⚠️ Ошибка при создании таблицы shift_classes: {e}")
         # Продолжаем работу, используя обратную совместимость
     
     try:
-        assigned_class_ids = set(
-            sc.class_id for sc in db.session.query(ShiftClass).filter_by(shift_id=shift_id).all()
-        )
+        assigned_class_ids = {
+            class_id for class_id, in db.session.query(ShiftClass.class_id).filter_by(shift_id=shift_id).distinct()
+        }
         if assigned_class_ids:
             print(f"✅ Найдено {len(assigned_class_ids)} классов, назначенных смене {shift_id}")
         else:
@@ -127,9 +131,9 @@ def build_prompt_database(shift_id, school_id=None):
     # Если нет явно назначенных классов, используем все классы из ClassLoad (обратная совместимость)
     if not assigned_class_ids:
         print(f"ℹ️ Для смены {shift_id} нет явно назначенных классов, используем все классы из ClassLoad")
-        assigned_class_ids = set(
-            cl.class_id for cl in db.session.query(ClassLoad).filter_by(shift_id=shift_id).distinct(ClassLoad.class_id).all()
-        )
+        assigned_class_ids = {
+            class_id for class_id, in db.session.query(ClassLoad.class_id).filter_by(shift_id=shift_id).distinct()
+        }
     
     if not assigned_class_ids:
         print(f"⚠️ Для смены {shift_id} не найдено классов")
@@ -144,93 +148,133 @@ def build_prompt_database(shift_id, school_id=None):
             ClassLoad.class_id.in_(assigned_class_ids)
         ).all()
     
+    # Назначения учителей, существующие записи промпта и их учителя загружаются тремя запросами
+    # на всю смену и раскладываются по (class_id, subject_id) вместо запросов на каждый ClassLoad
+    # Используем no_autoflush, чтобы избежать блокировок при запросах во время накопления изменений
+    with db.session.no_autoflush:
+        teacher_assignments_by_class_subject = defaultdict(list)
+        for assignment in db.session.query(
+            TeacherAssignment.class_id, TeacherAssignment.subject_id, TeacherAssignment.teacher_id,
+            TeacherAssignment.hours_per_week, TeacherAssignment.default_cabinet
+        ).filter_by(shift_id=shift_id).filter(
+            TeacherAssignment.class_id.in_(assigned_class_ids)
+        ).order_by(TeacherAssignment.teacher_id, TeacherAssignment.id):
+            teacher_assignments_by_class_subject[(assignment.class_id, assignment.subject_id)].append(assignment)
+        
+        existing_class_subjects = {
+            (row.class_id, row.subject_id): row for row in db.session.query(
+                PromptClassSubject.class_id, PromptClassSubject.subject_id, PromptClassSubject.id,
+                PromptClassSubject.total_hours_per_week, PromptClassSubject.has_subgroups
+            ).filter_by(shift_id=shift_id)
+        }
+        
+        # prompt_class_subject_id -> {teacher_id: словарь значений}
+        existing_teachers_by_class_subject = defaultdict(dict)
+        for row in db.session.query(
+            PromptClassSubjectTeacher.prompt_class_subject_id, PromptClassSubjectTeacher.teacher_id,
+            PromptClassSubjectTeacher.id, PromptClassSubjectTeacher.hours_per_week,
+            PromptClassSubjectTeacher.default_cabinet
+        ).join(
+            PromptClassSubject, PromptClassSubject.id == PromptClassSubjectTeacher.prompt_class_subject_id
+        ).filter(PromptClassSubject.shift_id == shift_id).order_by(PromptClassSubjectTeacher.id):
+            existing_teachers_by_class_subject[row.prompt_class_subject_id][row.teacher_id] = row._asdict()
+    
+    # Изменения накапливаются в списках и записываются пакетными INSERT/UPDATE после цикла
+    # (по одному executemany на таблицу вместо INSERT/UPDATE на каждую строку при flush)
+    class_subject_updates = []
+    teacher_updates = []
+    new_class_subjects = {}  # (class_id, subject_id) -> строка новой PromptClassSubject
+    new_class_subject_teachers = {}  # (class_id, subject_id) -> {teacher_id: строка нового учителя}
+    # Новые учителя в порядке добавления: (ключ новой PromptClassSubject или None, строка)
+    teacher_inserts = []
+    
     for class_load in class_loads:
-        # Используем no_autoflush для всех запросов во время накопления изменений
-        with db.session.no_autoflush:
-            # Получаем все TeacherAssignment для этого класса и предмета
-            teacher_assignments = db.session.query(TeacherAssignment).filter_by(
-                shift_id=shift_id,
-                class_id=class_load.class_id,
-                subject_id=class_load.subject_id
-            ).all()
-            
-            if not teacher_assignments:
-                # Если нет учителей, пропускаем
-                continue
-            
-            # Определяем, есть ли подгруппы (2+ учителя)
-            has_subgroups = len(teacher_assignments) >= 2
-            
-            # Проверяем, существует ли уже запись для этой комбинации
-            prompt_class_subject = db.session.query(PromptClassSubject).filter_by(
-                shift_id=shift_id,
-                class_id=class_load.class_id,
-                subject_id=class_load.subject_id
-            ).first()
+        class_subject_key = (class_load.class_id, class_load.subject_id)
         
-        if prompt_class_subject:
-            # Обновляем существующую запись
-            prompt_class_subject.total_hours_per_week = class_load.hours_per_week
-            prompt_class_subject.has_subgroups = has_subgroups
-            # Получаем существующих учителей для этой записи
-            # Используем no_autoflush, чтобы избежать блокировок
-            with db.session.no_autoflush:
-                existing_teachers = db.session.query(PromptClassSubjectTeacher).filter_by(
-                    prompt_class_subject_id=prompt_class_subject.id
-                ).all()
-        else:
-            # Создаем новую запись
-            prompt_class_subject = PromptClassSubject(
-                shift_id=shift_id,
-                class_id=class_load.class_id,
-                subject_id=class_load.subject_id,
-                total_hours_per_week=class_load.hours_per_week,
-                has_subgroups=has_subgroups
-            )
-            db.session.add(prompt_class_subject)
-            # Для новой записи учителей еще нет
-            existing_teachers = []
+        # Все TeacherAssignment для этого класса и предмета
+        teacher_assignments = teacher_assignments_by_class_subject.get(class_subject_key)
+        
+        if not teacher_assignments:
+            # Если нет учителей, пропускаем
+            continue
         
-        # Создаем словарь существующих учителей для быстрого поиска
-        existing_teachers_dict = {t.teacher_id: t for t in existing_teachers}
+        # Определяем, есть ли подгруппы (2+ учителя)
+        has_subgroups = len(teacher_assignments) >= 2
+        
+        # Проверяем, существует ли уже запись для этой комбинации
+        existing_class_subject = existing_class_subjects.get(class_subject_key)
+        
+        prompt_class_subject_id = existing_class_subject.id if existing_class_subject else None
+        
+        if existing_class_subject:
+            # Обновляем существующую запись (UPDATE только если значения изменились)
+            class_subject_values = {
+                'total_hours_per_week': class_load.hours_per_week,
+                'has_subgroups': has_subgroups
+            }
+            if _row_changed(existing_class_subject._asdict(), class_subject_values):
+                class_subject_updates.append({'id': prompt_class_subject_id, **class_subject_values})
+            # Существующие учителя этой записи: teacher_id -> словарь значений
+            existing_teachers_dict = existing_teachers_by_class_subject[prompt_class_subject_id]
+            new_class_subject_key = None
+            new_teachers = {}
+        else:
+            # Создаем новую запись (повторная пара класс-предмет обновляет уже накопленную строку)
+            new_class_subject_key = class_subject_key
+            new_class_subjects.setdefault(new_class_subject_key, {}).update({
+                'shift_id': shift_id,
+                'class_id': class_load.class_id,
+                'subject_id': class_load.subject_id,
+                'total_hours_per_week': class_load.hours_per_week,
+                'has_subgroups': has_subgroups
+            })
+            # Для новой записи учителей в БД еще нет
+            existing_teachers_dict = {}
+            new_teachers = new_class_subject_teachers.setdefault(new_class_subject_key, {})
         
         # Добавляем или обновляем учителей
         for assignment in teacher_assignments:
+            teacher_values = {
+                'hours_per_week': assignment.hours_per_week or 0,
+                'default_cabinet': assignment.default_cabinet or ''
+            }
             existing_teacher = existing_teachers_dict.get(assignment.teacher_id)
             
             if existing_teacher:
                 # Обновляем существующую запись
-                existing_teacher.hours_per_week = assignment.hours_per_week or 0
-                existing_teacher.default_cabinet = assignment.default_cabinet or ''
                 # is_assigned_to_class остается без изменений
+                if _row_changed(existing_teacher, teacher_values):
+                    teacher_updates.append({'id': existing_teacher['id'], **teacher_values})
+                    existing_teacher.update(teacher_values)
+            elif assignment.teacher_id in new_teachers:
+                # Учитель уже добавлен в этой транзакции - обновляем накопленную строку
+                new_teachers[assignment.teacher_id].update(teacher_values)
             else:
                 # Создаем новую запись только если её еще нет
                 is_assigned_to_class = False
                 # TODO: Добавить логику определения is_assigned_to_class если нужно
                 
-                # Используем relationship для установки связи
-                # SQLAlchemy автоматически установит правильный ID при commit
-                prompt_teacher = PromptClassSubjectTeacher(
-                    teacher_id=assignment.teacher_id,
-                    hours_per_week=assignment.hours_per_week or 0,
-                    default_cabinet=assignment.default_cabinet or '',
-                    is_assigned_to_class=is_assigned_to_class
-                )
-                # Используем relationship для установки связи с классом-предметом
-                # Это работает даже если prompt_class_subject.id еще None
-                prompt_class_subject.teachers.append(prompt_teacher)
-                # Добавляем в словарь, чтобы избежать дубликатов в этой транзакции
-                existing_teachers_dict[assignment.teacher_id] = prompt_teacher
+                # Для новой PromptClassSubject id проставляется после ее INSERT
+                teacher_row = {
+                    'prompt_class_subject_id': prompt_class_subject_id,
+                    'teacher_id': assignment.teacher_id,
+                    'is_assigned_to_class': is_assigned_to_class,
+                    **teacher_values
+                }
+                new_teachers[assignment.teacher_id] = teacher_row
+                teacher_inserts.append((new_class_subject_key, teacher_row))
         
         # Не удаляем старых учителей, чтобы избежать блокировок БД
         # Лишние записи не будут использоваться, но это не критично
     
-    # Сохраняем все изменения одним commit с обработкой блокировок
+    # Записываем все изменения и сохраняем одним commit с обработкой блокировок
+    # (при повторе после rollback пакетная запись выполняется заново)
     max_retries = 3
     retry_delay = 0.1  # 100ms
     
     for attempt in range(max_retries):
         try:
+            _write_prompt_rows(class_subject_updates, teacher_updates, new_class_subjects, teacher_inserts)
             db.session.commit()
             print(f"✅ БД для промпта построена для смены {shift_id}")
             if school_id:
@@ -254,6 +298,53 @@ def build_prompt_database(shift_id, school_id=None):
                 raise  # Пробрасываем ошибку дальше
 
 
+def _row_changed(row, values):
+    """Отличается ли хотя бы одно значение values от текущего значения в row (словарь столбцов)"""
+    return any(row[column] != value for column, value in values.items())
+
+
+def _write_prompt_rows(class_subject_updates, teacher_updates, new_class_subjects, teacher_inserts):
+    """
+    Записывает накопленные build_prompt_database изменения пакетными операторами
+    
+    Args:
+        class_subject_updates: список словарей {'id', 'total_hours_per_week', 'has_subgroups'}
+        teacher_updates: список словарей {'id', 'hours_per_week', 'default_cabinet'}
+        new_class_subjects: словарь {(class_id, subject_id): строка новой PromptClassSubject}
+        teacher_inserts: список (ключ новой PromptClassSubject или None, строка нового учителя)
+    """
+    # UPDATE по первичному ключу одним executemany
+    if class_subject_updates:
+        db.session.execute(update(PromptClassSubject), class_subject_updates)
+    if teacher_updates:
+        db.session.execute(update(PromptClassSubjectTeacher), teacher_updates)
+    
+    # id новых PromptClassSubject возвращаются тем же запросом (RETURNING, SQLite 3.35+)
+    class_subject_ids = {}
+    if new_class_subjects:
+        rows = list(new_class_subjects.values())
+        if db.session.get_bind(mapper=PromptClassSubject.__mapper__).dialect.insert_executemany_returning:
+            inserted = db.session.execute(
+                insert(PromptClassSubject).returning(
+                    PromptClassSubject.class_id, PromptClassSubject.subject_id, PromptClassSubject.id
+                ),
+                rows
+            ).tuples().all()
+        else:
+            db.session.execute(insert(PromptClassSubject), rows)
+            shift_id = rows[0]['shift_id']
+            inserted = db.session.query(
+                PromptClassSubject.class_id, PromptClassSubject.subject_id, PromptClassSubject.id
+            ).filter_by(shift_id=shift_id).all()
+        class_subject_ids = {(class_id, subject_id): record_id for class_id, subject_id, record_id in inserted}
+    
+    if teacher_inserts:
+        for class_subject_key, teacher_row in teacher_inserts:
+            if class_subject_key is not None:
+                teacher_row['prompt_class_subject_id'] = class_subject_ids[class_subject_key]
+        db.session.execute(insert(PromptClassSubjectTeacher), [teacher_row for _, teacher_row in teacher_inserts])
+
+
 def get_prompt_structure(shift_id, school_id=None, use_ids_only=False, normalize_class_ids=True):
     """
     Получает структуру данных для промпта в формате, используемом в api.py
@@ -294,39 +385,27 @@ def get_prompt_structure(shift_id, school_id=None, use_ids_only=False, normalize
     """
     # Переключаемся на БД школы, если указана
     # Если school_id=None, предполагаем, что мы уже в правильном контексте (school_db_context)
-    if school_id:
-        from flask import has_app_context
-        if has_app_context():
-            from app.core.db_manager import switch_school_db
-            switch_school_db(school_id)
+    _bind_school_db(school_id)
     
-    # Создаем таблицы, если их нет (на случай, если они еще не созданы)
-    try:
-        from flask import current_app
-        engine = db.get_engine(current_app, bind='school')
-        PromptClassSubject.__table__.create(engine, checkfirst=True)
-        PromptClassSubjectTeacher.__table__.create(engine, checkfirst=True)
-    except Exception as e:
-        print(f"⚠️ Ошибка при проверке таблиц в get_prompt_structure: {e}")
-        import traceback
-        traceback.print_exc()
+    # Таблицы промпта создает build_prompt_database - на пути чтения DDL не выполняется;
+    # если БД промпта еще не строилась, запрос PromptClassSubject ниже вернет пустой результат
     
     # Получаем классы, назначенные этой смене, для нормализации ID
     from app.models.school import ShiftClass
     assigned_class_ids = set()
     try:
-        assigned_class_ids = set(
-            sc.class_id for sc in db.session.query(ShiftClass).filter_by(shift_id=shift_id).all()
-        )
+        assigned_class_ids = {
+            class_id for class_id, in db.session.query(ShiftClass.class_id).filter_by(shift_id=shift_id).distinct()
+        }
     except Exception:
         pass
     
     # Если нет явно назначенных классов, используем все из PromptClassSubject
     if not assigned_class_ids:
         try:
-            assigned_class_ids = set(
-                pcs.class_id for pcs in db.session.query(PromptClassSubject).filter_by(shift_id=shift_id).distinct(PromptClassSubject.class_id).all()
-            )
+            assigned_class_ids = {
+                class_id for class_id, in db.session.query(PromptClassSubject.class_id).filter_by(shift_id=shift_id).distinct()
+            }
         except Exception:
             pass
     
@@ -341,9 +420,11 @@ def get_prompt_structure(shift_id, school_id=None, use_ids_only=False, normalize
         }
         print(f"📊 Нормализация class_id: {len(assigned_class_ids)} классов, первый класс = 1")
     
-    # Получаем все PromptClassSubject для этой смены
+    # Получаем все PromptClassSubject для этой смены (учителя загружаются одним дополнительным запросом)
     try:
-        prompt_class_subjects = db.session.query(PromptClassSubject).filter_by(
+        prompt_class_subjects = db.session.query(PromptClassSubject).options(
+            selectinload(PromptClassSubject.teachers)
+        ).filter_by(
             shift_id=shift_id
         ).all()
     except Exception as e:
@@ -352,20 +433,37 @@ def get_prompt_structure(shift_id, school_id=None, use_ids_only=False, normalize
         traceback.print_exc()
         return ([], class_id_mapping) if normalize_class_ids else []
     
+    # Названия классов, предметов и учителей загружаются одним запросом на таблицу, а не на каждую запись
+    class_names = dict(
+        db.session.query(ClassGroup.id, ClassGroup.name).filter(
+            ClassGroup.id.in_({pcs.class_id for pcs in prompt_class_subjects})
+        ).all()
+    )
+    subject_names = dict(
+        db.session.query(Subject.id, Subject.name).filter(
+            Subject.id.in_({pcs.subject_id for pcs in prompt_class_subjects})
+        ).all()
+    )
+    teacher_names = {}
+    if not use_ids_only:
+        teacher_names = dict(
+            db.session.query(Teacher.id, Teacher.full_name).filter(
+                Teacher.id.in_({t.teacher_id for pcs in prompt_class_subjects for t in pcs.teachers})
+            ).all()
+        )
+    
+    # Маппинг пуст, если нормализация не нужна, - тогда class_id остается реальным
+    real_to_normalized = class_id_mapping['real_to_normalized']
+    
     result = []
     
     for pcs in prompt_class_subjects:
         # Получаем класс и предмет
-        class_group = db.session.query(ClassGroup).filter_by(id=pcs.class_id).first()
-        subject = db.session.query(Subject).filter_by(id=pcs.subject_id).first()
-        
-        if not class_group or not subject:
+        if pcs.class_id not in class_names or pcs.subject_id not in subject_names:
             continue
         
         # Нормализуем class_id, если нужно
-        normalized_class_id = pcs.class_id
-        if normalize_class_ids and class_id_mapping.get('real_to_normalized'):
-            normalized_class_id = class_id_mapping['real_to_normalized'].get(pcs.class_id, pcs.class_id)
+        normalized_class_id = real_to_normalized.get(pcs.class_id, pcs.class_id)
         
         # Получаем учителей
         teachers = []
@@ -373,25 +471,23 @@ def get_prompt_structure(shift_id, school_id=None, use_ids_only=False, normalize
             teacher_data = {
                 'teacher_id': pcs_teacher.teacher_id,
                 'hours_per_week': pcs_teacher.hours_per_week,
-                'default_cabinet': pcs_teacher.default_cabinet or '',
+                'default_cabinet': sys.intern(pcs_teacher.default_cabinet or ''),  # коды кабинетов повторяются - одна строка на код
                 'is_assigned_to_class': pcs_teacher.is_assigned_to_class
             }
-            if not use_ids_only:
-                teacher = db.session.query(Teacher).filter_by(id=pcs_teacher.teacher_id).first()
-                if teacher:
-                    teacher_data['teacher_name'] = teacher.full_name
+            if not use_ids_only and pcs_teacher.teacher_id in teacher_names:
+                teacher_data['teacher_name'] = teacher_names[pcs_teacher.teacher_id]
             teachers.append(teacher_data)
         
         item = {
             'class_id': normalized_class_id,  # Используем нормализованный ID
-            'subject_id': subject.id,
+            'subject_id': pcs.subject_id,
             'total_hours_per_week': pcs.total_hours_per_week,
             'has_subgroups': pcs.has_subgroups,
             'teachers': teachers
         }
         if not use_ids_only:
-            item['class_name'] = class_group.name
-            item['subject_name'] = subject.name
+            item['class_name'] = class_names[pcs.class_id]
+            item['subject_name'] = subject_names[pcs.subject_id]
         
         result.append(item)
     
@@ -416,9 +512,7 @@ def get_class_subject_info(class_id, subject_id, shift_id, school_id=None):
         dict: Информация о классе и предмете с учителями
     """
     # Переключаемся на БД школы, если указана
-    if school_id:
-        from app.core.db_manager import switch_school_db
-        switch_school_db(school_id)
+    _bind_school_db(school_id)
     
     pcs = db.session.query(PromptClassSubject).filter_by(
         shift_id=shift_id,
@@ -429,26 +523,33 @@ def get_class_subject_info(class_id, subject_id, shift_id, school_id=None):
     if not pcs:
         return None
     
-    class_group = db.session.query(ClassGroup).filter_by(id=class_id).first()
-    subject = db.session.query(Subject).filter_by(id=subject_id).first()
+    # Нужны только названия - читаем колонки, без построения ORM-объектов
+    class_name = db.session.query(ClassGroup.name).filter_by(id=class_id).scalar()
+    subject_name = db.session.query(Subject.name).filter_by(id=subject_id).scalar()
+    
+    pcs_teachers = pcs.teachers
+    teacher_names = dict(
+        db.session.query(Teacher.id, Teacher.full_name).filter(
+            Teacher.id.in_({pcs_teacher.teacher_id for pcs_teacher in pcs_teachers})
+        ).all()
+    )
     
     teachers = []
-    for pcs_teacher in pcs.teachers:
-        teacher = db.session.query(Teacher).filter_by(id=pcs_teacher.teacher_id).first()
-        if teacher:
+    for pcs_teacher in pcs_teachers:
+        if pcs_teacher.teacher_id in teacher_names:
             teachers.append({
-                'teacher_id': teacher.id,
-                'teacher_name': teacher.full_name,
+                'teacher_id': pcs_teacher.teacher_id,
+                'teacher_name': teacher_names[pcs_teacher.teacher_id],
                 'hours_per_week': pcs_teacher.hours_per_week,
                 'default_cabinet': pcs_teacher.default_cabinet or '',
                 'is_assigned_to_class': pcs_teacher.is_assigned_to_class
             })
     
     return {
-        'class_id': class_group.id,
-        'class_name': class_group.name,
-        'subject_id': subject.id,
-        'subject_name': subject.name,
+        'class_id': class_id,
+        'class_name': class_name,
+        'subject_id': subject_id,
+        'subject_name': subject_name,
         'total_hours_per_week': pcs.total_hours_per_week,
         'has_subgroups': pcs.has_subgroups,
         'teachers': teachers
@@ -19,21 +19,27 @@ app_py_file = os.path.join(BASE_DIR, 'app.py')
 if not os.path.exists(app_py_file):
     raise FileNotFoundError(f"app.py not found at {app_py_file}")
 
-# Load app.py explicitly as a module to avoid conflict with app/ directory
-spec = importlib.util.spec_from_file_location("app_main_module", app_py_file)
-
-if spec is None:
-    raise ImportError(f"Failed to create spec for {app_py_file}")
-
-if spec.loader is None:
-    raise ImportError(f"Failed to get loader for {app_py_file}")
-
-# Create and execute the module
-app_main = importlib.util.module_from_spec(spec)
-sys.modules['app_main_module'] = app_main  # Register in sys.modules
-
-# Execute the module - this will run all code in app.py including blueprint registration
-spec.loader.exec_module(app_main)
+# Reuse app.py if it has already been executed in this process
+# (with preload_app in gunicorn.conf.py it runs once in the master, workers inherit it)
+app_main = sys.modules.get('app_main_module')
+
+if app_main is None:
+    # Load app.py explicitly as a module to avoid conflict with app/ directory
+    # (SourceFileLoader uses the regular __pycache__ bytecode cache)
+    spec = importlib.util.spec_from_file_location("app_main_module", app_py_file)
+    
+    if spec is None:
+        raise ImportError(f"Failed to create spec for {app_py_file}")
+    
+    if spec.loader is None:
+        raise ImportError(f"Failed to get loader for {app_py_file}")
+    
+    # Create and execute the module
+    app_main = importlib.util.module_from_spec(spec)
+    sys.modules['app_main_module'] = app_main  # Register in sys.modules
+    
+    # Execute the module - this will run all code in app.py including blueprint registration
+    spec.loader.exec_module(app_main)
 
 # Get the Flask app instance
 if not hasattr(app_main, 'app'):